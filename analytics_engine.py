@@ -0,0 +1,183 @@
+# analytics_engine.py
+import decimal
+import os
+
+try:
+    import numpy as np
+except ImportError:  # The reports fall back to their SQL when NumPy is not installed
+    np = None
+
+from date_buckets import date_buckets_ready
+from db import database_of, dialect_of, finish_read, open_cursor
+from report_cache import cached_report
+
+# "sql" (the default) runs the report SQL; "numpy" computes the supported statistics
+# locally from whole columns, which stay in the report cache until the table is written
+ANALYTICS_ENGINE = os.environ.get("UPS_ANALYTICS_ENGINE", "sql")
+
+# Percent ranks reported by calculate_shipment_weight_percentiles
+WEIGHT_PERCENTILES = (0.25, 0.50, 0.75, 0.90)
+
+# Rows per window of the moving average (the current day and the 6 before it)
+MOVING_AVERAGE_WINDOW = 7
+
+# Function telling whether the NumPy engine should be used
+def engine_enabled():
+    return np is not None and ANALYTICS_ENGINE == "numpy"
+
+# Function to pull columns of a table once and reuse them for every statistic
+def load_columns(conn, table, expressions):
+    """
+    Reads `expressions` (column names or SQL expressions) of every row of `table`
+    with one full read. The result is cached like a report, so further statistics
+    over the same columns reuse it until the table is written.
+
+    Returns:
+        tuple with one list of raw driver values per expression.
+    """
+    expressions = tuple(expressions)
+
+    def pull():
+        try:
+            with open_cursor(conn) as cursor:
+                cursor.execute(f"SELECT {', '.join(expressions)} FROM {table}")
+                rows = cursor.fetchall()
+        finally:
+            finish_read(conn)
+        columns = list(zip(*rows)) if rows else [() for _ in expressions]
+        return expressions, [list(column) for column in columns]
+
+    return cached_report(("columns", table, expressions, database_of(conn)), (table,), pull)[1]
+
+def _as_floats(values):
+    # None becomes NaN so NULLs can be told apart after the conversion
+    return np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+
+def _round_like(sample, value, places):
+    # MySQL hands back DECIMAL for DECIMAL columns, SQLite a float
+    if isinstance(sample, decimal.Decimal):
+        return decimal.Decimal(repr(value)).quantize(decimal.Decimal(1).scaleb(-places), decimal.ROUND_HALF_UP)
+    return round(value, places)
+
+# Function computing PERCENT_RANK thresholds
+def percent_rank_thresholds(values, points):
+    """
+    For each p in `points`, the smallest value whose PERCENT_RANK() OVER (ORDER BY
+    value) is at least p. NULLs sort first and count towards the ranks, as in SQL.
+
+    Returns:
+        list of floats (None when no value reaches p).
+    """
+    ranked = _as_floats(values)
+    nulls = int(np.isnan(ranked).sum())
+    present = np.sort(ranked[~np.isnan(ranked)])
+    if present.size == 0:
+        return [None for _ in points]
+    # rank - 1 of each value is the number of rows sorting before its first peer
+    before = nulls + np.searchsorted(present, present, side="left")
+    ranks = before / (len(ranked) - 1) if len(ranked) > 1 else np.zeros(present.size)
+    thresholds = []
+    for point in points:
+        reached = np.flatnonzero(ranks >= point)
+        thresholds.append(float(present[reached[0]]) if reached.size else None)
+    return thresholds
+
+# Function computing the median of `values` per key
+def grouped_medians(keys, values):
+    """
+    Median of `values` for each distinct key, taken like the SQL version: rows
+    sorted by value within a key (NULLs first), the rows numbered
+    FLOOR((n + 1) / 2) and CEIL((n + 1) / 2) averaged, NULLs ignored.
+
+    Returns:
+        list of (key, median) sorted by key, NULL key first; the median keeps the
+        driver's type (DECIMAL averages carry 6 decimals, as AVG does in MySQL).
+    """
+    if not values:
+        return []
+    null_keys = np.array([key is None for key in keys])
+    key_values = np.array([0 if key is None else key for key in keys], dtype=np.int64)
+    sort_values = _as_floats(values)
+    sort_values[np.isnan(sort_values)] = -np.inf
+    order = np.lexsort((sort_values, key_values, ~null_keys))
+
+    sorted_keys = key_values[order]
+    sorted_nulls = null_keys[order]
+    starts = np.concatenate(([0], np.flatnonzero((np.diff(sorted_keys) != 0) | (np.diff(sorted_nulls) != 0)) + 1))
+    counts = np.diff(np.append(starts, len(order)))
+    lower = order[starts + (counts + 1) // 2 - 1]
+    upper = order[starts + (counts + 2) // 2 - 1]
+
+    medians = []
+    for start, low, high in zip(starts, lower, upper):
+        key = None if sorted_nulls[start] else keys[order[start]]
+        picked = [values[low]] if low == high else [values[low], values[high]]
+        picked = [value for value in picked if value is not None]
+        if not picked:
+            medians.append((key, None))
+        elif isinstance(picked[0], decimal.Decimal):
+            medians.append((key, (sum(picked) / len(picked)).quantize(decimal.Decimal("0.000001"), decimal.ROUND_HALF_UP)))
+        else:
+            medians.append((key, sum(picked) / len(picked)))
+    return medians
+
+# Function computing a trailing moving average over daily counts
+def rolling_daily_average(days, window=MOVING_AVERAGE_WINDOW):
+    """
+    Counts rows per day and averages each day's count with the `window` - 1 days
+    before it (by row, as ROWS BETWEEN n PRECEDING AND CURRENT ROW does).
+
+    Parameters:
+        days - one date (date object or 'YYYY-MM-DD', None allowed) per row
+
+    Returns:
+        (day values as datetime64[D] with NaT for NULL, counts, window sums,
+        window sizes), ordered by day with NULL first.
+    """
+    stamps = np.array(days, dtype="datetime64[D]")
+    unique, counts = np.unique(stamps, return_counts=True)
+    if unique.size and np.isnat(unique[-1]):
+        unique, counts = np.roll(unique, 1), np.roll(counts, 1)
+    totals = np.cumsum(counts)
+    sums = totals - np.concatenate((np.zeros(min(window, totals.size), dtype=totals.dtype), totals[:-window]))
+    sizes = np.minimum(np.arange(1, totals.size + 1), window)
+    return unique, counts, sums, sizes
+
+# Function for calculate_shipment_weight_percentiles
+def shipment_weight_percentiles(conn):
+    """(headers, rows) identical to CALCULATE_SHIPMENT_WEIGHT_PERCENTILES_SQL."""
+    (weights,) = load_columns(conn, "Packages", ("weight",))
+    sample = next((weight for weight in weights if weight is not None), None)
+    row = tuple(None if value is None else _round_like(sample, value, 2)
+                for value in percent_rank_thresholds(weights, WEIGHT_PERCENTILES))
+    return ["25th_Percentile", "50th_Percentile", "75th_Percentile", "90th_Percentile"], [row]
+
+# Function for compute_moving_average_shipments
+def moving_average_shipments(conn, limit=30):
+    """(headers, rows) identical to COMPUTE_MOVING_AVERAGE_SHIPMENTS_SQL."""
+    day = "shipment_day" if date_buckets_ready(conn) else "DATE(shipment_date)"
+    (days,) = load_columns(conn, "Shipments", (day,))
+    mysql = dialect_of(conn) == "mysql"
+    unique, counts, sums, sizes = rolling_daily_average(days)
+    rows = []
+    for position in range(unique.size - 1, max(unique.size - limit, 0) - 1, -1):
+        day = None if np.isnat(unique[position]) else unique[position].item()
+        if mysql:
+            # AVG over an integer column is DECIMAL with 4 decimals in MySQL
+            average = (decimal.Decimal(int(sums[position])) / int(sizes[position])).quantize(
+                decimal.Decimal("0.0001"), decimal.ROUND_HALF_UP)
+        else:
+            day = None if day is None else day.isoformat()
+            average = int(sums[position]) / int(sizes[position])
+        rows.append((day, int(counts[position]), average))
+    return ["ship_date", "daily_count", "moving_average"], rows
+
+# Function for determine_median_payment
+def median_payment_per_customer(conn, limit=10):
+    """(headers, rows) identical to DETERMINE_MEDIAN_PAYMENT_SQL."""
+    customers, amounts = load_columns(conn, "Payments", ("customer_id", "amount"))
+    medians = grouped_medians(customers, amounts)
+    # ORDER BY median_payment DESC puts NULL medians last
+    ordering = np.array([-np.inf if median is None else float(median) for _, median in medians])
+    top = np.argsort(-ordering, kind="stable")[:limit]
+    return ["customer_id", "median_payment"], [medians[index] for index in top]
@@ -0,0 +1,108 @@
+# async_db.py
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from db import STREAM_CHUNK_SIZE, check_record_existance, execute_query, find_missing_records, stream_query, transaction
+
+_END_OF_STREAM = object()
+
+# asyncio front end for the blocking helpers in db.py
+class AsyncDatabase:
+    """
+    Runs the db.py helpers on a bounded set of worker threads so coroutines can
+    wait on several queries at once. Each call borrows its own connection from the
+    pool, so at most `max_workers` statements (defaulting to the pool size) are in
+    flight; further calls wait for a free slot instead of piling up on the pool.
+
+    Units of work are thread-local in db.py, so a transaction cannot span awaits:
+    pass a function that does the whole unit of work to run_in_transaction().
+
+    Usage:
+        async with AsyncDatabase(pool) as adb:
+            shipments, payments = await asyncio.gather(
+                adb.execute_query("SELECT * FROM Shipments", select=True),
+                adb.execute_query("SELECT * FROM Payments", select=True),
+            )
+            async for row in adb.stream_query("SELECT * FROM Packages"):
+                ...
+    """
+
+    def __init__(self, pool, max_workers=None):
+        """
+        Parameters:
+            pool - the ConnectionPool the statements run on
+            max_workers - statements allowed in flight at once, at most the pool size
+        """
+        self.pool = pool
+        self.max_workers = min(max_workers or pool.pool_size, pool.pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ups-db")
+        self._slots = asyncio.Semaphore(self.max_workers)
+
+    async def run(self, function, *args, **kwargs):
+        """Runs a blocking function on a worker thread once a slot is free."""
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    async def execute_query(self, query, params=(), select=False):
+        """Async db.execute_query on a pooled connection; same arguments and results."""
+        return await self.run(execute_query, self.pool, query, params, select)
+
+    async def check_record_existance(self, table_name, column_name, value, ttl=None):
+        """Async db.check_record_existance; answers are shared with the sync cache."""
+        return await self.run(check_record_existance, table_name, column_name, value, self.pool, ttl)
+
+    async def find_missing_records(self, table_name, column_name, values, ttl=None):
+        """Async db.find_missing_records."""
+        return await self.run(find_missing_records, table_name, column_name, list(values), self.pool, ttl=ttl)
+
+    async def run_in_transaction(self, function, *args, **kwargs):
+        """
+        Runs function(conn, *args, **kwargs) inside db.transaction() on one worker
+        thread and returns its result; it commits on success and rolls back if the
+        function raises.
+        """
+        def unit_of_work():
+            with transaction(self.pool) as conn:
+                return function(conn, *args, **kwargs)
+        return await self.run(unit_of_work)
+
+    async def stream_query(self, query, params=(), chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Async db.stream_query: yields rows one at a time while a worker thread pulls
+        `chunk_size` rows per round trip. The stream keeps its worker slot and
+        pooled connection until it is exhausted or closed, so memory stays bounded
+        and a consumer that stops early (break, aclose()) releases the connection.
+        """
+        loop = asyncio.get_running_loop()
+        rows = stream_query(self.pool, query, params, chunk_size)
+
+        def next_chunk():
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    break
+            return chunk or _END_OF_STREAM
+
+        async with self._slots:
+            try:
+                while True:
+                    chunk = await loop.run_in_executor(self._executor, next_chunk)
+                    if chunk is _END_OF_STREAM:
+                        return
+                    for row in chunk:
+                        yield row
+            finally:
+                await loop.run_in_executor(self._executor, rows.close)
+
+    async def close(self):
+        """Waits for running statements and stops the worker threads (the pool stays open)."""
+        await asyncio.get_running_loop().run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -0,0 +1,351 @@
+# backends.py
+import datetime
+import decimal
+import itertools
+import sqlite3
+
+try:
+    import mysql.connector
+except ImportError:  # The SQLite backend works without the MySQL driver
+    mysql = None
+
+from schema import SQLITE_SCHEMA
+
+# Raised by the database layer itself (pool closed, pool exhausted, ...)
+class DatabaseError(Exception):
+    pass
+
+# Every error the database layer may need to catch, whichever backend is active
+DB_ERRORS = (DatabaseError, sqlite3.Error) + ((mysql.connector.Error,) if mysql else ())
+
+
+# Backend for the production MySQL server
+class MySQLBackend:
+    """Opens mysql.connector connections with the given connection arguments."""
+
+    name = "mysql"
+
+    def __init__(self, **config):
+        if mysql is None:
+            raise DatabaseError("mysql-connector-python is not installed (pip install mysql-connector-python)")
+        self.config = config
+
+    def connect(self, autocommit=False, **options):
+        """Opens a new connection to the MySQL server; `options` override the configured arguments."""
+        connection = mysql.connector.connect(**{"autocommit": autocommit, **self.config, **options})
+        # Lets db.database_of tell which database the connection belongs to
+        connection._ups_backend = self
+        return connection
+
+    def describe(self):
+        return f"the {self.config.get('database', 'UPS_DB')} database"
+
+    def identity(self):
+        """Hashable identity of the database: server, port and schema name."""
+        return (self.name, self.config.get("host"), self.config.get("port", 3306), self.config.get("database"))
+
+
+# Backend for an embedded SQLite database file or in-memory database
+class SQLiteBackend:
+    """
+    Opens connections to a local SQLite database that carries the UPS schema for
+    all 11 tables, so the CRUD flows and reports run without a MySQL server.
+
+    Connections are wrapped to speak the subset of the mysql.connector API the
+    application uses (%s placeholders, cursor context managers, start_transaction,
+    in_transaction, ...) and get SQL function shims for the MySQL-only functions
+    used in complex_operations.py.
+    """
+
+    name = "sqlite"
+    _memory_ids = itertools.count(1)
+
+    def __init__(self, path=":memory:", create_schema=True):
+        """
+        Parameters:
+            path - database file, or ':memory:' for a private in-memory database
+                   shared by every connection of this backend
+            create_schema - create any missing UPS tables on first connect
+        """
+        self.path = path
+        self.create_schema = create_schema
+        self._schema_ready = False
+        self._keeper = None
+        if path == ":memory:":
+            # A named shared-cache database lets pooled connections see the same
+            # data; the keeper connection keeps it alive while the pool recycles
+            self._target = f"file:ups_db_{next(self._memory_ids)}?mode=memory&cache=shared"
+            self._keeper = self._open_raw()
+        else:
+            self._target = path
+
+    def _open_raw(self):
+        # Declared types pick the converters below, so DECIMAL columns read back as Decimal
+        return sqlite3.connect(self._target, uri=self._target.startswith("file:"),
+                               check_same_thread=False, timeout=30, isolation_level=None,
+                               detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def connect(self, autocommit=False):
+        """Opens a new connection, creating the schema the first time."""
+        raw = self._open_raw()
+        connection = SQLiteConnection(raw, self, autocommit=autocommit)
+        if self.create_schema and not self._schema_ready:
+            raw.executescript(SQLITE_SCHEMA)
+            self._schema_ready = True
+        return connection
+
+    def describe(self):
+        return "an in-memory SQLite database" if self._keeper else f"the SQLite database {self.path}"
+
+    def identity(self):
+        """Hashable identity of the database: its file (each in-memory database has its own name)."""
+        return (self.name, self._target)
+
+
+# Connection wrapper giving sqlite3 the mysql.connector surface used by the app
+class SQLiteConnection:
+    dialect = "sqlite"
+
+    def __init__(self, raw, backend, autocommit=False):
+        self._raw = raw
+        self._backend = backend
+        self.autocommit = autocommit
+        self._closed = False
+        self._setup()
+
+    def _setup(self):
+        self._raw.execute("PRAGMA foreign_keys = ON")
+        if not self._backend._keeper:
+            self._raw.execute("PRAGMA journal_mode = WAL")
+        register_mysql_functions(self._raw)
+
+    def cursor(self, prepared=False, buffered=None):
+        # sqlite3 keeps its own per-connection statement cache, so prepared
+        # cursors need nothing special here
+        return SQLiteCursor(self)
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+    def start_transaction(self):
+        self._raw.execute("BEGIN")
+
+    def _begin_implicitly(self, query):
+        """Emulates MySQL's autocommit=0: the first statement opens a transaction."""
+        if not self.autocommit and not self._raw.in_transaction:
+            self._raw.execute("BEGIN")
+
+    def commit(self):
+        if self._raw.in_transaction:
+            self._raw.execute("COMMIT")
+
+    def rollback(self):
+        if self._raw.in_transaction:
+            self._raw.execute("ROLLBACK")
+
+    def consume_results(self):
+        # Results are pulled lazily by sqlite3; there is nothing buffered to drain
+        pass
+
+    def is_connected(self):
+        return not self._closed
+
+    def reconnect(self, attempts=1, delay=0):
+        self.close()
+        self._raw = self._backend._open_raw()
+        self._closed = False
+        self._setup()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._raw.close()
+
+
+# Cursor wrapper translating mysql.connector conventions for sqlite3
+class SQLiteCursor:
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection._raw.cursor()
+
+    def execute(self, query, params=()):
+        self._connection._begin_implicitly(query)
+        self._cursor.execute(translate_placeholders(query, bool(params)), tuple(params or ()))
+
+    def executemany(self, query, seq_params):
+        self._connection._begin_implicitly(query)
+        self._cursor.executemany(translate_placeholders(query, True), [tuple(row) for row in seq_params])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Function to translate mysql.connector placeholders to sqlite3 ones
+def translate_placeholders(query, has_params):
+    """
+    Rewrites %s placeholders to ? outside string literals when the statement has
+    parameters. Like mysql.connector, which substitutes only %s, everything else
+    is sent as written: %% stays %% and '%Y-%m' formats need no escaping.
+    """
+    if not has_params or "%" not in query:
+        return query
+    out = []
+    quote = None
+    i = 0
+    while i < len(query):
+        char = query[i]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        if char == "%" and not quote and query[i + 1:i + 2] == "s":
+            out.append("?")
+            i += 2
+            continue
+        out.append(char)
+        i += 1
+    return "".join(out)
+
+
+# Dialect layer: MySQL functions used by the reports, implemented for SQLite
+
+def _to_datetime(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    return datetime.datetime.fromisoformat(str(value))
+
+def _date_part(part):
+    def extract(value):
+        moment = _to_datetime(value)
+        return None if moment is None else getattr(moment, part)
+    return extract
+
+def _dayname(value):
+    moment = _to_datetime(value)
+    return None if moment is None else moment.strftime("%A")
+
+# MySQL DATE_FORMAT specifiers and their strftime equivalents
+_DATE_FORMAT_CODES = {
+    "Y": "%Y", "y": "%y", "m": "%m", "d": "%d", "H": "%H", "h": "%I",
+    "i": "%M", "s": "%S", "S": "%S", "p": "%p", "M": "%B", "b": "%b",
+    "W": "%A", "a": "%a", "j": "%j", "%": "%%",
+}
+
+def _date_format(value, fmt):
+    moment = _to_datetime(value)
+    if moment is None or fmt is None:
+        return None
+    out = []
+    i = 0
+    while i < len(fmt):
+        if fmt[i] == "%" and i + 1 < len(fmt):
+            code = fmt[i + 1]
+            if code == "c":
+                out.append(str(moment.month))
+            elif code == "e":
+                out.append(str(moment.day))
+            elif code in _DATE_FORMAT_CODES:
+                out.append(moment.strftime(_DATE_FORMAT_CODES[code]))
+            else:
+                out.append(code)
+            i += 2
+        else:
+            out.append(fmt[i])
+            i += 1
+    return "".join(out)
+
+def _datediff(end, start):
+    end, start = _to_datetime(end), _to_datetime(start)
+    if end is None or start is None:
+        return None
+    return (end.date() - start.date()).days
+
+def _field(value, *candidates):
+    for position, candidate in enumerate(candidates, start=1):
+        if value is not None and value == candidate:
+            return position
+    return 0
+
+def _concat(*parts):
+    if any(part is None for part in parts):
+        return None
+    return "".join(str(part) for part in parts)
+
+def _ceil(value):
+    return None if value is None else int(decimal.Decimal(str(value)).to_integral_value(decimal.ROUND_CEILING))
+
+def _floor(value):
+    return None if value is None else int(decimal.Decimal(str(value)).to_integral_value(decimal.ROUND_FLOOR))
+
+def register_mysql_functions(raw_connection):
+    """Registers the MySQL-only SQL functions used by the app on a sqlite3 connection."""
+    functions = {
+        "YEAR": (1, _date_part("year")),
+        "MONTH": (1, _date_part("month")),
+        "DAY": (1, _date_part("day")),
+        "HOUR": (1, _date_part("hour")),
+        "DAYNAME": (1, _dayname),
+        "DATE_FORMAT": (2, _date_format),
+        "DATEDIFF": (2, _datediff),
+        "FIELD": (-1, _field),
+        "CONCAT": (-1, _concat),
+        "CEIL": (1, _ceil),
+        "CEILING": (1, _ceil),
+        "FLOOR": (1, _floor),
+    }
+    for name, (arity, function) in functions.items():
+        raw_connection.create_function(name, arity, function, deterministic=True)
+
+
+# Every DECIMAL column of the UPS schema (and its summaries) has two decimal places
+SQLITE_DECIMAL_PLACES = decimal.Decimal("0.01")
+
+def _read_decimal(text):
+    return decimal.Decimal(text.decode()).quantize(SQLITE_DECIMAL_PLACES, decimal.ROUND_HALF_UP)
+
+# Store dates, timestamps and decimals in the forms MySQL would hand back as text;
+# decimals go in as their exact text rather than through a binary float
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(" "))
+sqlite3.register_adapter(decimal.Decimal, str)
+# Money and weights read back rounded to their declared scale, as Decimal like
+# mysql.connector returns them; DATE and TIMESTAMP columns stay text as before
+sqlite3.register_converter("DECIMAL", _read_decimal)
+sqlite3.register_converter("DATE", bytes.decode)
+sqlite3.register_converter("TIMESTAMP", bytes.decode)
@@ -0,0 +1,209 @@
+# cli.py
+import argparse
+import contextlib
+import os
+import sys
+
+from complex_operations import REPORTS, fetch_report
+from crudoperations import (LIST_PAGE_SIZE, create_record, delete_record, list_records, read_record,
+                            update_record)
+from date_buckets import ensure_date_buckets
+from db import BULK_BATCH_SIZE, DB_ERRORS, create_pool
+from exporter import export_source
+from importer import import_csv, import_directory
+from rendering import OUTPUT_FORMATS, write_rows
+from schema import resolve_table
+from summaries import ensure_summary_tables
+
+# Exit codes of the command line
+EXIT_OK = 0
+EXIT_ERROR = 1        # database or output errors
+EXIT_USAGE = 2        # bad arguments or input files (also what argparse exits with)
+EXIT_NOT_FOUND = 3    # read / update / delete of a key that has no record
+
+# Joins the sort values of the last listed record into the --after token
+PAGE_TOKEN_SEPARATOR = "|"
+
+# Function to parse a column=value argument
+def _assignment(text):
+    column, separator, value = text.partition("=")
+    if not separator or not column.strip():
+        raise argparse.ArgumentTypeError(f"expected column=value, got '{text}'")
+    return column.strip(), value
+
+# Function to build the command line parser
+def build_parser():
+    """Returns the argparse parser for `python run_app.py <command> ...`."""
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--format", choices=OUTPUT_FORMATS, default="csv", help="output format (default: csv)")
+    output.add_argument("--output", metavar="PATH", help="write to PATH instead of stdout")
+
+    parser = argparse.ArgumentParser(
+        prog="run_app.py",
+        description="Run UPS reports and CRUD operations without the menus. "
+                    "Run without arguments for the interactive application.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("reports", parents=[output], help="list the report names")
+
+    report = commands.add_parser("report", parents=[output], help="run a report from complex_operations")
+    report.add_argument("name", choices=sorted(REPORTS), metavar="NAME", help="report name (see 'reports')")
+    report.add_argument("--refresh", action="store_true", help="run the query even if a cached result is fresh")
+
+    # Table names are checked (in any letter case) by run_command with resolve_table
+    create = commands.add_parser("create", parents=[output], help="insert a record")
+    create.add_argument("table", metavar="TABLE")
+    create.add_argument("values", nargs="+", type=_assignment, metavar="COLUMN=VALUE")
+
+    read = commands.add_parser("read", parents=[output], help="show a record by primary key")
+    read.add_argument("table", metavar="TABLE")
+    read.add_argument("key", metavar="ID")
+
+    browse = commands.add_parser("list", parents=[output], help="list records a page at a time, with filters")
+    browse.add_argument("table", metavar="TABLE")
+    for name in ("status", "customer", "user", "shipment", "package"):
+        browse.add_argument(f"--{name}", help=f"only records with this {name}")
+    browse.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD", help="first day of the date range")
+    browse.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD", help="last day of the date range")
+    browse.add_argument("--order", choices=("id", "date"), default="id",
+                        help="sort by primary key or by date (indexed once 'migrate' has run)")
+    browse.add_argument("--after", metavar="TOKEN", help="the token printed for the next page")
+    browse.add_argument("--limit", type=int, default=LIST_PAGE_SIZE, help="rows per page")
+
+    update = commands.add_parser("update", parents=[output], help="change a record by primary key")
+    update.add_argument("table", metavar="TABLE")
+    update.add_argument("key", metavar="ID")
+    update.add_argument("values", nargs="+", type=_assignment, metavar="COLUMN=VALUE")
+
+    delete = commands.add_parser("delete", parents=[output], help="delete a record by primary key")
+    delete.add_argument("table", metavar="TABLE")
+    delete.add_argument("key", metavar="ID")
+
+    export = commands.add_parser("export", parents=[output],
+                                 help="stream a table or report to CSV / JSON lines (gzip for .gz paths)")
+    export.add_argument("source", metavar="TABLE_OR_REPORT")
+    export.add_argument("--columns", type=lambda text: [part.strip() for part in text.split(",") if part.strip()],
+                        metavar="A,B,...", help="only these columns, in this order")
+    export.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD", help="first day of the date range")
+    export.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD", help="last day of the date range")
+    export.add_argument("--date-column", metavar="COLUMN",
+                        help="column the date range applies to (required for reports)")
+    export.add_argument("--gzip", action="store_true", default=None, help="compress the output")
+
+    load = commands.add_parser("import", parents=[output],
+                               help="load a CSV file, or a folder of <table>.csv files")
+    load.add_argument("source", metavar="PATH")
+    load.add_argument("--table", metavar="TABLE",
+                      help="table of a single file (default: the file name, e.g. Payments.csv)")
+    load.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE, help="rows per INSERT and commit")
+    load.add_argument("--no-load-data", action="store_true", help="never use LOAD DATA LOCAL INFILE")
+
+    commands.add_parser("migrate", parents=[output],
+                        help="add the date bucket columns and date indexes (rebuilds the tables on MySQL)")
+    return parser
+
+# Function to run one parsed command against the database
+def run_command(pool, args, stdout):
+    """
+    Returns (headers, rows, exit code) for a parsed command. Write commands
+    return one row: table, action, key and the number of rows affected. Exports
+    write their rows themselves (to --output or `stdout`) and return no headers.
+    Unknown table names raise ValueError.
+    """
+    if getattr(args, "table", None):
+        args.table = resolve_table(args.table)
+    if args.command == "export":
+        try:
+            result = export_source(pool, args.source, args.output or stdout.buffer, output_format=args.format,
+                                   columns=args.columns, date_from=args.date_from, date_to=args.date_to,
+                                   date_column=args.date_column, compress=args.gzip)
+        except OSError as e:
+            print(f"❌ Error writing output: {e}")
+            return None, None, EXIT_ERROR
+        print(f"✅ Exported {result['rows']} rows in {result['seconds']:.2f}s.")
+        return None, None, EXIT_OK
+    if args.command == "report":
+        with pool.connection() as conn:
+            headers, rows = fetch_report(conn, args.name, use_cache=not args.refresh)
+        return headers, rows, EXIT_OK
+    if args.command == "import":
+        use_load_data = not args.no_load_data
+        if os.path.isdir(args.source):
+            results = import_directory(pool, args.source, args.batch_size, use_load_data)
+        else:
+            table_name = args.table or os.path.splitext(os.path.basename(args.source))[0]
+            results = [import_csv(pool, table_name, args.source, args.batch_size, use_load_data)]
+        headers = ["table", "rows", "failed", "seconds", "rows_per_second", "method"]
+        code = EXIT_ERROR if any(result["failed"] for result in results) else EXIT_OK
+        return headers, [tuple(result[header] for header in headers) for result in results], code
+    if args.command == "migrate":
+        return ["added"], [(name,) for name in ensure_date_buckets(pool)], EXIT_OK
+    if args.command == "list":
+        filters = {name: getattr(args, name) for name in
+                   ("status", "customer", "user", "shipment", "package", "date_from", "date_to")}
+        after = args.after.split(PAGE_TOKEN_SEPARATOR) if args.after else None
+        headers, rows, next_after = list_records(pool, args.table, filters, args.order, after, args.limit)
+        if next_after is not None:
+            print(f"➡️ Next page: --after '{PAGE_TOKEN_SEPARATOR.join(str(value) for value in next_after)}'")
+        return headers, rows, EXIT_OK
+    if args.command == "read":
+        headers, rows = read_record(pool, args.table, args.key)
+        return headers, rows, EXIT_OK if rows else EXIT_NOT_FOUND
+
+    if args.command == "create":
+        key, affected = create_record(pool, args.table, dict(args.values)), 1
+    elif args.command == "update":
+        key, affected = args.key, update_record(pool, args.table, args.key, dict(args.values))
+    else:
+        key, affected = args.key, delete_record(pool, args.table, args.key)
+    headers = ["table", "action", "key", "rows"]
+    return headers, [(args.table, args.command, key, affected)], EXIT_OK if affected else EXIT_NOT_FOUND
+
+def _write_output(args, headers, rows, stdout):
+    if not args.output:
+        write_rows(headers, rows, stdout, args.format)
+        return
+    with open(args.output, "w", newline="", encoding="utf-8") as handle:
+        write_rows(headers, rows, handle, args.format)
+
+# Entry point of the non-interactive mode
+def main(argv=None):
+    """
+    Runs one command, writing its result as CSV or JSON lines. Messages go to
+    stderr so stdout carries only the data.
+
+    Returns:
+        One of the EXIT_* codes.
+    """
+    args = build_parser().parse_args(argv)
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.command == "reports":
+            headers, rows, code = ["report"], [(name,) for name in REPORTS], EXIT_OK
+        else:
+            pool = create_pool()
+            if not pool:
+                print("❌ Unable to connect to the database.")
+                return EXIT_ERROR
+            try:
+                ensure_summary_tables(pool)
+                headers, rows, code = run_command(pool, args, stdout)
+            except (ValueError, OSError) as e:
+                print(f"❌ {e}")
+                return EXIT_USAGE
+            except DB_ERRORS as e:
+                print(f"❌ Database error: {e}")
+                return EXIT_ERROR
+            finally:
+                pool.close_all()
+        if headers is None:
+            return code
+        try:
+            _write_output(args, headers, rows, stdout)
+        except OSError as e:
+            print(f"❌ Error writing output: {e}")
+            return EXIT_ERROR
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,19 @@
 # complex_operations.py
+import datetime
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import analytics_engine
+from date_buckets import date_buckets_ready
+from db import (BULK_BATCH_SIZE, borrow_connection, database_of, dialect_of, execute_query, finish_read, open_cursor,
+                stream_query)
+from rendering import render_table
+from report_cache import cached_report
+from schema import tables_referenced
+from sketches import (PACKAGE_WEIGHT_SKETCH, PAYMENT_AMOUNT_SKETCH, approximate_quantiles, sketch_rank_error,
+                      top_approximate_medians)
+from summaries import refresh_delivery_stats
 
 # Displays menu for complex SQL query options
 def complex_queries_menu():
@@ -17,15 +32,17 @@ def complex_queries_menu():
     print("5. 🆚 Set Comparison Queries - Compare datasets based on predefined criteria.")
     print("6. 📐 Advanced Aggregate Functions - Use complex aggregation for nuanced analysis.")
     print("7. 📝 Subqueries Using WITH Clause - Organize and optimize complex subquery execution.")
-    print("8. 🔙 Return to Main Menu - Exit the complex queries section.")
+    print("8. 🚀 Run Reports in Parallel - Run several or all reports at once with timings.")
+    print("9. 🔙 Return to Main Menu - Exit the complex queries section.")
     print("=" * 50)
-    return input("👉 Select a Complex Query to Run (1-8): ").strip()
+    return input("👉 Select a Complex Query to Run (1-9): ").strip()
 
 # Handles selection and execution of complex queries
-def manage_complex_queries(conn):
+def manage_complex_queries(conn, pool=None):
     """
     Main function to handle complex SQL query selection and execution.
     Includes interactive feedback, clear guidance, and robust error handling.
+    Reports run on `conn`; the parallel batch mode borrows extra connections from `pool`.
     """
     while True:
         choice = complex_queries_menu()
@@ -45,10 +62,15 @@ def manage_complex_queries(conn):
         elif choice == "7":
             manage_with_clause_subqueries(conn) 
         elif choice == "8":
+            if pool is None:
+                print("⚠️ Parallel reports need a connection pool.")
+            else:
+                manage_report_batch(pool)
+        elif choice == "9":
             print("🔙 Returning to Main Menu. Thank you for exploring complex queries.")
             break
         else:
-            print("⚠️ Invalid choice. Please select a valid option from 1 to 8.")
+            print("⚠️ Invalid choice. Please select a valid option from 1 to 9.")
 
 # Shows menu for OLAP query selection
 def olap_queries_menu():
@@ -89,28 +111,20 @@ def manage_olap_queries(conn):
         else:
             print("⚠️ Invalid choice. Please select a valid option from 1 to 5.")
 
-# Formats and displays query results as table
-def format_records(headers, rows):
-    """
-    Formats and displays records in a well-aligned table format with user-friendly presentation.
-    
-    :param headers: List of column headers
-    :param rows: List of tuples containing row data
-    """
-    col_widths = [max(len(str(item)) for item in col) for col in zip(headers, *rows)]
-    row_format = " | ".join(f"{{:<{width}}}" for width in col_widths)
-    
-    print("\n" + "=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-    print(row_format.format(*headers))
-    print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-    
-    for row in rows:
-        print(row_format.format(*row))
-    
-    print("=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-
 # OLAP Queries and Error Handling
 
+OLAP_PICKUP_REQUEST_STATUS_DISTRIBUTION_SQL = """
+WITH StatusCounts AS (
+    SELECT pickup_status, COUNT(*) AS status_count,
+    COUNT(*) * 100.0 / SUM(COUNT(*)) OVER() AS percentage
+    FROM Pickup_Requests
+    GROUP BY pickup_status
+)
+SELECT pickup_status, status_count, ROUND(percentage, 2) AS percentage
+FROM StatusCounts
+ORDER BY status_count DESC;
+"""
+
 # Calculates percentage distribution of pickup request statuses
 def olap_pickup_request_status_distribution(conn):
     """
@@ -118,31 +132,48 @@ def olap_pickup_request_status_distribution(conn):
     """
     print("\nRunning OLAP Query: Percentage Distribution of Pickup Request Statuses\n")
     
-    query = """
-    WITH StatusCounts AS (
-        SELECT pickup_status, COUNT(*) AS status_count,
-        COUNT(*) * 100.0 / SUM(COUNT(*)) OVER() AS percentage
-        FROM Pickup_Requests
-        GROUP BY pickup_status
-    )
-    SELECT pickup_status, status_count, ROUND(percentage, 2) AS percentage
-    FROM StatusCounts
-    ORDER BY status_count DESC;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Pickup Status", "Count", "Percentage (%)"]
-                format_records(headers, results)
-            else:
-                print("⚠️ No data found. Ensure pickup requests are recorded in the system.")
+        results = report_rows(conn, "olap_pickup_request_status_distribution")
+        if results:
+            headers = ["Pickup Status", "Count", "Percentage (%)"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No data found. Ensure pickup requests are recorded in the system.")
     except Exception as e:
         print(f"❌ Error retrieving pickup request status distribution. Check database connection and data: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+# Payment reports read the per-month, per-customer aggregates maintained in
+# PaymentMonthlySummary (see summaries.py) instead of rescanning Payments
+OLAP_MONTHLY_PAYMENTS_WITH_ROLLUP_SQL = """
+SELECT s.payment_year AS Year, s.payment_month AS Month, c.first_name,
+SUM(s.payment_count) AS TotalPayments, SUM(s.total_amount) AS TotalAmount
+FROM PaymentMonthlySummary s
+JOIN Customers c ON s.customer_id = c.customer_id
+GROUP BY s.payment_year, s.payment_month, c.first_name WITH ROLLUP;
+"""
+
+# SQLite form of the rollup above: one UNION ALL branch per grouping level
+OLAP_MONTHLY_PAYMENTS_WITH_ROLLUP_SQLITE_SQL = """
+WITH PaymentRows AS (
+    SELECT s.payment_year AS Year, s.payment_month AS Month, c.first_name,
+    s.payment_count, s.total_amount
+    FROM PaymentMonthlySummary s
+    JOIN Customers c ON s.customer_id = c.customer_id
+)
+SELECT Year, Month, first_name, TotalPayments, TotalAmount FROM (
+    SELECT Year, Month, first_name, SUM(payment_count) AS TotalPayments, SUM(total_amount) AS TotalAmount
+    FROM PaymentRows GROUP BY Year, Month, first_name
+    UNION ALL
+    SELECT Year, Month, NULL, SUM(payment_count), SUM(total_amount) FROM PaymentRows GROUP BY Year, Month
+    UNION ALL
+    SELECT Year, NULL, NULL, SUM(payment_count), SUM(total_amount) FROM PaymentRows GROUP BY Year
+    UNION ALL
+    SELECT NULL, NULL, NULL, SUM(payment_count), SUM(total_amount) FROM PaymentRows
+)
+ORDER BY Year IS NULL, Year, Month IS NULL, Month, first_name IS NULL, first_name;
+"""
 
 # Retrieves payment details with ROLLUP grouping
 def olap_monthly_payments_with_rollup(conn):
@@ -151,34 +182,36 @@ def olap_monthly_payments_with_rollup(conn):
     """
     print("\nRunning OLAP Query: Payment Totals by Year, Month, and Customer with Rollup\n")
     
-    query = """
-    SELECT YEAR(p.payment_date) AS Year, MONTH(p.payment_date) AS Month, c.first_name,
-    COUNT(p.payment_id) AS TotalPayments, SUM(p.amount) AS TotalAmount
-    FROM Payments p
-    JOIN Customers c ON p.customer_id = c.customer_id
-    GROUP BY YEAR(p.payment_date), MONTH(p.payment_date), c.first_name WITH ROLLUP;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Year", "Month", "Customer", "Payments", "Amount"]
-                formatted_results = [
-                    (row[0] if row[0] is not None else "Total",
-                     row[1] if row[1] is not None else "",
-                     row[2] if row[2] is not None else "",
-                     row[3], row[4])
-                    for row in results
-                ]
-                format_records(headers, formatted_results)
-            else:
-                print("⚠️ No payment data found. Ensure there are payments recorded in the database.")
+        results = report_rows(conn, "olap_monthly_payments_with_rollup")
+        if results:
+            headers = ["Year", "Month", "Customer", "Payments", "Amount"]
+            formatted_results = [
+                (row[0] if row[0] is not None else "Total",
+                 row[1] if row[1] is not None else "",
+                 row[2] if row[2] is not None else "",
+                 row[3], row[4])
+                for row in results
+            ]
+            render_table(headers, formatted_results)
+        else:
+            print("⚠️ No payment data found. Ensure there are payments recorded in the database.")
     except Exception as e:
         print(f"❌ Error retrieving payment totals with rollup. Verify database access and data: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+# Reads the per-day aggregates in DailyDeliveryStats, which the report brings up
+# to date first (summaries.refresh_delivery_stats) from new and edited attempts only
+OLAP_DAILY_DELIVERY_SUCCESS_RATE_SQL = """
+SELECT
+    delivery_date,
+    total_attempts,
+    successful_attempts,
+    ROUND((successful_attempts * 100.0 / total_attempts), 2) AS success_rate
+FROM DailyDeliveryStats
+ORDER BY delivery_date;
+"""
 
 # Calculates daily delivery success rates
 def olap_daily_delivery_success_rate(conn):
@@ -187,31 +220,31 @@ def olap_daily_delivery_success_rate(conn):
     """
     print("\nRunning OLAP Query: Daily Delivery Success Rate\n")
 
-    query = """
-    SELECT
-        DATE(attempt_date) AS delivery_date,
-        COUNT(*) AS total_attempts,
-        SUM(CASE WHEN attempt_status = 'Success' THEN 1 ELSE 0 END) AS successful_attempts,
-        ROUND((SUM(CASE WHEN attempt_status = 'Success' THEN 1 ELSE 0 END) * 100.0 / COUNT(*)), 2) AS success_rate
-    FROM DeliveryAttempts
-    GROUP BY DATE(attempt_date)
-    ORDER BY delivery_date;
-    """
-
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            
-            if results:
-                headers = ["Date", "Total Attempts", "Successes", "Success Rate (%)"]
-                format_records(headers, results)
-            else:
-                print("⚠️ No delivery attempt data available. Ensure delivery attempts are recorded in the system.")
+        results = report_rows(conn, "olap_daily_delivery_success_rate")
+        
+        if results:
+            headers = ["Date", "Total Attempts", "Successes", "Success Rate (%)"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No delivery attempt data available. Ensure delivery attempts are recorded in the system.")
     except Exception as e:
         print(f"❌ Error calculating daily delivery success rate. Check for data issues or database access errors: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+OLAP_CUSTOMER_SHIPMENT_VOLUME_SQL = """
+WITH CustomerShipmentVolume AS (
+    SELECT customer_id, COUNT(shipment_id) AS TotalShipments
+    FROM Shipments
+    GROUP BY customer_id
+)
+SELECT CSV.customer_id,
+CSV.TotalShipments,
+ROUND(PERCENT_RANK() OVER (ORDER BY CSV.TotalShipments DESC), 2) AS ShipmentPercentile
+FROM CustomerShipmentVolume CSV
+ORDER BY ShipmentPercentile;
+"""
 
 # Ranks customers by shipment volume using ROLLUP
 def olap_customer_shipment_volume(conn):
@@ -220,32 +253,17 @@ def olap_customer_shipment_volume(conn):
     """
     print("\nRunning OLAP Query: Customer Shipment Volume with ROLLUP\n")
 
-    query = """
-    WITH CustomerShipmentVolume AS (
-        SELECT customer_id, COUNT(shipment_id) AS TotalShipments
-        FROM Shipments
-        GROUP BY customer_id
-    )
-    SELECT CSV.customer_id,
-    CSV.TotalShipments,
-    ROUND(PERCENT_RANK() OVER (ORDER BY CSV.TotalShipments DESC), 2) AS ShipmentPercentile
-    FROM CustomerShipmentVolume CSV
-    ORDER BY ShipmentPercentile;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Customer ID", "Total Shipments", "Percentile"]
-                format_records(headers, results)
-            else:
-                print("⚠️ No shipment data available for customers. Ensure there are shipments associated with customers.")
+        results = report_rows(conn, "olap_customer_shipment_volume")
+        if results:
+            headers = ["Customer ID", "Total Shipments", "Percentile"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No shipment data available for customers. Ensure there are shipments associated with customers.")
     except Exception as e:
         print(f"❌ Error retrieving customer shipment volume. Ensure database connectivity and data accuracy: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
 
 # Displays menu for window function queries
 def window_functions_menu():
@@ -291,6 +309,22 @@ def manage_window_functions(conn):
         else:
             print("⚠️ Invalid choice. Please select a valid option from 1 to 5.")
 
+WINDOW_FIRST_LAST_SHIPMENT_DATES_SQL = """
+WITH UserShipments AS (
+    SELECT u.user_id, u.first_name, u.last_name, s.shipment_date,
+           ROW_NUMBER() OVER (PARTITION BY u.user_id ORDER BY s.shipment_date ASC) AS first_shipment_rank,
+           ROW_NUMBER() OVER (PARTITION BY u.user_id ORDER BY s.shipment_date DESC) AS last_shipment_rank
+    FROM Users u
+    JOIN Shipments s ON u.user_id = s.user_id
+)
+SELECT user_id, first_name, last_name,
+       MIN(CASE WHEN first_shipment_rank = 1 THEN shipment_date END) AS earliest_shipment_date,
+       MAX(CASE WHEN last_shipment_rank = 1 THEN shipment_date END) AS latest_shipment_date
+FROM UserShipments
+GROUP BY user_id, first_name, last_name
+ORDER BY user_id;
+"""
+
 # Finds earliest and latest shipment dates per user
 def window_first_last_shipment_dates(conn):
     """
@@ -298,35 +332,25 @@ def window_first_last_shipment_dates(conn):
     """
     print("\nRunning Window Function Query: First and Last Shipment Dates per User\n")
     
-    query = """
-    WITH UserShipments AS (
-        SELECT u.user_id, u.first_name, u.last_name, s.shipment_date,
-               ROW_NUMBER() OVER (PARTITION BY u.user_id ORDER BY s.shipment_date ASC) AS first_shipment_rank,
-               ROW_NUMBER() OVER (PARTITION BY u.user_id ORDER BY s.shipment_date DESC) AS last_shipment_rank
-        FROM Users u
-        JOIN Shipments s ON u.user_id = s.user_id
-    )
-    SELECT user_id, first_name, last_name,
-           MIN(CASE WHEN first_shipment_rank = 1 THEN shipment_date END) AS earliest_shipment_date,
-           MAX(CASE WHEN last_shipment_rank = 1 THEN shipment_date END) AS latest_shipment_date
-    FROM UserShipments
-    GROUP BY user_id, first_name, last_name
-    ORDER BY user_id;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["User ID", "First Name", "Last Name", "Earliest Shipment Date", "Latest Shipment Date"]
-                format_records(headers, results)
-            else:
-                print("⚠️ No shipment data found for users.")
+        results = report_rows(conn, "window_first_last_shipment_dates")
+        if results:
+            headers = ["User ID", "First Name", "Last Name", "Earliest Shipment Date", "Latest Shipment Date"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No shipment data found for users.")
     except Exception as e:
         print(f"❌ Error retrieving first and last shipment dates: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+WINDOW_RANK_USERS_BY_SHIPMENTS_SQL = """
+SELECT u.user_id, COUNT(s.shipment_id) AS TotalShipments,
+       RANK() OVER (ORDER BY COUNT(s.shipment_id) DESC) AS UserRank
+FROM Users u
+JOIN Shipments s ON u.user_id = s.user_id
+GROUP BY u.user_id;
+"""
 
 # Ranks users by total shipments handled
 def window_rank_users_by_shipments(conn):
@@ -335,27 +359,29 @@ def window_rank_users_by_shipments(conn):
     """
     print("\nRunning Window Function Query: Rank Users by Shipments Handled\n")
     
-    query = """
-    SELECT u.user_id, COUNT(s.shipment_id) AS TotalShipments,
-           RANK() OVER (ORDER BY COUNT(s.shipment_id) DESC) AS UserRank
-    FROM Users u
-    JOIN Shipments s ON u.user_id = s.user_id
-    GROUP BY u.user_id;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["User ID", "Total Shipments", "Rank"]
-                format_records(headers, results)
-            else:
-                print("⚠️ No shipment data available for ranking users.")
+        results = report_rows(conn, "window_rank_users_by_shipments")
+        if results:
+            headers = ["User ID", "Total Shipments", "Rank"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No shipment data available for ranking users.")
     except Exception as e:
         print(f"❌ Error ranking users by shipments: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+WINDOW_PERCENTILE_CUSTOMER_SHIPMENTS_SQL = """
+WITH CustomerShipmentVolume AS (
+    SELECT customer_id, COUNT(shipment_id) AS TotalShipments
+    FROM Shipments
+    GROUP BY customer_id
+)
+SELECT customer_id, TotalShipments,
+       ROUND(PERCENT_RANK() OVER (ORDER BY TotalShipments DESC), 2) AS ShipmentPercentile
+FROM CustomerShipmentVolume
+ORDER BY ShipmentPercentile;
+"""
 
 # Calculates percentile rank of customers by shipments
 def window_percentile_customer_shipments(conn):
@@ -364,31 +390,27 @@ def window_percentile_customer_shipments(conn):
     """
     print("\nRunning Window Function Query: Percentile Rank of Customers by Shipment Volume\n")
     
-    query = """
-    WITH CustomerShipmentVolume AS (
-        SELECT customer_id, COUNT(shipment_id) AS TotalShipments
-        FROM Shipments
-        GROUP BY customer_id
-    )
-    SELECT customer_id, TotalShipments,
-           ROUND(PERCENT_RANK() OVER (ORDER BY TotalShipments DESC), 2) AS ShipmentPercentile
-    FROM CustomerShipmentVolume
-    ORDER BY ShipmentPercentile;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Customer ID", "Total Shipments", "Percentile"]
-                format_records(headers, results)
-            else:
-                print("⚠️ No shipment data found for customers.")
+        results = report_rows(conn, "window_percentile_customer_shipments")
+        if results:
+            headers = ["Customer ID", "Total Shipments", "Percentile"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No shipment data found for customers.")
     except Exception as e:
         print(f"❌ Error calculating shipment percentiles: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+WINDOW_MOVING_AVERAGE_PAYMENTS_SQL = """
+SELECT MonthYear,
+       AVG(TotalPayments) OVER (ORDER BY MonthYear ROWS BETWEEN 3 PRECEDING AND CURRENT ROW) AS MovingAvgPayments
+FROM (
+    SELECT payment_period AS MonthYear, SUM(total_amount) AS TotalPayments
+    FROM PaymentMonthlySummary
+    GROUP BY payment_period
+) AS MonthlyPaymentTotals;
+"""
 
 # Calculates 4-month moving average of payment totals
 def window_moving_average_payments(conn):
@@ -397,29 +419,17 @@ def window_moving_average_payments(conn):
     """
     print("\nRunning Window Function Query: 4-Month Moving Average of Payment Totals\n")
 
-    query = """
-    SELECT MonthYear,
-           AVG(TotalPayments) OVER (ORDER BY MonthYear ROWS BETWEEN 3 PRECEDING AND CURRENT ROW) AS MovingAvgPayments
-    FROM (
-        SELECT DATE_FORMAT(payment_date, '%Y-%m') AS MonthYear, SUM(amount) AS TotalPayments
-        FROM Payments
-        GROUP BY MonthYear
-    ) AS MonthlyPaymentTotals;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Month-Year", "4-Month Moving Avg Payments"]
-                format_records(headers, results)
-            else:
-                print("⚠️ No payment data found for moving average calculation.")
+        results = report_rows(conn, "window_moving_average_payments")
+        if results:
+            headers = ["Month-Year", "4-Month Moving Avg Payments"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No payment data found for moving average calculation.")
     except Exception as e:
         print(f"❌ Error calculating 4-month moving average: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
 
 
 # Manages set operation query selection and execution
@@ -453,6 +463,17 @@ def manage_set_operations(conn):
         else:
             print("⚠️ Invalid choice. Please select a valid option from 1 to 4.")
 
+SET_UNION_CITIES_SQL = """
+-- Combine distinct cities from Pickup and Delivery locations
+SELECT DISTINCT addr.City AS City 
+FROM Pickup_Requests pr
+JOIN Addresses addr ON pr.customer_id = addr.customer_id
+UNION
+SELECT DISTINCT addr.City AS City
+FROM Shipments sh
+JOIN Addresses addr ON sh.customer_id = addr.customer_id;
+"""
+
 # Set Operation 1: UNION - Combine Distinct Cities from Pickup and Delivery Locations
 def set_union_cities(conn):
     """
@@ -461,30 +482,28 @@ def set_union_cities(conn):
     """
     print("\nRunning Set Operation: Union of Cities from Pickup and Delivery Locations\n")
     
-    query = """
-    -- Combine distinct cities from Pickup and Delivery locations
-    SELECT DISTINCT addr.City AS City 
-    FROM Pickup_Requests pr
-    JOIN Addresses addr ON pr.customer_id = addr.customer_id
-    UNION
-    SELECT DISTINCT addr.City AS City
-    FROM Shipments sh
-    JOIN Addresses addr ON sh.customer_id = addr.customer_id;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["City"]
-                format_records(headers, results)
-            else:
-                print("⚠️ No city data found in Pickup or Delivery records.")
+        results = report_rows(conn, "set_union_cities")
+        if results:
+            headers = ["City"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No city data found in Pickup or Delivery records.")
     except Exception as e:
         print(f"❌ Error performing UNION operation on cities: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+SET_INTERSECTION_PENDING_DELIVERED_CUSTOMERS_SQL = """
+-- Find customers with both 'Pending' and 'Delivered' shipments
+SELECT DISTINCT s.customer_id
+FROM Shipments s
+WHERE s.shipment_status = 'Pending'
+INTERSECT
+SELECT DISTINCT s.customer_id
+FROM Shipments s
+WHERE s.shipment_status = 'Delivered';
+"""
 
 # Set Operation 2: INTERSECT - Customers with Both 'Pending' and 'Delivered' Shipments
 def set_intersection_pending_delivered_customers(conn):
@@ -494,30 +513,26 @@ def set_intersection_pending_delivered_customers(conn):
     """
     print("\nRunning Set Operation: Intersection of Customers with 'Pending' and 'Delivered' Shipments\n")
     
-    query = """
-    -- Find customers with both 'Pending' and 'Delivered' shipments
-    SELECT DISTINCT s.customer_id
-    FROM Shipments s
-    WHERE s.shipment_status = 'Pending'
-    INTERSECT
-    SELECT DISTINCT s.customer_id
-    FROM Shipments s
-    WHERE s.shipment_status = 'Delivered';
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Customer ID"]
-                format_records(headers, results)
-            else:
-                print("⚠️ No customers found with both 'Pending' and 'Delivered' shipments.")
+        results = report_rows(conn, "set_intersection_pending_delivered_customers")
+        if results:
+            headers = ["Customer ID"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No customers found with both 'Pending' and 'Delivered' shipments.")
     except Exception as e:
         print(f"❌ Error performing INTERSECT operation on customers: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+SET_DIFFERENCE_PAYMENT_NO_PICKUP_SQL = """
+-- Find customers who made payments but have not placed pickup requests
+SELECT DISTINCT p.customer_id
+FROM Payments p
+EXCEPT
+SELECT DISTINCT pr.customer_id
+FROM Pickup_Requests pr;
+"""
 
 # Set Operation 3: EXCEPT - Customers Who Made Payments But Never Placed Pickup Requests
 def set_difference_payment_no_pickup(conn):
@@ -527,53 +542,17 @@ def set_difference_payment_no_pickup(conn):
     """
     print("\nRunning Set Operation: Difference - Customers with Payments But No Pickup Requests\n")
     
-    query = """
-    -- Find customers who made payments but have not placed pickup requests
-    SELECT DISTINCT p.customer_id
-    FROM Payments p
-    EXCEPT
-    SELECT DISTINCT pr.customer_id
-    FROM Pickup_Requests pr;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Customer ID"]
-                format_records(headers, results)
-            else:
-                print("⚠️ No customers found with payments but no pickup requests.")
+        results = report_rows(conn, "set_difference_payment_no_pickup")
+        if results:
+            headers = ["Customer ID"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No customers found with payments but no pickup requests.")
     except Exception as e:
         print(f"❌ Error performing EXCEPT operation on customers: {e}")
     finally:
-        conn.commit()
-
-# Utility Function for Formatting Records
-def format_records(headers, rows):
-    """
-    Formats and displays records in a well-aligned table format.
-    :param headers: List of column headers
-    :param rows: List of tuples containing row data
-    """
-    # Determine the width for each column based on the maximum data length
-    col_widths = [max(len(str(item)) for item in col) for col in zip(headers, *rows)]
-    
-    # Create a format string for each row
-    row_format = " | ".join(f"{{:<{width}}}" for width in col_widths)
-    
-    # Print the header
-    print("\n" + "=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-    print(row_format.format(*headers))
-    print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-    
-    # Print each row with formatted columns
-    for row in rows:
-        print(row_format.format(*row))
-    
-    # Print the footer
-    print("=" * (sum(col_widths) + 3 * (len(headers) - 1)))
+        finish_read(conn)
 
 # Handles set membership query selection and execution
 def manage_set_membership_queries(conn):
@@ -606,6 +585,13 @@ def manage_set_membership_queries(conn):
         else:
             print("⚠️ Invalid choice. Please select a valid option from 1 to 4.")
 
+CUSTOMERS_WITH_PENDING_PICKUPS_SQL = """
+SELECT DISTINCT pr.customer_id, c.first_name, c.last_name
+FROM Pickup_Requests pr
+JOIN Customers c ON pr.customer_id = c.customer_id
+WHERE pr.pickup_status = 'Pending';
+"""
+
 # Finds customers with pending pickup requests
 def customers_with_pending_pickups(conn):
     """
@@ -613,36 +599,26 @@ def customers_with_pending_pickups(conn):
     """
     print("\nRunning Set Membership Query: Customers with 'Pending' Pickup Requests\n")
     
-    query = """
-    SELECT DISTINCT pr.customer_id, c.first_name, c.last_name
-    FROM Pickup_Requests pr
-    JOIN Customers c ON pr.customer_id = c.customer_id
-    WHERE pr.pickup_status = 'Pending';
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Customer ID", "First Name", "Last Name"]
-                col_widths = [max(len(str(item)) for item in col) for col in zip(headers, *results)]
-                row_format = " | ".join(f"{{:<{width}}}" for width in col_widths)
-                
-                print("\n" + "=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                print(row_format.format(*headers))
-                print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                
-                for row in results:
-                    print(row_format.format(*row))
-                
-                print("=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-            else:
-                print("⚠️ No customers with pending pickup requests.")
+        results = report_rows(conn, "customers_with_pending_pickups")
+        if results:
+            headers = ["Customer ID", "First Name", "Last Name"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No customers with pending pickup requests.")
     except Exception as e:
         print(f"❌ Error retrieving customers with pending pickups: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+CUSTOMERS_WITH_NO_SHIPMENTS_SQL = """
+SELECT DISTINCT c.customer_id, c.first_name, c.last_name
+FROM Customers c
+WHERE c.customer_id NOT IN (
+    SELECT DISTINCT s.customer_id
+    FROM Shipments s
+);
+"""
 
 # Identifies customers without any shipments
 def customers_with_no_shipments(conn):
@@ -651,38 +627,92 @@ def customers_with_no_shipments(conn):
     """
     print("\nRunning Set Membership Query: Customers with No Shipments\n")
     
-    query = """
-    SELECT DISTINCT c.customer_id, c.first_name, c.last_name
-    FROM Customers c
-    WHERE c.customer_id NOT IN (
-        SELECT DISTINCT s.customer_id
-        FROM Shipments s
-    );
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Customer ID", "First Name", "Last Name"]
-                col_widths = [max(len(str(item)) for item in col) for col in zip(headers, *results)]
-                row_format = " | ".join(f"{{:<{width}}}" for width in col_widths)
-                
-                print("\n" + "=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                print(row_format.format(*headers))
-                print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                
-                for row in results:
-                    print(row_format.format(*row))
-                
-                print("=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-            else:
-                print("⚠️ All customers have shipments.")
+        results = report_rows(conn, "customers_with_no_shipments")
+        if results:
+            headers = ["Customer ID", "First Name", "Last Name"]
+            render_table(headers, results)
+        else:
+            print("⚠️ All customers have shipments.")
     except Exception as e:
         print(f"❌ Error retrieving customers with no shipments: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+# Shipment IDs per IN (...) list; shorter lists are padded to the next power of two
+# so only a handful of statement shapes are ever prepared
+SHIPMENT_ID_CHUNK_SIZE = 512
+
+# Above this many shipment IDs they are loaded into a temporary table and joined
+SHIPMENT_ID_TEMP_TABLE_THRESHOLD = 2048
+
+PACKAGES_FOR_SHIPMENT_IDS_SQL = """
+SELECT p.shipment_id, p.package_id, p.contents_description, p.weight
+FROM Packages p
+WHERE p.shipment_id IN ({placeholders})
+"""
+
+PACKAGES_FOR_MANIFEST_SQL = """
+SELECT p.shipment_id, p.package_id, p.contents_description, p.weight
+FROM ManifestShipments m
+JOIN Packages p ON p.shipment_id = m.shipment_id
+"""
+
+# Function to stream the packages of many shipments
+def stream_packages_for_shipments(connection, shipment_ids, chunk_size=SHIPMENT_ID_CHUNK_SIZE,
+                                  temp_table_threshold=SHIPMENT_ID_TEMP_TABLE_THRESHOLD):
+    """
+    Yields (shipment_id, package_id, contents_description, weight) for every
+    package of the given shipments, for lists of any size (truck manifests).
+
+    Up to `temp_table_threshold` distinct IDs are sent as parameterized IN lists
+    of at most `chunk_size` IDs. Each list is padded (by repeating its last ID) to
+    the next power of two, so the prepared statement cache reuses a few statement
+    shapes. Longer lists are inserted into the per-connection temporary table
+    ManifestShipments and joined, and the join is streamed on an unbuffered
+    cursor.
+
+    Parameters:
+        connection - a ConnectionPool (a connection is held until the stream ends)
+                     or a MySQL connection object
+        shipment_ids - iterable of shipment IDs (ints or numeric strings);
+                       duplicates are ignored
+
+    Rows come back grouped by chunk, in no particular order within one. A failing
+    chunk raises instead of ending the stream early.
+    """
+    ids = list(dict.fromkeys(int(shipment_id) for shipment_id in shipment_ids))
+    if not ids:
+        return
+    with borrow_connection(connection) as conn:
+        if len(ids) > temp_table_threshold:
+            yield from _stream_manifest_join(conn, ids)
+            return
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            width = min(1 << (len(chunk) - 1).bit_length(), chunk_size)
+            chunk += [chunk[-1]] * (width - len(chunk))
+            query = PACKAGES_FOR_SHIPMENT_IDS_SQL.format(placeholders=", ".join(["%s"] * width))
+            rows = execute_query(conn, query, tuple(chunk), select=True)
+            if rows is None:
+                raise RuntimeError(f"Reading packages failed after {start} of {len(ids)} shipments")
+            yield from rows
+
+def _stream_manifest_join(conn, ids):
+    # Temporary tables belong to the session, so every statement runs on `conn`
+    drop = ("DROP TABLE IF EXISTS temp.ManifestShipments" if dialect_of(conn) == "sqlite"
+            else "DROP TEMPORARY TABLE IF EXISTS ManifestShipments")
+    with open_cursor(conn) as cursor:
+        cursor.execute(drop)
+        cursor.execute("CREATE TEMPORARY TABLE ManifestShipments (shipment_id INTEGER PRIMARY KEY)")
+        for start in range(0, len(ids), BULK_BATCH_SIZE):
+            cursor.executemany("INSERT INTO ManifestShipments (shipment_id) VALUES (%s)",
+                               [(shipment_id,) for shipment_id in ids[start:start + BULK_BATCH_SIZE]])
+    try:
+        yield from stream_query(conn, PACKAGES_FOR_MANIFEST_SQL)
+    finally:
+        with open_cursor(conn) as cursor:
+            cursor.execute(drop)
 
 # Retrieves packages for specified shipment IDs
 def packages_in_specific_shipments(conn):
@@ -691,36 +721,24 @@ def packages_in_specific_shipments(conn):
     """
     print("\nRunning Set Membership Query: Packages Assigned to Specific Shipments\n")
     
-    shipment_ids = input("Enter comma-separated Shipment IDs: ").strip()
-    query = f"""
-    SELECT p.package_id, p.contents_description, p.weight
-    FROM Packages p
-    WHERE p.shipment_id IN ({shipment_ids});
-    """
+    entered = [token.strip() for token in input("Enter comma-separated Shipment IDs: ").split(",")]
+    shipment_ids = [int(token) for token in entered if token.isdigit()]
+    invalid = [token for token in entered if token and not token.isdigit()]
+    if invalid:
+        print(f"⚠️ Ignoring invalid Shipment IDs: {', '.join(invalid)}")
+    if not shipment_ids:
+        print("⚠️ No valid Shipment IDs entered.")
+        return
     
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Package ID", "Description", "Weight (kg)"]
-                col_widths = [max(len(str(item)) for item in col) for col in zip(headers, *results)]
-                row_format = " | ".join(f"{{:<{width}}}" for width in col_widths)
-                
-                print("\n" + "=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                print(row_format.format(*headers))
-                print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                
-                for row in results:
-                    print(row_format.format(*row))
-                
-                print("=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-            else:
-                print("⚠️ No packages found for the specified shipments.")
+        # Rows are streamed straight into the table instead of fetched all at once
+        headers = ["Shipment ID", "Package ID", "Description", "Weight (kg)"]
+        if not render_table(headers, stream_packages_for_shipments(conn, shipment_ids)):
+            print("⚠️ No packages found for the specified shipments.")
     except Exception as e:
         print(f"❌ Error retrieving packages for specific shipments: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
 
 
 
@@ -755,6 +773,13 @@ def manage_set_comparison_queries(conn):
         else:
             print("⚠️ Invalid choice. Please select a valid option from 1 to 4.")
 
+CUSTOMERS_WITH_PICKUP_AND_DELIVERY_SQL = """
+SELECT DISTINCT pr.customer_id, c.first_name, c.last_name
+FROM Pickup_Requests pr
+JOIN Shipments s ON pr.customer_id = s.customer_id
+JOIN Customers c ON pr.customer_id = c.customer_id;
+"""
+
 # Finds customers with both pickup and delivery
 def customers_with_pickup_and_delivery(conn):
     """
@@ -762,36 +787,23 @@ def customers_with_pickup_and_delivery(conn):
     """
     print("\nRunning Set Comparison Query: Customers with Pickup and Delivery Records\n")
     
-    query = """
-    SELECT DISTINCT pr.customer_id, c.first_name, c.last_name
-    FROM Pickup_Requests pr
-    JOIN Shipments s ON pr.customer_id = s.customer_id
-    JOIN Customers c ON pr.customer_id = c.customer_id;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Customer ID", "First Name", "Last Name"]
-                col_widths = [max(len(str(item)) for item in col) for col in zip(headers, *results)]
-                row_format = " | ".join(f"{{:<{width}}}" for width in col_widths)
-                
-                print("\n" + "=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                print(row_format.format(*headers))
-                print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                
-                for row in results:
-                    print(row_format.format(*row))
-                
-                print("=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-            else:
-                print("⚠️ No customers found with both pickup and delivery records.")
+        results = report_rows(conn, "customers_with_pickup_and_delivery")
+        if results:
+            headers = ["Customer ID", "First Name", "Last Name"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No customers found with both pickup and delivery records.")
     except Exception as e:
         print(f"❌ Error retrieving customers with pickup and delivery records: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+PACKAGES_WITH_CONSIGNMENT_DELIVERY_INFO_SQL = """
+SELECT DISTINCT p.package_id, p.contents_description, p.weight, ps.status_type
+FROM Packages p
+JOIN PackageStatus ps ON p.package_id = ps.package_id;
+"""
 
 # Retrieves packages with consignment and delivery information
 def packages_with_consignment_delivery_info(conn):
@@ -800,35 +812,25 @@ def packages_with_consignment_delivery_info(conn):
     """
     print("\nRunning Set Comparison Query: Packages with Consignment and Delivery Information\n")
     
-    query = """
-    SELECT DISTINCT p.package_id, p.contents_description, p.weight, ps.status_type
-    FROM Packages p
-    JOIN PackageStatus ps ON p.package_id = ps.package_id;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["Package ID", "Description", "Weight (kg)", "Status Type"]
-                col_widths = [max(len(str(item)) for item in col) for col in zip(headers, *results)]
-                row_format = " | ".join(f"{{:<{width}}}" for width in col_widths)
-                
-                print("\n" + "=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                print(row_format.format(*headers))
-                print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                
-                for row in results:
-                    print(row_format.format(*row))
-                
-                print("=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-            else:
-                print("⚠️ No packages with consignment and delivery information.")
+        results = report_rows(conn, "packages_with_consignment_delivery_info")
+        if results:
+            headers = ["Package ID", "Description", "Weight (kg)", "Status Type"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No packages with consignment and delivery information.")
     except Exception as e:
         print(f"❌ Error retrieving packages with consignment and delivery information: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+USERS_WITH_MULTIPLE_SHIPMENTS_SQL = """
+SELECT u.user_id, u.first_name, u.last_name, COUNT(s.shipment_id) AS ShipmentCount
+FROM Users u
+JOIN Shipments s ON u.user_id = s.user_id
+GROUP BY u.user_id
+HAVING COUNT(s.shipment_id) > 1;
+"""
 
 # Identifies users associated with multiple shipments
 def users_with_multiple_shipments(conn):
@@ -837,37 +839,17 @@ def users_with_multiple_shipments(conn):
     """
     print("\nRunning Set Comparison Query: Users Associated with Multiple Shipments\n")
     
-    query = """
-    SELECT u.user_id, u.first_name, u.last_name, COUNT(s.shipment_id) AS ShipmentCount
-    FROM Users u
-    JOIN Shipments s ON u.user_id = s.user_id
-    GROUP BY u.user_id
-    HAVING COUNT(s.shipment_id) > 1;
-    """
-    
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                headers = ["User ID", "First Name", "Last Name", "Number of Shipments"]
-                col_widths = [max(len(str(item)) for item in col) for col in zip(headers, *results)]
-                row_format = " | ".join(f"{{:<{width}}}" for width in col_widths)
-                
-                print("\n" + "=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                print(row_format.format(*headers))
-                print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-                
-                for row in results:
-                    print(row_format.format(*row))
-                
-                print("=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-            else:
-                print("⚠️ No users found with multiple shipments.")
+        results = report_rows(conn, "users_with_multiple_shipments")
+        if results:
+            headers = ["User ID", "First Name", "Last Name", "Number of Shipments"]
+            render_table(headers, results)
+        else:
+            print("⚠️ No users found with multiple shipments.")
     except Exception as e:
         print(f"❌ Error retrieving users with multiple shipments: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
 
 # Manages advanced aggregate function query selection
 def manage_advanced_aggregate_functions(conn):
@@ -884,10 +866,12 @@ def manage_advanced_aggregate_functions(conn):
         print("2. Compute Moving Average of Daily Shipment Volumes")
         print("3. Determine Median Payment Amount per Customer")
         print("4. Analyze Shipment Frequency Distribution")
-        print("5. 🔙 Return to Complex Queries Menu")
+        print("5. Approximate Percentiles of Shipment Weights (sketch)")
+        print("6. Approximate Median Payment Amount per Customer (sketch)")
+        print("7. 🔙 Return to Complex Queries Menu")
         print("=" * 50)
         
-        choice = input("👉 Select an option (1-5): ").strip()
+        choice = input("👉 Select an option (1-7): ").strip()
         
         if choice == "1":
             calculate_shipment_weight_percentiles(conn)
@@ -898,160 +882,221 @@ def manage_advanced_aggregate_functions(conn):
         elif choice == "4":
             analyze_shipment_frequency(conn)
         elif choice == "5":
+            calculate_shipment_weight_percentiles(conn, approximate=True)
+        elif choice == "6":
+            determine_median_payment(conn, approximate=True)
+        elif choice == "7":
             print("🔙 Returning to Complex Queries Menu.")
             break
         else:
-            print("⚠️ Invalid choice. Please select a valid option from 1 to 6.")
+            print("⚠️ Invalid choice. Please select a valid option from 1 to 7.")
 
 
+CALCULATE_SHIPMENT_WEIGHT_PERCENTILES_SQL = """
+WITH WeightRanks AS (
+    SELECT weight, PERCENT_RANK() OVER (ORDER BY weight) AS percentile
+    FROM Packages
+)
+SELECT 
+    ROUND(MIN(CASE WHEN percentile >= 0.25 THEN weight END), 2) AS '25th_Percentile',
+    ROUND(MIN(CASE WHEN percentile >= 0.50 THEN weight END), 2) AS '50th_Percentile',
+    ROUND(MIN(CASE WHEN percentile >= 0.75 THEN weight END), 2) AS '75th_Percentile',
+    ROUND(MIN(CASE WHEN percentile >= 0.90 THEN weight END), 2) AS '90th_Percentile'
+FROM WeightRanks;
+"""
+
 # Calculates percentiles of shipment weights
-def calculate_shipment_weight_percentiles(conn):
+def calculate_shipment_weight_percentiles(conn, approximate=False):
+    """Prints the weight percentiles; approximate=True reads the weight sketch instead of Packages."""
+    if approximate:
+        return approximate_shipment_weight_percentiles(conn)
     print("\nCalculating Percentiles of Shipment Weights...")
-    query = """
-    WITH WeightRanks AS (
-        SELECT weight, PERCENT_RANK() OVER (ORDER BY weight) AS percentile
-        FROM Packages
-    )
-    SELECT 
-        ROUND(MIN(CASE WHEN percentile >= 0.25 THEN weight END), 2) AS '25th_Percentile',
-        ROUND(MIN(CASE WHEN percentile >= 0.50 THEN weight END), 2) AS '50th_Percentile',
-        ROUND(MIN(CASE WHEN percentile >= 0.75 THEN weight END), 2) AS '75th_Percentile',
-        ROUND(MIN(CASE WHEN percentile >= 0.90 THEN weight END), 2) AS '90th_Percentile'
-    FROM WeightRanks;
-    """
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            result = cursor.fetchone()
-            if result:
-                print("\nShipment Weight Percentiles:")
-                print(f"25th Percentile: {result[0]} kg")
-                print(f"50th Percentile (Median): {result[1]} kg")
-                print(f"75th Percentile: {result[2]} kg")
-                print(f"90th Percentile: {result[3]} kg")
-            else:
-                print("No data available for shipment weight percentiles.")
+        rows = report_rows(conn, "calculate_shipment_weight_percentiles")
+        result = rows[0] if rows else None
+        if result:
+            print("\nShipment Weight Percentiles:")
+            print(f"25th Percentile: {result[0]} kg")
+            print(f"50th Percentile (Median): {result[1]} kg")
+            print(f"75th Percentile: {result[2]} kg")
+            print(f"90th Percentile: {result[3]} kg")
+        else:
+            print("No data available for shipment weight percentiles.")
     except Exception as e:
         print(f"Error calculating shipment weight percentiles: {e}")
 
+# Estimates percentiles of shipment weights from the stored sketch
+def approximate_shipment_weight_percentiles(conn):
+    print("\nEstimating Percentiles of Shipment Weights from the weight sketch...")
+    try:
+        estimate = approximate_quantiles(conn, PACKAGE_WEIGHT_SKETCH, (0.25, 0.50, 0.75, 0.90))
+        if estimate:
+            values, count, error = estimate
+            print("\nApproximate Shipment Weight Percentiles:")
+            print(f"25th Percentile: ~{values[0]:.2f} kg")
+            print(f"50th Percentile (Median): ~{values[1]:.2f} kg")
+            print(f"75th Percentile: ~{values[2]:.2f} kg")
+            print(f"90th Percentile: ~{values[3]:.2f} kg")
+            print(f"Estimated from {count} weights; each value's rank is within ±{error:.1%} (99% confidence).")
+        else:
+            print("No data available for shipment weight percentiles.")
+    except Exception as e:
+        print(f"Error estimating shipment weight percentiles: {e}")
+
+COMPUTE_MOVING_AVERAGE_SHIPMENTS_SQL = """
+WITH DailyShipments AS (
+    SELECT shipment_day AS ship_date, COUNT(*) AS daily_count
+    FROM Shipments
+    GROUP BY shipment_day
+)
+SELECT 
+    ship_date,
+    daily_count,
+    AVG(daily_count) OVER (
+        ORDER BY ship_date
+        ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+    ) AS moving_average
+FROM DailyShipments
+ORDER BY ship_date DESC
+LIMIT 30;
+"""
+
+# Same report before the date bucket columns were added (see date_buckets)
+COMPUTE_MOVING_AVERAGE_SHIPMENTS_UNBUCKETED_SQL = """
+WITH DailyShipments AS (
+    SELECT DATE(shipment_date) AS ship_date, COUNT(*) AS daily_count
+    FROM Shipments
+    GROUP BY DATE(shipment_date)
+)
+SELECT 
+    ship_date,
+    daily_count,
+    AVG(daily_count) OVER (
+        ORDER BY ship_date
+        ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+    ) AS moving_average
+FROM DailyShipments
+ORDER BY ship_date DESC
+LIMIT 30;
+"""
+
 # Computes moving average of daily shipment volumes
 def compute_moving_average_shipments(conn):
     print("\nComputing 7-Day Moving Average of Daily Shipment Volumes...")
-    query = """
-    WITH DailyShipments AS (
-        SELECT DATE(shipment_date) AS ship_date, COUNT(*) AS daily_count
-        FROM Shipments
-        GROUP BY DATE(shipment_date)
-    )
-    SELECT 
-        ship_date,
-        daily_count,
-        AVG(daily_count) OVER (
-            ORDER BY ship_date
-            ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
-        ) AS moving_average
-    FROM DailyShipments
-    ORDER BY ship_date DESC
-    LIMIT 30;
-    """
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                print("\nLast 30 days of 7-Day Moving Average of Shipment Volumes:")
-                print("Date".ljust(15) + "Daily Count".ljust(15) + "Moving Average")
-                print("-" * 45)
-                for row in results:
-                    print(f"{row[0].strftime('%Y-%m-%d').ljust(15)}{str(row[1]).ljust(15)}{row[2]:.2f}")
-            else:
-                print("No data available for shipment volume moving average.")
+        results = report_rows(conn, "compute_moving_average_shipments")
+        if results:
+            print("\nLast 30 days of 7-Day Moving Average of Shipment Volumes:")
+            print("Date".ljust(15) + "Daily Count".ljust(15) + "Moving Average")
+            print("-" * 45)
+            for row in results:
+                print(f"{str(row[0])[:10].ljust(15)}{str(row[1]).ljust(15)}{row[2]:.2f}")
+        else:
+            print("No data available for shipment volume moving average.")
     except Exception as e:
         print(f"Error computing moving average of shipments: {e}")
 
+DETERMINE_MEDIAN_PAYMENT_SQL = """
+WITH CustomerPayments AS (
+    SELECT customer_id, amount,
+        ROW_NUMBER() OVER (PARTITION BY customer_id ORDER BY amount) AS row_num,
+        COUNT(*) OVER (PARTITION BY customer_id) AS count
+    FROM Payments
+)
+SELECT 
+    customer_id,
+    AVG(amount) AS median_payment
+FROM CustomerPayments
+WHERE 
+    row_num IN (FLOOR((count + 1)/2.0), CEIL((count + 1)/2.0))
+GROUP BY customer_id
+ORDER BY median_payment DESC
+LIMIT 10;
+"""
+
 # Calculates median payment amount per customer
-def determine_median_payment(conn):
+def determine_median_payment(conn, approximate=False):
+    """Prints the top median payments; approximate=True reads the per-customer amount sketches."""
+    if approximate:
+        return approximate_median_payment(conn)
     print("\nDetermining Median Payment Amount per Customer...")
-    query = """
-    WITH CustomerPayments AS (
-        SELECT customer_id, amount,
-            ROW_NUMBER() OVER (PARTITION BY customer_id ORDER BY amount) AS row_num,
-            COUNT(*) OVER (PARTITION BY customer_id) AS count
-        FROM Payments
-    )
-    SELECT 
-        customer_id,
-        AVG(amount) AS median_payment
-    FROM CustomerPayments
-    WHERE 
-        row_num IN (FLOOR((count + 1)/2), CEIL((count + 1)/2))
-    GROUP BY customer_id
-    ORDER BY median_payment DESC
-    LIMIT 10;
-    """
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                print("\nTop 10 Customers by Median Payment Amount:")
-                print("Customer ID".ljust(15) + "Median Payment")
-                print("-" * 30)
-                for row in results:
-                    print(f"{str(row[0]).ljust(15)}${row[1]:.2f}")
-            else:
-                print("No data available for median payment calculation.")
+        results = report_rows(conn, "determine_median_payment")
+        if results:
+            print("\nTop 10 Customers by Median Payment Amount:")
+            print("Customer ID".ljust(15) + "Median Payment")
+            print("-" * 30)
+            for row in results:
+                print(f"{str(row[0]).ljust(15)}${row[1]:.2f}")
+        else:
+            print("No data available for median payment calculation.")
     except Exception as e:
         print(f"Error determining median payment: {e}")
 
+# Estimates median payment amount per customer from the stored sketches
+def approximate_median_payment(conn):
+    print("\nEstimating Median Payment Amount per Customer from the amount sketches...")
+    try:
+        results = top_approximate_medians(conn, PAYMENT_AMOUNT_SKETCH)
+        if results:
+            print("\nTop 10 Customers by Approximate Median Payment Amount:")
+            print("Customer ID".ljust(15) + "Median Payment".ljust(20) + "Payments")
+            print("-" * 45)
+            for row in results:
+                print(f"{str(row[0]).ljust(15)}{f'~${row[1]:.2f}'.ljust(20)}{row[2]}")
+            print(f"Each median's rank is within ±{sketch_rank_error():.1%} (99% confidence).")
+        else:
+            print("No data available for median payment calculation.")
+    except Exception as e:
+        print(f"Error estimating median payment: {e}")
+
+ANALYZE_SHIPMENT_FREQUENCY_SQL = """
+WITH CustomerShipments AS (
+    SELECT 
+        customer_id,
+        COUNT(*) AS shipment_count
+    FROM Shipments
+    GROUP BY customer_id
+)
+SELECT 
+    CASE 
+        WHEN shipment_count BETWEEN 1 AND 5 THEN '1-5'
+        WHEN shipment_count BETWEEN 6 AND 10 THEN '6-10'
+        WHEN shipment_count BETWEEN 11 AND 20 THEN '11-20'
+        WHEN shipment_count > 20 THEN '20+'
+    END AS shipment_range,
+    COUNT(*) AS customer_count,
+    ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) AS percentage
+FROM CustomerShipments
+GROUP BY 
+    CASE 
+        WHEN shipment_count BETWEEN 1 AND 5 THEN '1-5'
+        WHEN shipment_count BETWEEN 6 AND 10 THEN '6-10'
+        WHEN shipment_count BETWEEN 11 AND 20 THEN '11-20'
+        WHEN shipment_count > 20 THEN '20+'
+    END
+ORDER BY 
+    CASE shipment_range
+        WHEN '1-5' THEN 1
+        WHEN '6-10' THEN 2
+        WHEN '11-20' THEN 3
+        WHEN '20+' THEN 4
+    END;
+"""
+
 # Analyzes distribution of shipment frequencies
 def analyze_shipment_frequency(conn):
     print("\nAnalyzing Shipment Frequency Distribution...")
-    query = """
-    WITH CustomerShipments AS (
-        SELECT 
-            customer_id,
-            COUNT(*) AS shipment_count
-        FROM Shipments
-        GROUP BY customer_id
-    )
-    SELECT 
-        CASE 
-            WHEN shipment_count BETWEEN 1 AND 5 THEN '1-5'
-            WHEN shipment_count BETWEEN 6 AND 10 THEN '6-10'
-            WHEN shipment_count BETWEEN 11 AND 20 THEN '11-20'
-            WHEN shipment_count > 20 THEN '20+'
-        END AS shipment_range,
-        COUNT(*) AS customer_count,
-        ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) AS percentage
-    FROM CustomerShipments
-    GROUP BY 
-        CASE 
-            WHEN shipment_count BETWEEN 1 AND 5 THEN '1-5'
-            WHEN shipment_count BETWEEN 6 AND 10 THEN '6-10'
-            WHEN shipment_count BETWEEN 11 AND 20 THEN '11-20'
-            WHEN shipment_count > 20 THEN '20+'
-        END
-    ORDER BY 
-        CASE shipment_range
-            WHEN '1-5' THEN 1
-            WHEN '6-10' THEN 2
-            WHEN '11-20' THEN 3
-            WHEN '20+' THEN 4
-        END;
-    """
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                print("\nShipment Frequency Distribution:")
-                print("Shipment Range".ljust(20) + "Customer Count".ljust(20) + "Percentage")
-                print("-" * 60)
-                for row in results:
-                    print(f"{row[0].ljust(20)}{str(row[1]).ljust(20)}{row[2]}%")
-            else:
-                print("No data available for shipment frequency analysis.")
+        results = report_rows(conn, "analyze_shipment_frequency")
+        if results:
+            print("\nShipment Frequency Distribution:")
+            print("Shipment Range".ljust(20) + "Customer Count".ljust(20) + "Percentage")
+            print("-" * 60)
+            for row in results:
+                print(f"{row[0].ljust(20)}{str(row[1]).ljust(20)}{row[2]}%")
+        else:
+            print("No data available for shipment frequency analysis.")
     except Exception as e:
         print(f"Error analyzing shipment frequency: {e}")
 
@@ -1092,221 +1137,431 @@ def manage_with_clause_subqueries(conn):
         else:
             print("⚠️ Invalid choice. Please select a valid option from 1 to 6.")
 
+ANALYZE_CUSTOMER_SHIPMENT_PATTERNS_SQL = """
+WITH CustomerShipments AS (
+    SELECT 
+        c.customer_id,
+        c.first_name,
+        c.last_name,
+        COUNT(s.shipment_id) AS total_shipments,
+        AVG(p.weight) AS avg_package_weight,
+        SUM(CASE WHEN s.shipment_type = 'Express' THEN 1 ELSE 0 END) AS express_shipments
+    FROM Customers c
+    JOIN Shipments s ON c.customer_id = s.customer_id
+    JOIN Packages p ON s.shipment_id = p.shipment_id
+    GROUP BY c.customer_id, c.first_name, c.last_name
+)
+SELECT 
+    customer_id,
+    CONCAT(first_name, ' ', last_name) AS customer_name,
+    total_shipments,
+    ROUND(avg_package_weight, 2) AS avg_package_weight,
+    express_shipments,
+    ROUND(express_shipments * 100.0 / total_shipments, 2) AS express_percentage
+FROM CustomerShipments
+ORDER BY total_shipments DESC
+LIMIT 10;
+"""
+
 # Examines customer shipping behaviors and preferences
 def analyze_customer_shipment_patterns(conn):
     print("\nAnalyzing Customer Shipment Patterns...")
-    query = """
-    WITH CustomerShipments AS (
-        SELECT 
-            c.customer_id,
-            c.first_name,
-            c.last_name,
-            COUNT(s.shipment_id) AS total_shipments,
-            AVG(p.weight) AS avg_package_weight,
-            SUM(CASE WHEN s.shipment_type = 'Express' THEN 1 ELSE 0 END) AS express_shipments
-        FROM Customers c
-        JOIN Shipments s ON c.customer_id = s.customer_id
-        JOIN Packages p ON s.shipment_id = p.shipment_id
-        GROUP BY c.customer_id, c.first_name, c.last_name
-    )
-    SELECT 
-        customer_id,
-        CONCAT(first_name, ' ', last_name) AS customer_name,
-        total_shipments,
-        ROUND(avg_package_weight, 2) AS avg_package_weight,
-        express_shipments,
-        ROUND(express_shipments * 100.0 / total_shipments, 2) AS express_percentage
-    FROM CustomerShipments
-    ORDER BY total_shipments DESC
-    LIMIT 10;
-    """
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                print("\nTop 10 Customers by Shipment Patterns:")
-                headers = ["Customer ID", "Name", "Total Shipments", "Avg Weight (kg)", "Express Shipments", "Express %"]
-                format_records(headers, results)
-            else:
-                print("No data available for customer shipment patterns.")
+        results = report_rows(conn, "analyze_customer_shipment_patterns")
+        if results:
+            print("\nTop 10 Customers by Shipment Patterns:")
+            headers = ["Customer ID", "Name", "Total Shipments", "Avg Weight (kg)", "Express Shipments", "Express %"]
+            render_table(headers, results)
+        else:
+            print("No data available for customer shipment patterns.")
     except Exception as e:
         print(f"Error analyzing customer shipment patterns: {e}")
 
+CALCULATE_PACKAGE_DELIVERY_EFFICIENCY_SQL = """
+WITH DeliveryStats AS (
+    SELECT 
+        s.shipment_id,
+        s.shipment_date,
+        MAX(CASE WHEN da.attempt_status = 'Delivered' THEN da.attempt_date END) AS delivery_date,
+        COUNT(da.attempt_id) AS delivery_attempts
+    FROM Shipments s
+    LEFT JOIN DeliveryAttempts da ON s.shipment_id = da.shipment_id
+    GROUP BY s.shipment_id, s.shipment_date
+)
+SELECT 
+    AVG(DATEDIFF(delivery_date, shipment_date)) AS avg_delivery_days,
+    AVG(delivery_attempts) AS avg_delivery_attempts,
+    SUM(CASE WHEN delivery_date IS NOT NULL THEN 1 ELSE 0 END) * 100.0 / COUNT(*) AS successful_delivery_percentage
+FROM DeliveryStats;
+"""
+
 # Measures efficiency of package delivery process
 def calculate_package_delivery_efficiency(conn):
     print("\nCalculating Package Delivery Efficiency...")
-    query = """
-    WITH DeliveryStats AS (
-        SELECT 
-            s.shipment_id,
-            s.shipment_date,
-            MAX(CASE WHEN da.attempt_status = 'Delivered' THEN da.attempt_date END) AS delivery_date,
-            COUNT(da.attempt_id) AS delivery_attempts
-        FROM Shipments s
-        LEFT JOIN DeliveryAttempts da ON s.shipment_id = da.shipment_id
-        GROUP BY s.shipment_id, s.shipment_date
-    )
-    SELECT 
-        AVG(DATEDIFF(delivery_date, shipment_date)) AS avg_delivery_days,
-        AVG(delivery_attempts) AS avg_delivery_attempts,
-        SUM(CASE WHEN delivery_date IS NOT NULL THEN 1 ELSE 0 END) * 100.0 / COUNT(*) AS successful_delivery_percentage
-    FROM DeliveryStats;
-    """
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            result = cursor.fetchone()
-            if result:
-                avg_delivery_days = result[0] if result[0] is not None else "N/A"
-                avg_delivery_attempts = result[1] if result[1] is not None else "N/A"
-                successful_delivery_percentage = result[2] if result[2] is not None else "N/A"
-                
-                print("\nPackage Delivery Efficiency Metrics:")
-                print(f"Average Delivery Time: {avg_delivery_days} days")
-                print(f"Average Delivery Attempts: {avg_delivery_attempts}")
-                print(f"Successful Delivery Percentage: {successful_delivery_percentage}%")
-            else:
-                print("No data available for package delivery efficiency calculation.")
+        rows = report_rows(conn, "calculate_package_delivery_efficiency")
+        result = rows[0] if rows else None
+        if result:
+            avg_delivery_days = result[0] if result[0] is not None else "N/A"
+            avg_delivery_attempts = result[1] if result[1] is not None else "N/A"
+            successful_delivery_percentage = result[2] if result[2] is not None else "N/A"
+            
+            print("\nPackage Delivery Efficiency Metrics:")
+            print(f"Average Delivery Time: {avg_delivery_days} days")
+            print(f"Average Delivery Attempts: {avg_delivery_attempts}")
+            print(f"Successful Delivery Percentage: {successful_delivery_percentage}%")
+        else:
+            print("No data available for package delivery efficiency calculation.")
     except Exception as e:
         print(f"❌ Error calculating package delivery efficiency: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+IDENTIFY_TOP_PERFORMING_PERSONNEL_SQL = """
+WITH PersonnelPerformance AS (
+    SELECT 
+        u.user_id,
+        CONCAT(u.first_name, ' ', u.last_name) AS employee_name,
+        COUNT(s.shipment_id) AS total_shipments,
+        AVG(CASE WHEN da.attempt_status = 'Delivered' THEN 1 ELSE 0 END) AS delivery_success_rate,
+        AVG(DATEDIFF(da.attempt_date, s.shipment_date)) AS avg_delivery_time
+    FROM Users u
+    JOIN Shipments s ON u.user_id = s.user_id
+    LEFT JOIN DeliveryAttempts da ON s.shipment_id = da.shipment_id
+    WHERE u.role_id = (SELECT role_id FROM User_Role WHERE role_name = 'Delivery Personnel')
+    GROUP BY u.user_id, u.first_name, u.last_name
+)
+SELECT 
+    employee_name,
+    total_shipments,
+    ROUND(delivery_success_rate * 100, 2) AS success_rate_percentage,
+    ROUND(avg_delivery_time, 1) AS avg_delivery_days
+FROM PersonnelPerformance
+ORDER BY delivery_success_rate DESC, total_shipments DESC
+LIMIT 10;
+"""
 
 # Finds top-performing employees based on metrics
 def identify_top_performing_personnel(conn):
     print("\nIdentifying Top-Performing Delivery Personnel...")
-    query = """
-    WITH PersonnelPerformance AS (
-        SELECT 
-            u.user_id,
-            CONCAT(u.first_name, ' ', u.last_name) AS employee_name,
-            COUNT(s.shipment_id) AS total_shipments,
-            AVG(CASE WHEN da.attempt_status = 'Delivered' THEN 1 ELSE 0 END) AS delivery_success_rate,
-            AVG(DATEDIFF(da.attempt_date, s.shipment_date)) AS avg_delivery_time
-        FROM Users u
-        JOIN Shipments s ON u.user_id = s.user_id
-        LEFT JOIN DeliveryAttempts da ON s.shipment_id = da.shipment_id
-        WHERE u.role_id = (SELECT role_id FROM User_Role WHERE role_name = 'Delivery Personnel')
-        GROUP BY u.user_id, u.first_name, u.last_name
-    )
-    SELECT 
-        employee_name,
-        total_shipments,
-        ROUND(delivery_success_rate * 100, 2) AS success_rate_percentage,
-        ROUND(avg_delivery_time, 1) AS avg_delivery_days
-    FROM PersonnelPerformance
-    ORDER BY delivery_success_rate DESC, total_shipments DESC
-    LIMIT 10;
-    """
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                print("\nTop 10 Performing Delivery Personnel:")
-                headers = ["Employee Name", "Total Shipments", "Success Rate (%)", "Avg Delivery Time (days)"]
-                format_records(headers, results)
-            else:
-                print("No data available for delivery personnel performance.")
+        results = report_rows(conn, "identify_top_performing_personnel")
+        if results:
+            print("\nTop 10 Performing Delivery Personnel:")
+            headers = ["Employee Name", "Total Shipments", "Success Rate (%)", "Avg Delivery Time (days)"]
+            render_table(headers, results)
+        else:
+            print("No data available for delivery personnel performance.")
     except Exception as e:
         print(f"Error identifying top-performing personnel: {e}")
 
+EXAMINE_PAYMENT_TRENDS_SQL = """
+WITH MonthlyPayments AS (
+    SELECT 
+        payment_period AS payment_month,
+        SUM(total_amount) AS total_amount,
+        SUM(payment_count) AS payment_count
+    FROM PaymentMonthlySummary
+    GROUP BY payment_period
+)
+SELECT 
+    payment_month,
+    total_amount,
+    payment_count,
+    AVG(total_amount) OVER (ORDER BY payment_month ROWS BETWEEN 2 PRECEDING AND CURRENT ROW) AS moving_avg
+FROM MonthlyPayments
+ORDER BY payment_month DESC
+LIMIT 12;
+"""
+
 # Analyzes trends in customer payment data
 def examine_payment_trends(conn):
     print("\nExamining Payment Trends Over Time...")
-    query = """
-    WITH MonthlyPayments AS (
-        SELECT 
-            DATE_FORMAT(payment_date, '%Y-%m') AS payment_month,
-            SUM(amount) AS total_amount,
-            COUNT(*) AS payment_count
-        FROM Payments
-        GROUP BY DATE_FORMAT(payment_date, '%Y-%m')
-    )
-    SELECT 
-        payment_month,
-        total_amount,
-        payment_count,
-        AVG(total_amount) OVER (ORDER BY payment_month ROWS BETWEEN 2 PRECEDING AND CURRENT ROW) AS moving_avg
-    FROM MonthlyPayments
-    ORDER BY payment_month DESC
-    LIMIT 12;
-    """
     
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                print("\nPayment Trends (Last 12 Months):")
-                headers = ["Month", "Total Amount", "Payment Count", "3-Month Avg"]
-                formatted_results = [
-                    (
-                        row[0],
-                        f"${row[1]:.2f}" if row[1] is not None else "N/A",
-                        str(row[2]) if row[2] is not None else "N/A",
-                        f"${row[3]:.2f}" if row[3] is not None else "N/A"
-                    )
-                    for row in results
-                ]
-                format_records(headers, formatted_results)
-            else:
-                print("No payment trend data available.")
+        results = report_rows(conn, "examine_payment_trends")
+        if results:
+            print("\nPayment Trends (Last 12 Months):")
+            headers = ["Month", "Total Amount", "Payment Count", "3-Month Avg"]
+            formatted_results = [
+                (
+                    row[0],
+                    f"${row[1]:.2f}" if row[1] is not None else "N/A",
+                    str(row[2]) if row[2] is not None else "N/A",
+                    f"${row[3]:.2f}" if row[3] is not None else "N/A"
+                )
+                for row in results
+            ]
+            render_table(headers, formatted_results)
+        else:
+            print("No payment trend data available.")
     except Exception as e:
         print(f"Error examining payment trends: {e}")
     finally:
-        conn.commit()
+        finish_read(conn)
+
+ANALYZE_PICKUP_REQUEST_PATTERNS_SQL = """
+WITH PickupStats AS (
+    SELECT 
+        pickup_weekday,
+        pickup_hour AS hour_of_day,
+        COUNT(*) AS request_count
+    FROM Pickup_Requests
+    GROUP BY pickup_weekday, pickup_hour
+),
+DailyTotals AS (
+    SELECT pickup_weekday, SUM(request_count) AS total_daily_requests
+    FROM PickupStats
+    GROUP BY pickup_weekday
+)
+SELECT 
+    CASE ps.pickup_weekday
+        WHEN 0 THEN 'Monday' WHEN 1 THEN 'Tuesday' WHEN 2 THEN 'Wednesday' WHEN 3 THEN 'Thursday'
+        WHEN 4 THEN 'Friday' WHEN 5 THEN 'Saturday' WHEN 6 THEN 'Sunday'
+    END AS day_of_week,
+    ps.hour_of_day,
+    ps.request_count,
+    ROUND(ps.request_count * 100.0 / dt.total_daily_requests, 2) AS percentage_of_daily_total
+FROM PickupStats ps
+JOIN DailyTotals dt ON ps.pickup_weekday = dt.pickup_weekday
+ORDER BY ps.pickup_weekday, ps.hour_of_day;
+"""
+
+# Same report before the date bucket columns were added (see date_buckets)
+ANALYZE_PICKUP_REQUEST_PATTERNS_UNBUCKETED_SQL = """
+WITH PickupStats AS (
+    SELECT 
+        DAYNAME(pickup_date) AS day_of_week,
+        HOUR(pickup_date) AS hour_of_day,
+        COUNT(*) AS request_count
+    FROM Pickup_Requests
+    GROUP BY DAYNAME(pickup_date), HOUR(pickup_date)
+),
+DailyTotals AS (
+    SELECT day_of_week, SUM(request_count) AS total_daily_requests
+    FROM PickupStats
+    GROUP BY day_of_week
+)
+SELECT 
+    ps.day_of_week,
+    ps.hour_of_day,
+    ps.request_count,
+    ROUND(ps.request_count * 100.0 / dt.total_daily_requests, 2) AS percentage_of_daily_total
+FROM PickupStats ps
+JOIN DailyTotals dt ON ps.day_of_week = dt.day_of_week
+ORDER BY 
+    FIELD(ps.day_of_week, 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'),
+    ps.hour_of_day;
+"""
 
 # Studies patterns in customer pickup requests
 def analyze_pickup_request_patterns(conn):
     print("\nAnalyzing Pickup Request Patterns...")
-    query = """
-    WITH PickupStats AS (
-        SELECT 
-            DAYNAME(pickup_date) AS day_of_week,
-            HOUR(pickup_date) AS hour_of_day,
-            COUNT(*) AS request_count
-        FROM Pickup_Requests
-        GROUP BY DAYNAME(pickup_date), HOUR(pickup_date)
-    ),
-    DailyTotals AS (
-        SELECT day_of_week, SUM(request_count) AS total_daily_requests
-        FROM PickupStats
-        GROUP BY day_of_week
-    )
-    SELECT 
-        ps.day_of_week,
-        ps.hour_of_day,
-        ps.request_count,
-        ROUND(ps.request_count * 100.0 / dt.total_daily_requests, 2) AS percentage_of_daily_total
-    FROM PickupStats ps
-    JOIN DailyTotals dt ON ps.day_of_week = dt.day_of_week
-    ORDER BY 
-        FIELD(ps.day_of_week, 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'),
-        ps.hour_of_day;
-    """
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(query)
-            results = cursor.fetchall()
-            if results:
-                print("\nPickup Request Patterns by Day and Hour:")
-                headers = ["Day of Week", "Hour", "Request Count", "% of Daily Total"]
-                format_records(headers, results)
-            else:
-                print("No data available for pickup request pattern analysis.")
+        results = report_rows(conn, "analyze_pickup_request_patterns")
+        if results:
+            print("\nPickup Request Patterns by Day and Hour:")
+            headers = ["Day of Week", "Hour", "Request Count", "% of Daily Total"]
+            render_table(headers, results)
+        else:
+            print("No data available for pickup request pattern analysis.")
     except Exception as e:
         print(f"Error analyzing pickup request patterns: {e}")
 
-# Formats query results into readable table
-def format_records(headers, rows):
-    """Formats and displays records in a well-aligned table format."""
-    col_widths = [max(len(str(item)) for item in col) for col in zip(headers, *rows)]
-    row_format = " | ".join(f"{{:<{width}}}" for width in col_widths)
-    print("\n" + "=" * (sum(col_widths) + 3 * (len(headers) - 1)))
-    print(row_format.format(*headers))
-    print("-" * (sum(col_widths) + 3 * (len(headers) - 1)))
-    for row in rows:
-        print(row_format.format(*row))
-    print("=" * (sum(col_widths) + 3 * (len(headers) - 1)))
\ No newline at end of file
+# Registry of the parameterless reports: name -> report function, its SQL and the
+# tables it reads (filled in below). "sqlite_sql" holds a dialect-specific form where
+# MySQL syntax has no SQLite equivalent; "unbucketed_sql" the form that runs until the
+# date bucket columns it groups on are added (see date_buckets); "prepare" brings a maintained table the
+# report reads up to date before it runs; "engine" computes the same result from
+# columns pulled into NumPy (see analytics_engine) instead of sorting on the server.
+REPORTS = {
+    "olap_pickup_request_status_distribution": {"run": olap_pickup_request_status_distribution, "sql": OLAP_PICKUP_REQUEST_STATUS_DISTRIBUTION_SQL},
+    "olap_monthly_payments_with_rollup": {"run": olap_monthly_payments_with_rollup, "sql": OLAP_MONTHLY_PAYMENTS_WITH_ROLLUP_SQL,
+        "sqlite_sql": OLAP_MONTHLY_PAYMENTS_WITH_ROLLUP_SQLITE_SQL},
+    "olap_daily_delivery_success_rate": {"run": olap_daily_delivery_success_rate, "sql": OLAP_DAILY_DELIVERY_SUCCESS_RATE_SQL,
+        "prepare": refresh_delivery_stats},
+    "olap_customer_shipment_volume": {"run": olap_customer_shipment_volume, "sql": OLAP_CUSTOMER_SHIPMENT_VOLUME_SQL},
+    "window_first_last_shipment_dates": {"run": window_first_last_shipment_dates, "sql": WINDOW_FIRST_LAST_SHIPMENT_DATES_SQL},
+    "window_rank_users_by_shipments": {"run": window_rank_users_by_shipments, "sql": WINDOW_RANK_USERS_BY_SHIPMENTS_SQL},
+    "window_percentile_customer_shipments": {"run": window_percentile_customer_shipments, "sql": WINDOW_PERCENTILE_CUSTOMER_SHIPMENTS_SQL},
+    "window_moving_average_payments": {"run": window_moving_average_payments, "sql": WINDOW_MOVING_AVERAGE_PAYMENTS_SQL},
+    "set_union_cities": {"run": set_union_cities, "sql": SET_UNION_CITIES_SQL},
+    "set_intersection_pending_delivered_customers": {"run": set_intersection_pending_delivered_customers, "sql": SET_INTERSECTION_PENDING_DELIVERED_CUSTOMERS_SQL},
+    "set_difference_payment_no_pickup": {"run": set_difference_payment_no_pickup, "sql": SET_DIFFERENCE_PAYMENT_NO_PICKUP_SQL},
+    "customers_with_pending_pickups": {"run": customers_with_pending_pickups, "sql": CUSTOMERS_WITH_PENDING_PICKUPS_SQL},
+    "customers_with_no_shipments": {"run": customers_with_no_shipments, "sql": CUSTOMERS_WITH_NO_SHIPMENTS_SQL},
+    "customers_with_pickup_and_delivery": {"run": customers_with_pickup_and_delivery, "sql": CUSTOMERS_WITH_PICKUP_AND_DELIVERY_SQL},
+    "packages_with_consignment_delivery_info": {"run": packages_with_consignment_delivery_info, "sql": PACKAGES_WITH_CONSIGNMENT_DELIVERY_INFO_SQL},
+    "users_with_multiple_shipments": {"run": users_with_multiple_shipments, "sql": USERS_WITH_MULTIPLE_SHIPMENTS_SQL},
+    "calculate_shipment_weight_percentiles": {"run": calculate_shipment_weight_percentiles, "sql": CALCULATE_SHIPMENT_WEIGHT_PERCENTILES_SQL,
+        "engine": analytics_engine.shipment_weight_percentiles},
+    "compute_moving_average_shipments": {"run": compute_moving_average_shipments, "sql": COMPUTE_MOVING_AVERAGE_SHIPMENTS_SQL,
+        "unbucketed_sql": COMPUTE_MOVING_AVERAGE_SHIPMENTS_UNBUCKETED_SQL, "engine": analytics_engine.moving_average_shipments},
+    "determine_median_payment": {"run": determine_median_payment, "sql": DETERMINE_MEDIAN_PAYMENT_SQL,
+        "engine": analytics_engine.median_payment_per_customer},
+    "analyze_shipment_frequency": {"run": analyze_shipment_frequency, "sql": ANALYZE_SHIPMENT_FREQUENCY_SQL},
+    "analyze_customer_shipment_patterns": {"run": analyze_customer_shipment_patterns, "sql": ANALYZE_CUSTOMER_SHIPMENT_PATTERNS_SQL},
+    "calculate_package_delivery_efficiency": {"run": calculate_package_delivery_efficiency, "sql": CALCULATE_PACKAGE_DELIVERY_EFFICIENCY_SQL},
+    "identify_top_performing_personnel": {"run": identify_top_performing_personnel, "sql": IDENTIFY_TOP_PERFORMING_PERSONNEL_SQL},
+    "examine_payment_trends": {"run": examine_payment_trends, "sql": EXAMINE_PAYMENT_TRENDS_SQL},
+    "analyze_pickup_request_patterns": {"run": analyze_pickup_request_patterns, "sql": ANALYZE_PICKUP_REQUEST_PATTERNS_SQL,
+        "unbucketed_sql": ANALYZE_PICKUP_REQUEST_PATTERNS_UNBUCKETED_SQL},
+}
+
+# Tables each report reads, so cached results can be invalidated by writes to them
+for _report in REPORTS.values():
+    _report["tables"] = tables_referenced(_report["sql"])
+
+# Function to look up the SQL a report runs on a given dialect
+def report_sql(name, dialect="mysql", buckets=True):
+    """
+    Returns the SQL of report `name` for 'mysql' or 'sqlite'; buckets=False gives
+    the form for a database without the date bucket columns (see date_buckets_ready).
+    """
+    report = REPORTS[name]
+    if not buckets and "unbucketed_sql" in report:
+        return report["unbucketed_sql"]
+    return report.get(f"{dialect}_sql", report["sql"])
+
+# Function to run a registered report and return its result set
+def fetch_report(conn, name, use_cache=True):
+    """
+    Runs report `name` from REPORTS on `conn` without printing anything. Results
+    are served from report_cache, per database, until one of the report's tables
+    is written or REPORT_CACHE_MAX_AGE has passed.
+
+    Parameters:
+        conn - connection to run the report on
+        name - key of the report in REPORTS
+        use_cache - False to always run the query (the fresh result is cached)
+
+    Returns:
+        (headers, rows) with the column names reported by the cursor.
+    """
+    dialect = dialect_of(conn)
+    query = report_sql(name, dialect, date_buckets_ready(conn))
+    prepare = REPORTS[name].get("prepare")
+    if prepare is not None:
+        prepare(conn)
+    engine = REPORTS[name].get("engine")
+
+    def run():
+        if engine is not None and analytics_engine.engine_enabled():
+            return engine(conn)
+        try:
+            with open_cursor(conn) as cursor:
+                cursor.execute(query)
+                rows = cursor.fetchall()
+                headers = [column[0] for column in cursor.description]
+            return headers, rows
+        finally:
+            finish_read(conn)
+
+    return cached_report((name, (), database_of(conn)), REPORTS[name]["tables"], run, refresh=not use_cache)
+
+# Function returning only the rows of a registered report
+def report_rows(conn, name):
+    """Rows of report `name` (see fetch_report), as used by the report screens."""
+    return fetch_report(conn, name)[1]
+
+# Function to run several reports at once, each on its own pooled connection
+def run_reports(pool, names=None, max_concurrency=None):
+    """
+    Runs the selected reports (all of REPORTS by default) in parallel.
+
+    Parameters:
+        pool - ConnectionPool the reports borrow their connections from
+        names - report names to run, in the order they should appear in the bundle
+        max_concurrency - reports running at the same time, defaults to the pool size
+
+    Returns:
+        A bundle dict: when the run started, its wall time, the concurrency used and
+        one entry per report with its headers, rows, elapsed seconds and error (None
+        when it succeeded). A failing report does not stop the others.
+    """
+    names = list(names or REPORTS)
+    for name in names:
+        if name not in REPORTS:
+            raise ValueError(f"Unknown report '{name}'")
+    max_concurrency = max(1, min(max_concurrency or pool.pool_size, pool.pool_size, len(names) or 1))
+
+    def run_one(name):
+        started = time.perf_counter()
+        entry = {"name": name, "headers": [], "rows": [], "elapsed": 0.0, "error": None}
+        try:
+            with pool.connection() as conn:
+                entry["headers"], entry["rows"] = fetch_report(conn, name)
+        except Exception as e:
+            entry["error"] = str(e)
+        entry["elapsed"] = time.perf_counter() - started
+        return entry
+
+    started_at = datetime.datetime.now()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ups-report") as executor:
+        reports = list(executor.map(run_one, names))
+    return {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "elapsed": time.perf_counter() - started,
+        "max_concurrency": max_concurrency,
+        "reports": reports,
+    }
+
+# Function to display a report bundle
+def print_report_bundle(bundle):
+    """Prints every report of a bundle followed by the per-report timings."""
+    for report in bundle["reports"]:
+        print(f"\n📊 {report['name'].replace('_', ' ').title()}")
+        if report["error"]:
+            print(f"❌ Error running report: {report['error']}")
+        elif report["rows"]:
+            render_table(report["headers"], report["rows"])
+        else:
+            print("⚠️ No data found.")
+
+    headers = ["Report", "Rows", "Time (s)", "Status"]
+    rows = [
+        (report["name"], len(report["rows"]), f"{report['elapsed']:.3f}", "error" if report["error"] else "ok")
+        for report in bundle["reports"]
+    ]
+    render_table(headers, rows)
+    sequential = sum(report["elapsed"] for report in bundle["reports"])
+    print(f"⏱️ {len(rows)} reports in {bundle['elapsed']:.2f}s with {bundle['max_concurrency']} connections "
+          f"({sequential:.2f}s if run one after another).")
+
+# Function to save a report bundle as a JSON file
+def save_report_bundle(bundle, path=None):
+    """Writes the bundle to `path` (reports_<timestamp>.json by default) and returns the path."""
+    path = path or f"reports_{bundle['started_at'].replace(':', '').replace('-', '')}.json"
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(bundle, handle, indent=2, default=str)
+    return path
+
+# Handles running a batch of reports in parallel
+def manage_report_batch(pool):
+    """
+    Lets the user pick reports (or all of them) and runs them in parallel on the
+    pool, then shows the results and timings and optionally saves the bundle.
+    """
+    names = list(REPORTS)
+    print("\n" + "=" * 50)
+    print(f"\033[1m🚀 RUN REPORTS IN PARALLEL 🚀\033[0m".center(50))
+    print("=" * 50)
+    for number, name in enumerate(names, start=1):
+        print(f"{number}. {name.replace('_', ' ').title()}")
+    print("=" * 50)
+    selection = input("👉 Report numbers separated by commas (press Enter for all): ").strip()
+    try:
+        numbers = [int(part) for part in selection.split(",") if part.strip()]
+    except ValueError:
+        numbers = []
+    if selection and (not numbers or any(not 1 <= number <= len(names) for number in numbers)):
+        print(f"⚠️ Invalid selection. Enter numbers from 1 to {len(names)}.")
+        return
+    selected = [names[number - 1] for number in numbers] if selection else names
+
+    # The complex queries menu keeps one connection checked out for itself
+    bundle = run_reports(pool, selected, max_concurrency=max(1, pool.pool_size - 1))
+    print_report_bundle(bundle)
+    if input("💾 Save the results to a JSON file? (y/n): ").strip().lower() == "y":
+        print(f"✅ Results saved to {save_report_bundle(bundle)}.")
@@ -1,5 +1,9 @@
 from menus import crud_operation_menu, table_list, display_message
-from db import execute_query, check_record_existance
+from db import (borrow_connection, bump_table_versions, check_record_existance, execute_query, finish_read,
+                invalidate_existence_cache, open_cursor, transaction)
+from schema import TABLES, resolve_table, table_columns
+from rendering import render_table
+from summaries import mark_delivery_days_dirty, refresh_payment_summary
 import re
 import datetime
 
@@ -25,10 +29,11 @@ def manage_basic_crud_operations(conn):
         print("9. 📄 Manage Package Status")
         print("10. 📋 Manage Pickup Requests")
         print("11. 🔒 Manage User Roles")
-        print("12. 🔙 Return to Main Menu")
+        print("12. 🔎 Browse Records - List and filter any table page by page")
+        print("13. 🔙 Return to Main Menu")
         print("=" * 50)
 
-        choice = input("👉 Select an entity to manage (1-12): ").strip()
+        choice = input("👉 Select an entity to manage (1-13): ").strip()
 
         if choice == "1":
             manage_users(conn)  # Manage user records
@@ -53,6 +58,8 @@ def manage_basic_crud_operations(conn):
         elif choice == "11":
             manage_user_role(conn)  # Manage user role records
         elif choice == "12":
+            browse_records(conn)  # List records with filters, a page at a time
+        elif choice == "13":
             print("🔙 Returning to Main Menu")
             break
         else:
@@ -437,6 +444,9 @@ def manage_packages(conn):
         else:
             print("⚠️ Invalid choice. Please try again.")
 
+# Customer and month of a payment, i.e. its row in PaymentMonthlySummary
+PAYMENT_GROUP_QUERY = "SELECT customer_id, payment_date FROM Payments WHERE payment_id = %s"
+
 # Manage Payments
 def manage_payments(conn):
     """Handle CRUD operations for Payments"""
@@ -456,7 +466,10 @@ def manage_payments(conn):
                     INSERT INTO Payments (customer_id, amount, payment_date, payment_method) 
                     VALUES (%s, %s, %s, %s)
                 """
-                execute_query(conn, query, (customer_id, amount, payment_date, payment_method))
+                # The payment and its monthly summary commit together
+                with transaction(conn) as txn:
+                    execute_query(txn, query, (customer_id, amount, payment_date, payment_method))
+                    refresh_payment_summary(txn, [(customer_id, payment_date)])
                 print("✅ Payment added successfully.")
             except Exception as e:
                 print(f"❌ Error adding payment: {e}")
@@ -499,7 +512,11 @@ def manage_payments(conn):
                     SET amount = %s, payment_date = %s, payment_method = %s
                     WHERE payment_id = %s
                 """
-                execute_query(conn, query, (new_amount, new_payment_date, new_method, payment_id))
+                with transaction(conn) as txn:
+                    previous = execute_query(txn, PAYMENT_GROUP_QUERY, (payment_id,), select=True)
+                    execute_query(txn, query, (new_amount, new_payment_date, new_method, payment_id))
+                    # Both the old and the new month of the payment change
+                    refresh_payment_summary(txn, previous + [(row[0], new_payment_date) for row in previous])
                 print("✅ Payment updated successfully.")
             except Exception as e:
                 print(f"❌ Error updating payment: {e}")
@@ -510,7 +527,10 @@ def manage_payments(conn):
                 payment_id = input("Enter Payment ID to delete: ").strip()
                 if check_record_existance("Payments", "payment_id", payment_id, conn):
                     query = "DELETE FROM Payments WHERE payment_id = %s"
-                    execute_query(conn, query, (payment_id,))
+                    with transaction(conn) as txn:
+                        previous = execute_query(txn, PAYMENT_GROUP_QUERY, (payment_id,), select=True)
+                        execute_query(txn, query, (payment_id,))
+                        refresh_payment_summary(txn, previous)
                     print("✅ Payment deleted successfully.")
                 else:
                     print("⚠️ No matching record found.")
@@ -639,6 +659,9 @@ def manage_addresses(conn):
             print("=" * 50)
 
 
+# Day of a delivery attempt, i.e. its row in DailyDeliveryStats
+ATTEMPT_DATE_QUERY = "SELECT attempt_date FROM DeliveryAttempts WHERE attempt_id = %s"
+
 def manage_delivery_attempts(conn):
     """Handle CRUD operations for Delivery Attempts"""
     while True:
@@ -710,7 +733,12 @@ def manage_delivery_attempts(conn):
                     SET attempt_date = %s, attempt_status = %s
                     WHERE attempt_id = %s
                 """
-                execute_query(conn, query, (new_attempt_date, new_attempt_status, attempt_id))
+                # Both the old and the new day need their delivery stats recomputed
+                with transaction(conn) as txn:
+                    previous = execute_query(txn, ATTEMPT_DATE_QUERY, (attempt_id,), select=True)
+                    execute_query(txn, query, (new_attempt_date, new_attempt_status, attempt_id))
+                    if previous:
+                        mark_delivery_days_dirty(txn, [previous[0][0], new_attempt_date])
                 print("\n" + "=" * 50)
                 print("✅ Delivery attempt updated successfully.".center(50))
                 print("=" * 50)
@@ -726,7 +754,10 @@ def manage_delivery_attempts(conn):
                 attempt_id = input("Enter Attempt ID to delete: ").strip()
                 if check_record_existance("DeliveryAttempts", "attempt_id", attempt_id, conn):
                     query = "DELETE FROM DeliveryAttempts WHERE attempt_id = %s"
-                    execute_query(conn, query, (attempt_id,))
+                    with transaction(conn) as txn:
+                        previous = execute_query(txn, ATTEMPT_DATE_QUERY, (attempt_id,), select=True)
+                        execute_query(txn, query, (attempt_id,))
+                        mark_delivery_days_dirty(txn, [row[0] for row in previous])
                     print("\n" + "-" * 50)
                     print("✅ Delivery attempt deleted successfully.".center(50))
                     print("-" * 50)
@@ -1140,4 +1171,286 @@ def manage_user_role(conn):
         elif choice == "5":
             return table_list()
         else:
-            print("⚠️ Invalid choice. Please try again.")
\ No newline at end of file
+            print("⚠️ Invalid choice. Please try again.")
+
+
+# Generic CRUD by table name, used by the command line (cli.py). Each function keeps
+# the summaries in step the same way the menus above do.
+
+def _checked_values(table_name, values):
+    columns = table_columns(table_name)
+    unknown = [column for column in values if column not in columns]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table_name}: {', '.join(unknown)}. "
+                         f"Expected some of: {', '.join(columns)}")
+    return dict(values)
+
+def _rows_by_key(txn, table_name, key):
+    with open_cursor(txn) as cursor:
+        cursor.execute(f"SELECT {', '.join(table_columns(table_name))} FROM {table_name} "
+                       f"WHERE {TABLES[table_name]['primary_key']} = %s", (key,))
+        rows = cursor.fetchall()
+        headers = [column[0] for column in cursor.description]
+    return [dict(zip(headers, row)) for row in rows]
+
+def _maintain_derived(txn, table_name, before, after, created=False):
+    # Old and new versions of the written rows, as the menus pass them on
+    versions = before + after
+    if table_name == "Payments":
+        refresh_payment_summary(txn, [(row.get("customer_id"), row.get("payment_date")) for row in versions])
+    elif table_name == "DeliveryAttempts" and not created:
+        mark_delivery_days_dirty(txn, [row.get("attempt_date") for row in versions])
+
+# Function to insert a record into any UPS table
+def create_record(conn, table_name, values):
+    """
+    Inserts one row. `values` maps column names to values; columns left out get
+    their defaults.
+
+    Returns:
+        The new row's auto-increment key (or None for tables without one).
+    """
+    table_name = resolve_table(table_name)
+    values = _checked_values(table_name, values)
+    if not values:
+        raise ValueError(f"No values given for the new {table_name} record")
+    query = (f"INSERT INTO {table_name} ({', '.join(values)}) "
+             f"VALUES ({', '.join(['%s'] * len(values))})")
+    with transaction(conn) as txn:
+        with open_cursor(txn) as cursor:
+            cursor.execute(query, tuple(values.values()))
+            new_id = cursor.lastrowid or None
+        invalidate_existence_cache(table_name)
+        bump_table_versions([table_name])
+        _maintain_derived(txn, table_name, [], [values], created=True)
+    return new_id
+
+# Function to read a record of any UPS table by its primary key
+def read_record(conn, table_name, key):
+    """
+    Returns (headers, rows) of the rows whose primary key equals `key`, with the
+    schema's columns only (generated date bucket columns are left out).
+    """
+    table_name = resolve_table(table_name)
+    query = (f"SELECT {', '.join(table_columns(table_name))} FROM {table_name} "
+             f"WHERE {TABLES[table_name]['primary_key']} = %s")
+    with borrow_connection(conn) as connection:
+        try:
+            with open_cursor(connection) as cursor:
+                cursor.execute(query, (key,))
+                rows = cursor.fetchall()
+                headers = [column[0] for column in cursor.description]
+        finally:
+            finish_read(connection)
+    return headers, rows
+
+# Function to update a record of any UPS table by its primary key
+def update_record(conn, table_name, key, values):
+    """
+    Sets the columns in `values` on the rows whose primary key equals `key`.
+
+    Returns:
+        Number of rows updated (0 when no record has that key).
+    """
+    table_name = resolve_table(table_name)
+    values = _checked_values(table_name, values)
+    if not values:
+        raise ValueError(f"No values given to update the {table_name} record")
+    primary_key = TABLES[table_name]["primary_key"]
+    query = (f"UPDATE {table_name} SET {', '.join(f'{column} = %s' for column in values)} "
+             f"WHERE {primary_key} = %s")
+    with transaction(conn) as txn:
+        before = _rows_by_key(txn, table_name, key)
+        if before:
+            execute_query(txn, query, tuple(values.values()) + (key,))
+            _maintain_derived(txn, table_name, before, [{**row, **values} for row in before])
+    return len(before)
+
+# Function to delete a record of any UPS table by its primary key
+def delete_record(conn, table_name, key):
+    """
+    Deletes the rows whose primary key equals `key`.
+
+    Returns:
+        Number of rows deleted (0 when no record has that key).
+    """
+    table_name = resolve_table(table_name)
+    query = f"DELETE FROM {table_name} WHERE {TABLES[table_name]['primary_key']} = %s"
+    with transaction(conn) as txn:
+        before = _rows_by_key(txn, table_name, key)
+        if before:
+            execute_query(txn, query, (key,))
+            _maintain_derived(txn, table_name, before, [])
+    return len(before)
+
+# Rows per page of list_records
+LIST_PAGE_SIZE = 50
+
+# Status and date columns list_records can filter on and order by, per table
+LIST_COLUMNS = {
+    "Shipments": {"status": "shipment_status", "date": "shipment_date"},
+    "Payments": {"date": "payment_date"},
+    "DeliveryAttempts": {"status": "attempt_status", "date": "attempt_date"},
+    "PackageStatus": {"status": "status_type", "date": "status_timestamp"},
+    "Pickup_Requests": {"status": "pickup_status", "date": "pickup_date"},
+}
+
+# Filters on the key of a related record, offered by every table that has the column
+_KEY_FILTERS = {"customer": "customer_id", "user": "user_id", "shipment": "shipment_id", "package": "package_id"}
+
+# Function to list the filters available for a table
+def list_filters(table_name):
+    """Returns {filter name: column} for list_records on `table_name`: status,
+    date (used by date_from / date_to) and the related-record keys it has."""
+    table_name = resolve_table(table_name)
+    columns = table_columns(table_name)
+    primary_key = TABLES[table_name]["primary_key"]
+    filters = dict(LIST_COLUMNS.get(table_name, {}))
+    filters.update({name: column for name, column in _KEY_FILTERS.items()
+                    if column in columns and column != primary_key})
+    return filters
+
+# Function to read one page of a table with keyset pagination
+def list_records(conn, table_name, filters=None, order="id", after=None, limit=LIST_PAGE_SIZE):
+    """
+    Returns one page of records, seeking past the previous page instead of using
+    OFFSET, so every page costs the same however deep it is.
+
+    Parameters:
+        conn - a ConnectionPool or an already open connection
+        table_name - one of schema.TABLES (any letter case)
+        filters - dict with any of status, customer, user, shipment, package
+                  (exact matches) and date_from / date_to (inclusive
+                  'YYYY-MM-DD' days); see list_filters() for what a table has
+        order - 'id' (primary key) or 'date' (the table's date column, then the
+                primary key; records without a date are left out). Date
+                order seeks along the DATE_INDEXES, which the date bucket
+                migration adds (see date_buckets.ensure_date_buckets); before
+                it has run, every date-ordered page sorts the whole table
+        after - the `next_after` of the previous page, None for the first page
+        limit - rows per page. On tables whose key is not unique (Addresses)
+                pages end between keys, so all rows of a key share one page; a
+                key with more rows than `limit` gets a longer page of its own
+
+    Returns:
+        (headers, rows, next_after); next_after is None on the last page.
+        Raises ValueError for unknown filters, orders and a limit below 1.
+    """
+    table_name = resolve_table(table_name)
+    if int(limit) < 1:
+        raise ValueError(f"The page size must be at least 1, got {limit}")
+    primary_key = TABLES[table_name]["primary_key"]
+    unique_key = TABLES[table_name].get("unique_key", True)
+    available = list_filters(table_name)
+    filters = {name: value for name, value in (filters or {}).items() if value not in (None, "")}
+    unknown = [name for name in filters
+               if name not in available and not (name in ("date_from", "date_to") and "date" in available)]
+    if unknown:
+        names = [name for filter_name in available
+                 for name in (("date_from", "date_to") if filter_name == "date" else (filter_name,))]
+        raise ValueError(f"{table_name} cannot be filtered by: {', '.join(unknown)}. "
+                         f"Available: {', '.join(names) or 'none'}")
+    if order not in ("id", "date") or (order == "date" and ("date" not in available or not unique_key)):
+        raise ValueError(f"{table_name} can be ordered by: "
+                         f"{'id, date' if 'date' in available and unique_key else 'id'}")
+
+    conditions, params = [], []
+    for name, value in filters.items():
+        if name == "date_from":
+            conditions.append(f"{available['date']} >= %s")
+            params.append(datetime.date.fromisoformat(value).isoformat())
+        elif name == "date_to":
+            conditions.append(f"{available['date']} < %s")
+            params.append((datetime.date.fromisoformat(value) + datetime.timedelta(days=1)).isoformat())
+        else:
+            conditions.append(f"{available[name]} = %s")
+            params.append(value)
+    if order == "date":
+        date_column = available["date"]
+        conditions.append(f"{date_column} IS NOT NULL")
+        sort = [date_column, primary_key]
+        if after is not None:
+            # The leading >= gives the optimizer a plain range to seek on
+            conditions.append(f"{date_column} >= %s AND ({date_column} > %s OR ({date_column} = %s AND {primary_key} > %s))")
+            params.extend([after[0], after[0], after[0], after[1]])
+    else:
+        sort = [primary_key]
+        if after is not None:
+            conditions.append(f"{primary_key} > %s")
+            params.append(after[0])
+
+    headers = table_columns(table_name)
+    query = f"SELECT {', '.join(headers)} FROM {table_name}"
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+    # One extra row tells whether another page follows
+    query += f" ORDER BY {', '.join(sort)} LIMIT {int(limit) + 1}"
+    with borrow_connection(conn) as connection:
+        try:
+            with open_cursor(connection) as cursor:
+                cursor.execute(query, tuple(params))
+                rows = cursor.fetchall()
+        finally:
+            finish_read(connection)
+
+    if len(rows) <= limit:
+        return headers, rows, None
+    if not unique_key:
+        rows = _whole_key_page(conn, query, params, rows, limit, headers.index(primary_key), primary_key)
+    else:
+        rows = rows[:limit]
+    last = dict(zip(headers, rows[-1]))
+    return headers, rows, tuple(last[column] for column in sort)
+
+def _whole_key_page(conn, query, params, rows, limit, position, key_column):
+    """Trims a page (fetched with one row to spare) of a table with a non-unique
+    key so it ends on a complete key; the next page seeks past that key."""
+    boundary = rows[limit][position]
+    page = [row for row in rows[:limit] if row[position] != boundary]
+    if page:
+        return page
+    # Every row shares one key: fetch all of that key's rows as a longer page
+    query = query.replace(" ORDER BY ", f" {'AND' if ' WHERE ' in query else 'WHERE'} {key_column} = %s ORDER BY ", 1)
+    query = query[:query.rindex(" LIMIT ")]
+    with borrow_connection(conn) as connection:
+        try:
+            with open_cursor(connection) as cursor:
+                cursor.execute(query, tuple(params) + (boundary,))
+                return cursor.fetchall()
+        finally:
+            finish_read(connection)
+
+# Handles browsing any table page by page
+def browse_records(conn):
+    """
+    Prompts for a table, filters and order, then shows the records a page at a
+    time (Enter for the next page, q to stop).
+    """
+    try:
+        table_name = resolve_table(input(f"Table ({', '.join(TABLES)}): ").strip())
+        filters = {}
+        for name in list_filters(table_name):
+            if name == "date":
+                filters["date_from"] = input("From date (YYYY-MM-DD, Enter for any): ").strip()
+                filters["date_to"] = input("To date (YYYY-MM-DD, Enter for any): ").strip()
+            else:
+                filters[name] = input(f"{name.title()} (Enter for any): ").strip()
+        order = "id"
+        if "date" in list_filters(table_name):
+            order = "date" if input("Order by date instead of ID? (y/n): ").strip().lower() == "y" else "id"
+
+        after, page = None, 1
+        while True:
+            headers, rows, after = list_records(conn, table_name, filters, order, after)
+            if not rows:
+                # A long last page of a non-unique key can leave the next one empty
+                if page == 1:
+                    print("⚠️ No matching records found.")
+                return
+            print(f"\n📄 {table_name} - page {page}")
+            render_table(headers, rows)
+            if after is None or input("⏭️ Enter for the next page, q to stop: ").strip().lower() == "q":
+                return
+            page += 1
+    except Exception as e:
+        print(f"❌ Error browsing records: {e}")
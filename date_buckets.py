@@ -0,0 +1,135 @@
+# date_buckets.py
+from db import borrow_connection, database_of, dialect_of, finish_read, open_cursor
+
+# Generated date bucket columns the reports group and filter on instead of
+# function-wrapped dates: table -> [(column, MySQL type, MySQL expression, SQLite type, SQLite expression)].
+# Weekdays count from 0 = Monday, like MySQL's WEEKDAY().
+DATE_BUCKETS = {
+    "DeliveryAttempts": [
+        ("attempt_day", "DATE", "DATE(attempt_date)", "DATE", "date(attempt_date)"),
+    ],
+    "Payments": [
+        ("payment_period", "CHAR(7)", "DATE_FORMAT(payment_date, '%Y-%m')", "CHAR(7)", "strftime('%Y-%m', payment_date)"),
+    ],
+    "Shipments": [
+        ("shipment_day", "DATE", "DATE(shipment_date)", "DATE", "date(shipment_date)"),
+    ],
+    "Pickup_Requests": [
+        ("pickup_weekday", "TINYINT", "WEEKDAY(pickup_date)", "INTEGER",
+         "(CAST(strftime('%w', pickup_date) AS INTEGER) + 6) % 7"),
+        ("pickup_hour", "TINYINT", "HOUR(pickup_date)", "INTEGER", "CAST(strftime('%H', pickup_date) AS INTEGER)"),
+    ],
+}
+
+# Indexes over the bucket columns: name -> (table, columns)
+DATE_BUCKET_INDEXES = {
+    "idx_attempts_attempt_day": ("DeliveryAttempts", ("attempt_day", "attempt_status")),
+    "idx_payments_customer_period": ("Payments", ("customer_id", "payment_period")),
+    "idx_payments_period": ("Payments", ("payment_period",)),
+    "idx_shipments_shipment_day": ("Shipments", ("shipment_day",)),
+    "idx_pickups_weekday_hour": ("Pickup_Requests", ("pickup_weekday", "pickup_hour")),
+}
+
+# Indexes on the date columns themselves, which crudoperations.list_records seeks
+# along when records are listed by date: name -> (table, columns)
+DATE_INDEXES = {
+    "idx_shipments_shipment_date": ("Shipments", ("shipment_date",)),
+    "idx_payments_payment_date": ("Payments", ("payment_date",)),
+    "idx_attempts_attempt_date": ("DeliveryAttempts", ("attempt_date",)),
+    "idx_package_status_timestamp": ("PackageStatus", ("status_timestamp",)),
+    "idx_pickups_pickup_date": ("Pickup_Requests", ("pickup_date",)),
+}
+
+def _existing_columns(cursor, dialect, table_name):
+    if dialect == "sqlite":
+        # table_info leaves generated columns out, table_xinfo lists them
+        cursor.execute(f"PRAGMA table_xinfo({table_name})")
+        return {row[1].lower() for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table_name,))
+    return {row[0].lower() for row in cursor.fetchall()}
+
+# database identity -> whether every DATE_BUCKETS column exists there
+_ready = {}
+
+# Function to tell whether the date bucket columns have been added
+def date_buckets_ready(connection):
+    """
+    True when every DATE_BUCKETS column exists, so statements may group and
+    filter on them; False means callers use the equivalent function-based SQL.
+    The answer is remembered per database; ensure_date_buckets() updates it.
+    """
+    identity = database_of(connection)
+    if identity not in _ready:
+        with borrow_connection(connection) as conn:
+            dialect = dialect_of(conn)
+            try:
+                with open_cursor(conn) as cursor:
+                    _ready[identity] = all(
+                        {bucket[0].lower() for bucket in buckets} <= _existing_columns(cursor, dialect, table_name)
+                        for table_name, buckets in DATE_BUCKETS.items())
+            finally:
+                finish_read(conn)
+    return _ready[identity]
+
+# Function listing the bucket columns a table has
+def bucket_columns(connection, table_name):
+    """The DATE_BUCKETS column names of `table_name` once they have been added, else []."""
+    if not date_buckets_ready(connection):
+        return []
+    return [bucket[0] for bucket in DATE_BUCKETS.get(table_name, ())]
+
+def _existing_indexes(cursor, dialect, table_name):
+    if dialect == "sqlite":
+        cursor.execute(f"PRAGMA index_list({table_name})")
+        return {row[1].lower() for row in cursor.fetchall()}
+    cursor.execute("""
+        SELECT DISTINCT index_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table_name,))
+    return {row[0].lower() for row in cursor.fetchall()}
+
+# Function to add missing date bucket columns and their indexes
+def ensure_date_buckets(connection):
+    """
+    Schema migration, run on request (Performance & Maintenance menu or
+    `run_app.py migrate`), never at startup: adds the DATE_BUCKETS generated
+    columns, DATE_BUCKET_INDEXES and DATE_INDEXES that do not exist yet.
+
+    MySQL gets STORED columns, computed once when a row is written; adding one
+    rebuilds the table, so run it when the tables may be locked for a while.
+    SQLite can only add VIRTUAL generated columns to an existing table, so there
+    the values are kept in the indexes built on them. Until it has run, reports
+    and summaries use function-based SQL (see date_buckets_ready()).
+
+    Returns:
+        List of the "table.column" and index names that were added.
+    """
+    added = []
+    with borrow_connection(connection) as conn:
+        dialect = dialect_of(conn)
+        try:
+            with open_cursor(conn) as cursor:
+                for table_name, buckets in DATE_BUCKETS.items():
+                    existing = _existing_columns(cursor, dialect, table_name)
+                    for column, mysql_type, mysql_expression, sqlite_type, sqlite_expression in buckets:
+                        if column.lower() in existing:
+                            continue
+                        if dialect == "sqlite":
+                            definition = f"{sqlite_type} GENERATED ALWAYS AS ({sqlite_expression}) VIRTUAL"
+                        else:
+                            definition = f"{mysql_type} GENERATED ALWAYS AS ({mysql_expression}) STORED"
+                        cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {column} {definition}")
+                        added.append(f"{table_name}.{column}")
+                for index, (table_name, columns) in {**DATE_BUCKET_INDEXES, **DATE_INDEXES}.items():
+                    if index.lower() in _existing_indexes(cursor, dialect, table_name):
+                        continue
+                    cursor.execute(f"CREATE INDEX {index} ON {table_name} ({', '.join(columns)})")
+                    added.append(index)
+        finally:
+            finish_read(conn)
+            # Checked again on next use, whether the migration completed or failed
+            _ready.pop(database_of(conn), None)
+    return added
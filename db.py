@@ -1,81 +1,905 @@
-import mysql.connector
-from mysql.connector import Error
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from backends import DB_ERRORS, DatabaseError, MySQLBackend, SQLiteBackend
+from instrumentation import InstrumentedCursor
+from schema import TABLES, resolve_table
+
+# Database connection details shared by single connections and the pool
+DB_CONFIG = {
+    'host': 'localhost',          # Database host (typically 'localhost')
+    'user': 'poojith',            # Database username
+    'password': 'poojith',        # Database password
+    'database': 'UPS_DB'          # Target database name
+}
+
+# Backend selection: UPS_DB_BACKEND=sqlite runs against a local SQLite database
+# stored at UPS_SQLITE_PATH (':memory:' for a throwaway in-memory database)
+DB_BACKEND = os.environ.get("UPS_DB_BACKEND", "mysql")
+SQLITE_PATH = os.environ.get("UPS_SQLITE_PATH", "ups_db.sqlite3")
+
+# Default number of connections kept by the connection pool
+DEFAULT_POOL_SIZE = 5
+
+# Seconds a pooled connection may sit idle before it is pinged on checkout
+IDLE_CHECK_SECONDS = 30.0
+
+# Prepared statements kept per connection by execute_query (0 disables the cache)
+STATEMENT_CACHE_SIZE = 32
+
+# Rows fetched per round trip by stream_query
+STREAM_CHUNK_SIZE = 1000
+
+# Rows sent per multi-row INSERT (and per commit) by bulk_insert
+BULK_BATCH_SIZE = 1000
+
+# Seconds an existence check result is reused (0 disables the cache)
+EXISTENCE_CACHE_TTL = 5.0
+
+# Statement kinds the server can prepare; anything else runs on a plain cursor
+_PREPARABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH")
+
+# Function to build the configured database backend
+def default_backend():
+    """
+    Returns the backend selected by DB_BACKEND: MySQL with DB_CONFIG, or SQLite
+    at SQLITE_PATH.
+    """
+    if DB_BACKEND.lower() == "sqlite":
+        return SQLiteBackend(SQLITE_PATH)
+    return MySQLBackend(**DB_CONFIG)
 
 # Function to create a connection to the database
-def create_connection():
+def create_connection(backend=None):
     """
-    Establishes a connection to the MySQL database.
+    Establishes a connection to the database (MySQL unless another backend is given
+    or configured).
     Returns the connection object if successful, otherwise returns None.
     """
     try:
-        # Configure database connection details
-        connection = mysql.connector.connect(
-            host='localhost',          # Database host (typically 'localhost')
-            user='poojith',            # Database username
-            password='poojith',        # Database password
-            database='UPS_DB'          # Target database name
-        )
+        backend = backend or default_backend()
+        connection = backend.connect()
         if connection.is_connected():
-            print("✅ Connected to the UPS_DB database.")
+            print(f"✅ Connected to {backend.describe()}.")
         return connection
-    except Error as e:
-        print(f"❌ Error while connecting to MySQL: {e}")
+    except DB_ERRORS as e:
+        print(f"❌ Error while connecting to the database: {e}")
         return None
 
+# Function to tell which SQL dialect a connection or pool speaks
+def dialect_of(source):
+    """Returns 'mysql' or 'sqlite' for a ConnectionPool or connection."""
+    if isinstance(source, ConnectionPool):
+        return source.backend.name
+    return getattr(source, "dialect", "mysql")
+
+# Function to identify the database behind a pool or connection
+def database_of(source):
+    """Returns a hashable identity of the database a ConnectionPool or connection
+    works on, e.g. ('sqlite', 'ups_db.sqlite3'); connections opened outside a
+    backend are identified by the connection object itself."""
+    if isinstance(source, ConnectionPool):
+        return source.backend.identity()
+    backend = getattr(source, "_backend", None) or getattr(source, "_ups_backend", None)
+    return backend.identity() if backend is not None else ("connection", id(source))
+
+# Thread-safe pool of reusable database connections
+class ConnectionPool:
+    """
+    Keeps up to `pool_size` open connections to the database and hands them out
+    one caller at a time.
+
+    Connections are opened lazily in autocommit mode (multi-statement work goes
+    through transaction()), checked for liveness on checkout when they sat idle
+    longer than IDLE_CHECK_SECONDS or their last use raised a database error (a
+    dropped socket is reconnected instead of failing the caller) and returned to
+    the pool with any unfinished transaction rolled back.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, timeout=30, backend=None, **config):
+        """
+        Parameters:
+            pool_size - maximum number of open connections
+            timeout - seconds to wait for a free connection before giving up
+            backend - MySQLBackend / SQLiteBackend to connect through; defaults to
+                      default_backend(), or to MySQL with `config` when given
+            config - MySQL connection arguments overriding DB_CONFIG
+        """
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        if backend is None:
+            backend = MySQLBackend(**{**DB_CONFIG, **config}) if config else default_backend()
+        self.backend = backend
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "reconnects": 0,
+            "discarded": 0,
+        }
+
+    def _open(self):
+        """Opens a new physical connection."""
+        return self.backend.connect(autocommit=True)
+
+    def get_connection(self, timeout=None):
+        """
+        Checks out a connection, blocking while all connections are in use.
+
+        Parameters:
+            timeout - seconds to wait, defaults to the pool timeout
+
+        Returns:
+            An open connection that must be handed back with release().
+        """
+        if self._closed:
+            raise DatabaseError("Connection pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        connection = None
+        # A freshly opened connection is known to be alive
+        idle_since = time.monotonic()
+
+        try:
+            connection, idle_since = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._created < self.pool_size
+                if can_open:
+                    self._created += 1
+            if can_open:
+                try:
+                    connection = self._open()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                started = time.perf_counter()
+                try:
+                    connection, idle_since = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise DatabaseError(f"No free connection in pool after {timeout}s")
+                with self._lock:
+                    self._stats["waits"] += 1
+                    self._stats["wait_time"] += time.perf_counter() - started
+
+        if idle_since is None or time.monotonic() - idle_since > IDLE_CHECK_SECONDS:
+            try:
+                connection = self._ensure_alive(connection)
+            except Exception:
+                # The connection could not be replaced, so its slot is free again
+                with self._lock:
+                    self._created -= 1
+                raise
+        with self._lock:
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+        return connection
+
+    def _ensure_alive(self, connection):
+        """Reconnects a connection whose socket was dropped while it sat idle."""
+        try:
+            if connection.is_connected():
+                return connection
+            # Server-side prepared statements do not survive a reconnect
+            clear_statement_cache(connection)
+            connection.reconnect(attempts=2, delay=0)
+        except DB_ERRORS:
+            # The old handle is beyond repair, replace it with a fresh one
+            try:
+                connection.close()
+            except DB_ERRORS:
+                pass
+            connection = self._open()
+        with self._lock:
+            self._stats["reconnects"] += 1
+        return connection
+
+    def release(self, connection, discard=False, verify=False):
+        """
+        Returns a checked-out connection to the pool.
+
+        Parameters:
+            connection - the connection obtained from get_connection()
+            discard - close the connection instead of reusing it
+            verify - check the connection is alive before it is handed out again
+                     (e.g. after a database error)
+        """
+        with self._lock:
+            self._in_use -= 1
+        if not discard:
+            try:
+                if connection.in_transaction:
+                    connection.rollback()
+            except DB_ERRORS:
+                discard = True
+        if discard or self._closed:
+            clear_statement_cache(connection)
+            try:
+                connection.close()
+            except DB_ERRORS:
+                pass
+            with self._lock:
+                self._created -= 1
+                if discard:
+                    self._stats["discarded"] += 1
+            return
+        self._idle.put((connection, None if verify else time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection and always returns it. A
+        generator closed while using it (e.g. a stream stopped early) may leave
+        unread rows behind, so its connection is discarded rather than reused.
+        """
+        connection = self.get_connection()
+        failed = abandoned = False
+        try:
+            yield connection
+        except DB_ERRORS:
+            failed = True
+            raise
+        except GeneratorExit:
+            abandoned = True
+            raise
+        finally:
+            self.release(connection, discard=abandoned, verify=failed)
+
+    def stats(self):
+        """
+        Returns a snapshot of pool usage.
+
+        Returns:
+            dict with the pool size, open/idle/in-use connection counts and
+            checkout, wait, timeout and reconnect counters.
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                "pool_size": self.pool_size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+            })
+        return snapshot
+
+    def close_all(self):
+        """Closes every idle connection and refuses further checkouts."""
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            clear_statement_cache(connection)
+            try:
+                connection.close()
+            except DB_ERRORS:
+                pass
+            with self._lock:
+                self._created -= 1
+
+# Function to create a connection pool for the database
+def create_pool(pool_size=DEFAULT_POOL_SIZE, backend=None):
+    """
+    Creates a connection pool and opens its first connection to verify access.
+    Returns the pool if successful, otherwise returns None.
+    """
+    try:
+        pool = ConnectionPool(pool_size=pool_size, backend=backend)
+        with pool.connection():
+            pass
+        print(f"✅ Connected to {pool.backend.describe()} (pool of {pool_size} connections).")
+        return pool
+    except DB_ERRORS as e:
+        print(f"❌ Error while connecting to the database: {e}")
+        return None
+
+# Connections running a unit of work in the current thread
+_unit_of_work = threading.local()
+
+def _active_transactions():
+    """Returns {id(pool or connection): connection} for the current thread."""
+    if not hasattr(_unit_of_work, "connections"):
+        _unit_of_work.connections = {}
+    return _unit_of_work.connections
+
+def _in_unit_of_work(connection):
+    """True when `connection` is running inside transaction() in this thread."""
+    return any(conn is connection for conn in _active_transactions().values())
+
+# Borrows a connection from a pool, or passes a plain connection through
+@contextmanager
+def borrow_connection(source):
+    """
+    Yields a usable connection for a single operation. Inside transaction() the
+    transaction's own connection is yielded so every statement joins the same unit
+    of work.
+
+    Parameters:
+        source - a ConnectionPool or an already open connection
+    """
+    active = _active_transactions().get(id(source))
+    if active is not None:
+        yield active
+    elif isinstance(source, ConnectionPool):
+        with source.connection() as connection:
+            yield connection
+    else:
+        yield source
+
+# Groups several statements into one atomic commit
+@contextmanager
+def transaction(source):
+    """
+    Unit of work: every execute_query / bulk_insert / check_record_existance call
+    made with `source` (or with the yielded connection) inside the block runs on one
+    connection without auto-committing. The block commits once on success and
+    rolls back if it raises; statement errors inside the block are re-raised so
+    they abort it. Nested blocks join the outer transaction.
+
+    Parameters:
+        source - a ConnectionPool or an already open connection
+
+    Usage:
+        with transaction(pool) as conn:
+            execute_query(pool, "INSERT ...", params)
+            execute_query(conn, "UPDATE ...", params)
+    """
+    transactions = _active_transactions()
+    if id(source) in transactions:
+        yield transactions[id(source)]
+        return
+
+    with borrow_connection(source) as conn:
+        if conn.in_transaction:
+            # End the implicit snapshot a non-autocommit connection may hold
+            conn.commit()
+        conn.start_transaction()
+        transactions[id(source)] = conn
+        transactions[id(conn)] = conn
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            # Existence answers seen inside the rolled back work may be wrong now
+            invalidate_existence_cache()
+            raise
+        finally:
+            transactions.pop(id(source), None)
+            transactions.pop(id(conn), None)
+            written = _pending_versions()
+            if written:
+                _bump_versions(None if None in written else list(written))
+                written.clear()
+
+# Function to end a read-only operation without a needless commit
+def finish_read(connection):
+    """
+    Closes the read snapshot a non-autocommit connection opened for a report so
+    the next report sees fresh data. Pooled (autocommit) connections hold no
+    snapshot, so nothing is sent to the server for them, and nothing is done
+    inside a unit of work.
+    """
+    try:
+        if connection.in_transaction and not _in_unit_of_work(connection):
+            connection.commit()
+    except DB_ERRORS as e:
+        print(f"❌ Error ending read transaction: {e}")
+
+# Function to open a cursor whose statements are timed and counted
+def open_cursor(connection, **kwargs):
+    """
+    Returns connection.cursor(**kwargs) wrapped in an InstrumentedCursor, so every
+    statement run on it is recorded by instrumentation (timings, rows, fingerprint,
+    slow-query log). Use it wherever code would call connection.cursor().
+    """
+    return InstrumentedCursor(connection.cursor(**kwargs))
+
+# Per-connection LRU of server-side prepared statements
+class StatementCache:
+    """
+    Maps SQL text to an open prepared cursor so repeated statements skip the
+    server-side parse. The least recently used statement is closed (and
+    deallocated on the server) once the cache holds `max_size` entries.
+    """
+
+    # Counters shared by every connection's cache
+    _totals = {"hits": 0, "misses": 0, "evictions": 0}
+    _totals_lock = threading.Lock()
+
+    def __init__(self, connection, max_size=STATEMENT_CACHE_SIZE):
+        self.connection = connection
+        self.max_size = max_size
+        self._cursors = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _count(self, counter):
+        setattr(self, counter, getattr(self, counter) + 1)
+        with StatementCache._totals_lock:
+            StatementCache._totals[counter] += 1
+
+    def get(self, query):
+        """Returns the prepared cursor for `query`, preparing it on a miss."""
+        cursor = self._cursors.get(query)
+        if cursor is not None:
+            self._cursors.move_to_end(query)
+            self._count("hits")
+            return cursor
+        self._count("misses")
+        cursor = self.connection.cursor(prepared=True)
+        self._cursors[query] = cursor
+        if len(self._cursors) > self.max_size:
+            _, oldest = self._cursors.popitem(last=False)
+            self._count("evictions")
+            _close_quietly(oldest)
+        return cursor
+
+    def discard(self, query):
+        """Drops a statement, e.g. after it failed and left its cursor unusable."""
+        cursor = self._cursors.pop(query, None)
+        if cursor is not None:
+            _close_quietly(cursor)
+
+    def clear(self):
+        """Closes every cached statement."""
+        while self._cursors:
+            _, cursor = self._cursors.popitem()
+            _close_quietly(cursor)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self._cursors)}
+
+def _close_quietly(cursor):
+    try:
+        cursor.close()
+    except DB_ERRORS:
+        pass
+
+def _statement_cache(connection):
+    """Returns the connection's statement cache, creating it on first use."""
+    cache = getattr(connection, "_ups_statement_cache", None)
+    if cache is None:
+        cache = StatementCache(connection)
+        connection._ups_statement_cache = cache
+    return cache
+
+# Function to drop the prepared statements held for a connection
+def clear_statement_cache(connection):
+    """
+    Closes the prepared statements cached for a connection. Needed whenever the
+    server session goes away (close, reconnect), since statements are per session.
+    """
+    cache = getattr(connection, "_ups_statement_cache", None)
+    if cache is not None:
+        cache.clear()
+
+# Function to report prepared statement cache effectiveness
+def statement_cache_stats(connection=None):
+    """
+    Returns hit/miss/eviction counters of the prepared statement cache.
+
+    Parameters:
+        connection - report only this connection's cache; all caches when omitted
+    """
+    if connection is not None:
+        cache = getattr(connection, "_ups_statement_cache", None)
+        return cache.stats() if cache else {"hits": 0, "misses": 0, "evictions": 0, "size": 0}
+    with StatementCache._totals_lock:
+        return dict(StatementCache._totals)
+
 # Function to execute a query with parameters (for SELECT and non-SELECT queries)
 def execute_query(connection, query, params=(), select=False):
     """
-    Executes a given SQL query.
-    
+    Executes a given SQL query. Data statements run as server-side prepared
+    statements that are cached per connection, so repeating the same SQL text
+    skips the parse step.
+
     Parameters:
-        connection - the MySQL connection object
+        connection - a ConnectionPool (a connection is borrowed for the call)
+                     or a MySQL connection object
         query - SQL query to execute
         params - parameters for query placeholders
         select - boolean, set to True for SELECT queries to fetch results
-    
+
     Returns:
         For SELECT queries: returns fetched results
-        For non-SELECT queries: commits transaction (INSERT, UPDATE, DELETE)
+        For non-SELECT queries: commits transaction (INSERT, UPDATE, DELETE),
+        unless the call runs inside transaction(), which commits once at the end
     """
+    in_uow = False
     try:
-        cursor = connection.cursor()
-        cursor.execute(query, params)
-        if select:
-            # Fetch and return results if the query is a SELECT statement
-            result = cursor.fetchall()
+        with borrow_connection(connection) as conn:
+            in_uow = _in_unit_of_work(conn)
+            use_cache = STATEMENT_CACHE_SIZE > 0 and query.lstrip().upper().startswith(_PREPARABLE)
+            if use_cache:
+                cache = _statement_cache(conn)
+                cache.max_size = STATEMENT_CACHE_SIZE
+                cursor = InstrumentedCursor(cache.get(query))
+            else:
+                cursor = open_cursor(conn)
+            try:
+                cursor.execute(query, params)
+                if select:
+                    # Fetch and return results if the query is a SELECT statement
+                    return cursor.fetchall()
+                cursor.finish()
+                # For INSERT, UPDATE, DELETE, commits transaction (autocommit
+                # connections have already committed on the server)
+                if conn.in_transaction and not in_uow:
+                    conn.commit()
+                _note_write(query)
+            except DB_ERRORS:
+                if use_cache:
+                    cache.discard(query)
+                raise
+            finally:
+                if not use_cache:
+                    cursor.close()
+    except DB_ERRORS as e:
+        print(f"❌ Error executing query: {e}")
+        if in_uow:
+            raise
+
+# Function to stream the rows of a large SELECT in bounded memory
+def stream_query(connection, query, params=(), chunk_size=STREAM_CHUNK_SIZE, headers=None):
+    """
+    Executes a SELECT on an unbuffered cursor and yields its rows one at a time,
+    fetching `chunk_size` rows per round trip, so memory stays bounded no matter
+    how large the result is.
+
+    Parameters:
+        connection - a ConnectionPool (a connection is held until the stream ends,
+                     or the transaction()'s own connection is used inside one)
+                     or a MySQL connection object
+        query - SQL query to execute
+        params - parameters for query placeholders
+        chunk_size - number of rows fetched from the server at a time
+        headers - optional list that receives the result's column names as soon
+                  as the query has run (before the first row is yielded)
+
+    Yields:
+        Result rows as tuples. Errors are reported and re-raised, since a silently
+        truncated stream would look like a complete result.
+
+    Stopping early (break, close()) is safe: a connection checked out for the
+    stream is discarded so the unread rows die with its socket, a transaction's or
+    a plain connection has them consumed.
+    """
+    owned = isinstance(connection, ConnectionPool) and id(connection) not in _active_transactions()
+    with borrow_connection(connection) as conn:
+        cursor = None
+        finished = False
+        try:
+            cursor = open_cursor(conn, buffered=False)
+            cursor.execute(query, params)
+            if headers is not None:
+                headers[:] = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+            finished = True
+        except DB_ERRORS as e:
+            print(f"❌ Error streaming query: {e}")
+            raise
+        finally:
+            if not finished and not owned:
+                try:
+                    conn.consume_results()
+                except DB_ERRORS:
+                    pass
+            if cursor is not None:
+                _close_quietly(cursor)
+
+# Functions run for every bulk_insert batch, by table: hook(conn, columns, batch)
+_bulk_insert_hooks = {}
+
+# Function to keep derived data in step with bulk loads
+def register_bulk_insert_hook(table_name, hook):
+    """
+    Registers hook(conn, columns, batch) to run after each batch bulk_insert sends
+    to `table_name`, on the same connection and before the batch commits, so
+    derived tables (summaries, sketches, ...) commit or roll back with the rows.
+    """
+    hooks = _bulk_insert_hooks.setdefault(resolve_table(table_name), [])
+    if hook not in hooks:
+        hooks.append(hook)
+
+# Raised by bulk_insert when a batch fails outside transaction()
+class BulkInsertError(DatabaseError):
+    """Carries how far the load got: `inserted` rows stayed committed, the
+    `rejected` rows of the failing batch were rolled back."""
+
+    def __init__(self, table_name, inserted, rejected, error):
+        super().__init__(f"Error bulk inserting into {table_name} after {inserted} rows: {error}")
+        self.table_name = table_name
+        self.inserted = inserted
+        self.rejected = rejected
+        self.error = error
+
+# Function to insert many rows into a table with one commit per batch
+def bulk_insert(connection, table_name, rows, columns=None, batch_size=BULK_BATCH_SIZE):
+    """
+    Inserts rows into any UPS table as multi-row INSERT statements.
+
+    Parameters:
+        connection - a ConnectionPool or a MySQL connection object
+        table_name - one of the tables in schema.TABLES (any letter case)
+        rows - iterable of row tuples, consumed lazily batch by batch
+        columns - column names matching the tuples, defaults to the table's
+                  insert columns from schema.TABLES
+        batch_size - rows per INSERT statement and per commit
+
+    Returns:
+        Number of rows committed. Hooks registered with register_bulk_insert_hook
+        run inside each batch.
+
+    Raises:
+        BulkInsertError when a batch fails: that batch is rolled back, earlier
+        batches stay committed and the rows not yet read from `rows` are left
+        there. Inside transaction() nothing is committed per batch and the
+        database error itself is re-raised so the whole unit of work rolls back.
+    """
+    table_name = resolve_table(table_name)
+    columns = list(columns or TABLES[table_name]["insert_columns"])
+    placeholders = ", ".join(["%s"] * len(columns))
+    query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+    hooks = list(_bulk_insert_hooks.get(table_name, ()))
+    inserted = 0
+    batch = []
+
+    with borrow_connection(connection) as conn:
+        in_uow = _in_unit_of_work(conn)
+        cursor = open_cursor(conn)
+        try:
+            for row in rows:
+                batch.append(tuple(row))
+                if len(batch) >= batch_size:
+                    inserted += _insert_batch(conn, cursor, query, batch, not in_uow, hooks, columns)
+                    batch = []
+            if batch:
+                inserted += _insert_batch(conn, cursor, query, batch, not in_uow, hooks, columns)
+        except DB_ERRORS as e:
+            invalidate_existence_cache(table_name)
+            bump_table_versions([table_name])
+            if in_uow:
+                raise
+            conn.rollback()
+            raise BulkInsertError(table_name, inserted, len(batch), e) from e
+        finally:
             cursor.close()
-            return result
+    if inserted:
+        invalidate_existence_cache(table_name)
+        bump_table_versions([table_name])
+    return inserted
+
+def _insert_batch(conn, cursor, query, batch, commit=True, hooks=(), columns=()):
+    """Sends one batch, runs the table's bulk insert hooks and commits it.
+    executemany rewrites a plain INSERT ... VALUES into a single multi-row
+    INSERT on MySQL."""
+    if commit and not conn.in_transaction:
+        conn.start_transaction()
+    cursor.executemany(query, batch)
+    for hook in hooks:
+        hook(conn, columns, batch)
+    if commit:
+        conn.commit()
+    return len(batch)
+
+# Matches the target table of INSERT / REPLACE / UPDATE / DELETE statements
+_WRITE_PATTERN = re.compile(
+    r"^\s*(INSERT|REPLACE|UPDATE|DELETE)\b(?:\s+(?:LOW_PRIORITY|IGNORE|INTO|FROM))*\s+`?(\w+)`?",
+    re.IGNORECASE)
+
+def _written_table(query):
+    """Returns (statement kind, table name) for a write statement, else None."""
+    match = _WRITE_PATTERN.match(query)
+    if match is None:
+        return None
+    return match.group(1).upper(), match.group(2)
+
+def _note_write(query):
+    """Invalidates cached state that a successful write statement may have changed."""
+    written = _written_table(query)
+    if written is None:
+        return
+    kind, table_name = written
+    # Deletes can cascade through foreign keys, so they invalidate every table
+    invalidate_existence_cache(None if kind == "DELETE" else table_name)
+    bump_table_versions(None if kind == "DELETE" else [table_name])
+
+# Per-table data versions: table name (lower case) -> counter bumped on every write
+# made through this module, so caches of query results can tell when they are stale
+_table_versions = {}
+_versions_lock = threading.Lock()
+
+# Function to read the current data version of tables
+def table_versions(table_names):
+    """Returns the data versions of `table_names` as a tuple, in the same order."""
+    with _versions_lock:
+        return tuple(_table_versions.get(name.lower(), 0) for name in table_names)
+
+# Function to mark tables as changed
+def bump_table_versions(table_names=None):
+    """
+    Bumps the data version of `table_names`, or of every table when None. Writes
+    made through execute_query and bulk_insert do this automatically; call it after
+    changing tables by other means.
+
+    Inside transaction() the versions are bumped again when the transaction ends:
+    results read by other connections meanwhile predate the commit (or rollback).
+    """
+    _bump_versions(table_names)
+    if _active_transactions():
+        _pending_versions().update([None] if table_names is None else table_names)
+
+def _bump_versions(table_names):
+    with _versions_lock:
+        if table_names is None:
+            table_names = set(TABLES) | set(_table_versions)
+        for name in table_names:
+            key = name.lower()
+            _table_versions[key] = _table_versions.get(key, 0) + 1
+
+def _pending_versions():
+    """Tables written by the unit of work running in this thread (None = all tables)."""
+    if not hasattr(_unit_of_work, "written"):
+        _unit_of_work.written = set()
+    return _unit_of_work.written
+
+# Short-lived cache of existence answers:
+# (database identity, table, column, value) -> (exists, expires_at)
+_existence_cache = {}
+_existence_lock = threading.Lock()
+
+def _existence_key(connection, table_name, column_name, value):
+    return database_of(connection), table_name.lower(), column_name.lower(), str(value)
+
+def _cached_existence(key):
+    with _existence_lock:
+        entry = _existence_cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del _existence_cache[key]
+            return None
+        return entry[0]
+
+def _remember_existence(key, exists, ttl):
+    if ttl > 0:
+        with _existence_lock:
+            _existence_cache[key] = (exists, time.monotonic() + ttl)
+
+# Function to forget cached existence answers
+def invalidate_existence_cache(table_name=None):
+    """
+    Drops cached existence answers for one table (in every database), or for all
+    tables when `table_name` is None. Called automatically for writes made through
+    execute_query and bulk_insert; writes made by other processes are only
+    bounded by EXISTENCE_CACHE_TTL.
+    """
+    with _existence_lock:
+        if table_name is None:
+            _existence_cache.clear()
+            return
+        table_key = table_name.lower()
+        for key in [key for key in _existence_cache if key[1] == table_key]:
+            del _existence_cache[key]
+
+# Function to check whether a table exists in the connected database
+def table_exists(connection, table_name):
+    """True when `table_name` exists in the current database (MySQL or SQLite)."""
+    with borrow_connection(connection) as conn:
+        if dialect_of(conn) == "sqlite":
+            query = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = %s"
         else:
-            # For INSERT, UPDATE, DELETE, commits transaction
-            connection.commit()
-            cursor.close()
-    except Error as e:
-        print(f"❌ Error executing query: {e}")
-    finally:
-        cursor.close()
+            query = "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s"
+        # Never end a transaction the caller has open (e.g. a bulk_insert batch)
+        in_transaction = conn.in_transaction
+        with open_cursor(conn) as cursor:
+            cursor.execute(query, (table_name,))
+            exists = cursor.fetchone()[0] > 0
+        if not in_transaction:
+            finish_read(conn)
+        return exists
 
 # Function to check if a specific record exists
-def check_record_existance(table_name, column_name, value, connection):
+def check_record_existance(table_name, column_name, value, connection, ttl=None):
     """
     Checks for the existence of a specific record in a table.
-    
+
     Parameters:
         table_name - the name of the table to search
         column_name - the column to match the value against
         value - the value to search for
-        connection - the MySQL connection object
+        connection - a ConnectionPool or a MySQL connection object
+        ttl - seconds to reuse the answer, defaults to EXISTENCE_CACHE_TTL
 
     Returns:
         True if the record exists, otherwise False.
     """
-    try:
-        # Build and execute a SELECT COUNT query to check record existence
-        query = f"SELECT COUNT(*) FROM {table_name} WHERE {column_name} = %s"
-        cursor = connection.cursor()
-        cursor.execute(query, (value,))
-        result = cursor.fetchone()[0]
-        cursor.close()
-        return result > 0  # Returns True if count is greater than 0
-    except Error as e:
-        print(f"❌ Error checking record existence: {e}")
-        return False
\ No newline at end of file
+    ttl = EXISTENCE_CACHE_TTL if ttl is None else ttl
+    key = _existence_key(connection, table_name, column_name, value)
+    if ttl > 0:
+        cached = _cached_existence(key)
+        if cached is not None:
+            return cached
+
+    # EXISTS stops at the first matching row instead of counting all of them
+    query = f"SELECT EXISTS(SELECT 1 FROM {table_name} WHERE {column_name} = %s LIMIT 1)"
+    result = execute_query(connection, query, (value,), select=True)
+    if not result:
+        print("❌ Error checking record existence.")
+        return False
+    exists = bool(result[0][0])
+    _remember_existence(key, exists, ttl)
+    return exists
+
+# Function to check many IDs at once
+def find_missing_records(table_name, column_name, values, connection, chunk_size=BULK_BATCH_SIZE, ttl=None):
+    """
+    Checks many values in one query per chunk instead of one round trip each.
+
+    Parameters:
+        table_name - the name of the table to search
+        column_name - the column to match the values against
+        values - iterable of values to look for
+        connection - a ConnectionPool or a MySQL connection object
+        chunk_size - values per IN (...) list
+        ttl - seconds to cache the individual answers, defaults to EXISTENCE_CACHE_TTL
+
+    Returns:
+        List of the values (in input order, without duplicates) that have no
+        matching record. Values are compared by their string form, so '42' and 42
+        are treated as the same ID.
+    """
+    ttl = EXISTENCE_CACHE_TTL if ttl is None else ttl
+    unique = OrderedDict()
+    for value in values:
+        unique.setdefault(_existence_key(connection, table_name, column_name, value), value)
+
+    answers = {}
+    pending = []
+    for key, value in unique.items():
+        cached = _cached_existence(key) if ttl > 0 else None
+        if cached is None:
+            pending.append(key)
+        else:
+            answers[key] = cached
+
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        query = f"SELECT DISTINCT {column_name} FROM {table_name} WHERE {column_name} IN ({placeholders})"
+        result = execute_query(connection, query, tuple(unique[key] for key in chunk), select=True)
+        if result is None:
+            print("❌ Error checking record existence.")
+            return None
+        found = {str(row[0]) for row in result}
+        for key in chunk:
+            answers[key] = key[3] in found
+            _remember_existence(key, answers[key], ttl)
+
+    return [value for key, value in unique.items() if not answers[key]]
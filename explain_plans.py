@@ -0,0 +1,196 @@
+# explain_plans.py
+import hashlib
+import json
+import os
+import re
+
+from complex_operations import REPORTS, report_sql
+from date_buckets import date_buckets_ready
+from db import DB_ERRORS, dialect_of, finish_read, open_cursor
+from rendering import render_table
+
+# File holding the saved plan baseline for every report
+PLAN_BASELINE_FILE = "plan_baseline.json"
+
+# A report whose estimated cost grows by more than this factor is flagged
+COST_REGRESSION_FACTOR = 2.0
+
+# Function to explain one statement
+def explain_query(conn, query):
+    """
+    Runs EXPLAIN for a statement and reduces the plan to what matters for
+    regression checks.
+
+    Parameters:
+        conn - an open connection (MySQL uses EXPLAIN FORMAT=JSON, SQLite uses
+               EXPLAIN QUERY PLAN)
+        query - the SQL to explain
+
+    Returns:
+        dict with the per-table access ('ALL' is a full scan), the tables read by
+        full scan, whether a filesort or temporary table is used, the estimated cost
+        (MySQL only, None on SQLite) and a short fingerprint of the plan shape.
+    """
+    statement = query.strip().rstrip(";")
+    with open_cursor(conn) as cursor:
+        if dialect_of(conn) == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}")
+            plan = _summarize_sqlite_plan([row[3] for row in cursor.fetchall()])
+        else:
+            cursor.execute(f"EXPLAIN FORMAT=JSON {statement}")
+            plan = _summarize_mysql_plan(json.loads(cursor.fetchone()[0]))
+    shape = json.dumps([plan["access"], plan["filesort"], plan["temporary"]], sort_keys=True)
+    plan["fingerprint"] = hashlib.sha1(shape.encode("utf-8")).hexdigest()[:12]
+    return plan
+
+def _summarize_mysql_plan(document):
+    plan = {"access": {}, "full_scans": [], "filesort": False, "temporary": False, "cost": None}
+    cost = document.get("query_block", {}).get("cost_info", {}).get("query_cost")
+    plan["cost"] = float(cost) if cost is not None else None
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get("using_filesort"):
+                plan["filesort"] = True
+            if node.get("using_temporary_table"):
+                plan["temporary"] = True
+            table = node.get("table")
+            if isinstance(table, dict) and "table_name" in table:
+                name = table["table_name"]
+                access = table.get("access_type", "ALL")
+                key = table.get("key")
+                plan["access"][name] = f"{access}:{key}" if key else access
+                if access == "ALL":
+                    plan["full_scans"].append(name)
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(document)
+    return plan
+
+_SQLITE_STEP = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\S+)(?: AS \S+)?(?: USING (.*))?$")
+
+def _summarize_sqlite_plan(details):
+    plan = {"access": {}, "full_scans": [], "filesort": False, "temporary": False, "cost": None}
+    for detail in details:
+        if detail.startswith("USE TEMP B-TREE FOR"):
+            if "ORDER BY" in detail:
+                plan["filesort"] = True
+            else:
+                plan["temporary"] = True
+            continue
+        match = _SQLITE_STEP.match(detail)
+        if not match or match.group(2) == "CONSTANT":
+            continue
+        kind, name, using = match.groups()
+        if kind == "SCAN" and not using:
+            access = "ALL"
+            plan["full_scans"].append(name)
+        elif kind == "SCAN":
+            access = f"index:{using}"
+        else:
+            access = f"ref:{using}"
+        plan["access"][name] = access
+    return plan
+
+# Function to explain every registered report
+def capture_plans(conn, names=None):
+    """
+    Explains each report in complex_operations.REPORTS (or only `names`).
+
+    Returns:
+        dict of report name -> plan summary, or -> {"error": message} when the
+        report could not be explained.
+    """
+    plans = {}
+    dialect = dialect_of(conn)
+    buckets = date_buckets_ready(conn)
+    for name in names or REPORTS:
+        try:
+            plans[name] = explain_query(conn, report_sql(name, dialect, buckets))
+        except DB_ERRORS as e:
+            plans[name] = {"error": str(e)}
+        finally:
+            finish_read(conn)
+    return plans
+
+# Function to compare a plan against its baseline
+def compare_plans(baseline, current):
+    """
+    Lists the ways `current` is worse than `baseline`: a table that was read
+    through an index is now fully scanned, a new filesort or temporary table, or
+    an estimated cost more than COST_REGRESSION_FACTOR times higher.
+    """
+    if "error" in current:
+        return [f"could not explain: {current['error']}"]
+    if "error" in baseline:
+        return []
+    issues = []
+    for table in current["full_scans"]:
+        before = baseline["access"].get(table)
+        if before is not None and before.split(":")[0] != "ALL":
+            issues.append(f"full scan of {table} replaced index access ({before})")
+    if current["filesort"] and not baseline["filesort"]:
+        issues.append("new filesort")
+    if current["temporary"] and not baseline["temporary"]:
+        issues.append("new temporary table")
+    if baseline.get("cost") and current.get("cost") and current["cost"] > baseline["cost"] * COST_REGRESSION_FACTOR:
+        issues.append(f"estimated cost rose from {baseline['cost']:.1f} to {current['cost']:.1f}")
+    return issues
+
+# Function to save plans as the new baseline
+def save_baseline(plans, path=PLAN_BASELINE_FILE):
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(plans, handle, indent=2, sort_keys=True)
+
+# Function to load the saved baseline
+def load_baseline(path=PLAN_BASELINE_FILE):
+    """Returns the saved plans, or None when no baseline has been captured yet."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+# Function to check every report against the saved baseline
+def check_plan_regressions(conn, path=PLAN_BASELINE_FILE):
+    """
+    Explains every report and compares it with the saved baseline.
+
+    Returns:
+        (plans, regressions) where regressions maps report name -> list of issues;
+        regressions is None when there is no baseline to compare against.
+    """
+    plans = capture_plans(conn)
+    baseline = load_baseline(path)
+    if baseline is None:
+        return plans, None
+    regressions = {}
+    for name, plan in plans.items():
+        if name in baseline:
+            issues = compare_plans(baseline[name], plan)
+            if issues:
+                regressions[name] = issues
+    return plans, regressions
+
+# Function to display captured plans
+def print_plans(plans, regressions=None):
+    """Prints one line per report: plan fingerprint, cost, scans and flags."""
+    regressions = regressions or {}
+    headers = ["Report", "Plan", "Cost", "Full Scans", "Filesort", "Temp", "Regressions"]
+    rows = []
+    for name, plan in plans.items():
+        if "error" in plan:
+            rows.append((name, "-", "-", "-", "-", "-", f"error: {plan['error'][:40]}"))
+            continue
+        rows.append((
+            name, plan["fingerprint"],
+            f"{plan['cost']:.1f}" if plan["cost"] is not None else "n/a",
+            ", ".join(plan["full_scans"]) or "-",
+            "yes" if plan["filesort"] else "no",
+            "yes" if plan["temporary"] else "no",
+            "; ".join(regressions.get(name, [])) or "-",
+        ))
+    render_table(headers, rows)
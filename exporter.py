@@ -0,0 +1,178 @@
+# exporter.py
+import datetime
+import gzip
+import io
+import itertools
+import os
+import time
+
+from complex_operations import REPORTS, report_sql
+from date_buckets import bucket_columns, date_buckets_ready
+from db import borrow_connection, dialect_of, stream_query
+from rendering import write_rows
+from schema import TABLES, resolve_table, table_columns
+
+# Column a table's date-range filter applies to unless another one is named
+EXPORT_DATE_COLUMNS = {
+    "Customers": "DOB",
+    "Shipments": "shipment_date",
+    "Payments": "payment_date",
+    "DeliveryAttempts": "attempt_date",
+    "PackageStatus": "status_timestamp",
+    "Pickup_Requests": "pickup_date",
+}
+
+def _date_bounds(date_from, date_to):
+    """Returns ('YYYY-MM-DD' or None, day after date_to as 'YYYY-MM-DD' or None)."""
+    start = datetime.date.fromisoformat(str(date_from)) if date_from else None
+    end = datetime.date.fromisoformat(str(date_to)) + datetime.timedelta(days=1) if date_to else None
+    return (start and start.isoformat()), (end and end.isoformat())
+
+def _open_output(destination, compress):
+    """Returns (text stream, finish(success)) for a path or a binary stream. Files
+    are written next to the target and renamed into place only when complete."""
+    if hasattr(destination, "write"):
+        raw, partial = destination, None
+    else:
+        partial = f"{destination}.part"
+        raw = open(partial, "wb")
+    compressed = gzip.GzipFile(fileobj=raw, mode="wb") if compress else None
+    text = io.TextIOWrapper(compressed or raw, encoding="utf-8", newline="")
+
+    def finish(success):
+        text.flush()
+        text.detach()
+        if compressed is not None:
+            compressed.close()
+        if partial is None:
+            raw.flush()
+            return
+        raw.close()
+        if success:
+            os.replace(partial, destination)
+        else:
+            os.remove(partial)
+
+    return text, finish
+
+def _write_export(headers, rows, destination, output_format, compress):
+    started = time.perf_counter()
+    out, finish = _open_output(destination, compress)
+    try:
+        count = write_rows(headers, rows, out, output_format)
+    except BaseException:
+        finish(False)
+        raise
+    finish(True)
+    return {"rows": count, "seconds": round(time.perf_counter() - started, 3)}
+
+def _compress_for(destination, compress):
+    if compress is not None:
+        return compress
+    return isinstance(destination, str) and destination.endswith(".gz")
+
+# Function to export a UPS table
+def export_table(connection, table_name, destination, output_format="csv", columns=None,
+                 date_from=None, date_to=None, date_column=None, compress=None):
+    """
+    Streams a table to CSV or JSON lines on an unbuffered cursor, so memory stays
+    flat however many rows it has.
+
+    Parameters:
+        connection - a ConnectionPool or an already open connection
+        table_name - one of schema.TABLES (any letter case)
+        destination - file path (written to <path>.part, then renamed) or a
+                      binary stream such as sys.stdout.buffer
+        output_format - 'csv' or 'jsonl'
+        columns - column subset, in output order; all columns by default
+        date_from, date_to - inclusive 'YYYY-MM-DD' range, filtered in SQL as
+                             column >= from AND column < day after `to`, so an
+                             index on the column can be used
+        date_column - column the range applies to, defaults to the table's
+                      entry in EXPORT_DATE_COLUMNS
+        compress - gzip the output; defaults to True for paths ending in .gz
+
+    Returns:
+        dict with the rows written and the seconds taken.
+    """
+    table_name = resolve_table(table_name)
+    available = table_columns(table_name) + bucket_columns(connection, table_name)
+    lookup = {column.lower(): column for column in available}
+    selected = [lookup.get(column.lower()) for column in columns] if columns else table_columns(table_name)
+    date_column = lookup.get((date_column or EXPORT_DATE_COLUMNS.get(table_name, "")).lower())
+    if None in selected:
+        raise ValueError(f"Unknown column(s) for {table_name}: "
+                         f"{', '.join(column for column in columns if column.lower() not in lookup)}")
+
+    conditions, params = [], []
+    start, end = _date_bounds(date_from, date_to)
+    if (start or end) and date_column is None:
+        raise ValueError(f"{table_name} has no date column to filter on; name one of: {', '.join(available)}")
+    if start:
+        conditions.append(f"{date_column} >= %s")
+        params.append(start)
+    if end:
+        conditions.append(f"{date_column} < %s")
+        params.append(end)
+    query = f"SELECT {', '.join(selected)} FROM {table_name}"
+    if conditions:
+        query += f" WHERE {' AND '.join(conditions)}"
+
+    rows = stream_query(connection, query, tuple(params))
+    try:
+        return _write_export(selected, rows, destination, output_format, _compress_for(destination, compress))
+    finally:
+        rows.close()
+
+# Function to export a registered report
+def export_report(connection, name, destination, output_format="csv", columns=None,
+                  date_from=None, date_to=None, date_column=None, compress=None):
+    """
+    Streams report `name` from complex_operations.REPORTS to CSV or JSON lines.
+    The report SQL runs unchanged (after the report's prepare step) on an
+    unbuffered cursor. The column subset and the date range (inclusive, applied
+    to `date_column` of the report's output) are applied to the rows as they
+    stream past.
+
+    Parameters and result as for export_table.
+    """
+    if name not in REPORTS:
+        raise ValueError(f"Unknown report '{name}'")
+    start, end = _date_bounds(date_from, date_to)
+    if (start or end) and not date_column:
+        raise ValueError("A date range on a report needs the report column to filter on")
+
+    with borrow_connection(connection) as conn:
+        prepare = REPORTS[name].get("prepare")
+        if prepare is not None:
+            prepare(conn)
+        headers = []
+        rows = stream_query(conn, report_sql(name, dialect_of(conn), date_buckets_ready(conn)), headers=headers)
+        try:
+            first = next(rows, None)
+            lookup = {header.lower(): position for position, header in enumerate(headers)}
+            wanted = [column.lower() for column in (columns or headers)]
+            missing = [column for column in wanted + ([date_column.lower()] if date_column else []) if column not in lookup]
+            if missing:
+                raise ValueError(f"Unknown column(s) for report {name}: {', '.join(missing)}. "
+                                 f"Expected some of: {', '.join(headers)}")
+            positions = [lookup[column] for column in wanted]
+            stream = rows if first is None else itertools.chain([first], rows)
+            if start or end:
+                date_position = lookup[date_column.lower()]
+                # ISO dates and datetimes compare correctly as text on their first 10 characters
+                stream = (row for row in stream if row[date_position] is not None
+                          and (not start or str(row[date_position])[:10] >= start)
+                          and (not end or str(row[date_position])[:10] < end))
+            selected = (tuple(row[position] for position in positions) for row in stream)
+            return _write_export([headers[position] for position in positions], selected, destination,
+                                 output_format, _compress_for(destination, compress))
+        finally:
+            rows.close()
+
+# Function to export a table or a report by name
+def export_source(connection, source, destination, **options):
+    """Exports a UPS table (any letter case) or, failing that, a report named `source`."""
+    if source.lower() in (table.lower() for table in TABLES):
+        return export_table(connection, source, destination, **options)
+    return export_report(connection, source, destination, **options)
@@ -0,0 +1,181 @@
+# importer.py
+import csv
+import os
+import time
+
+from date_buckets import DATE_BUCKETS
+from db import (BULK_BATCH_SIZE, DB_ERRORS, BulkInsertError, ConnectionPool, bulk_insert, bump_table_versions,
+                dialect_of, invalidate_existence_cache, open_cursor)
+from schema import DERIVED_TABLES, TABLES, resolve_table, table_columns
+from sketches import SKETCH_TABLE, rebuild_sketches
+from summaries import (DELIVERY_STATS_TABLE, PAYMENT_SUMMARY_TABLE, rebuild_delivery_stats,
+                       rebuild_payment_summary)
+
+# How each derived table is rebuilt once the rows it is computed from were loaded
+_REBUILDS = {
+    PAYMENT_SUMMARY_TABLE: rebuild_payment_summary,
+    DELIVERY_STATS_TABLE: rebuild_delivery_stats,
+    SKETCH_TABLE: rebuild_sketches,
+}
+
+# Derived tables that fold in new rows above a key high-water mark; imported keys may
+# lie below it, so these are rebuilt after batched inserts too
+_WATERMARKED = (DELIVERY_STATS_TABLE, SKETCH_TABLE)
+
+def _csv_columns(table_name, header):
+    """Maps a CSV header to the table's columns (any letter case). Returns
+    (column names, positions in the row); date bucket columns are skipped since
+    the database computes them."""
+    columns = {column.lower(): column for column in table_columns(table_name)}
+    generated = {bucket[0].lower() for bucket in DATE_BUCKETS.get(table_name, ())}
+    names, positions = [], []
+    unknown = []
+    for position, title in enumerate(header):
+        key = title.strip().lower()
+        if key in generated:
+            continue
+        if key not in columns:
+            unknown.append(title)
+            continue
+        names.append(columns[key])
+        positions.append(position)
+    if unknown or not names:
+        raise ValueError(f"CSV columns not in {table_name}: {', '.join(unknown) or '(none given)'}. "
+                         f"Expected some of: {', '.join(columns.values())}")
+    return names, positions
+
+def _read_rows(path, positions):
+    # Empty cells become NULL; utf-8-sig drops the BOM spreadsheet tools write
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        reader = csv.reader(handle)
+        next(reader, None)
+        for row in reader:
+            if not row:
+                continue
+            if len(row) <= max(positions):
+                raise ValueError(f"{path}, line {reader.line_num}: expected at least {max(positions) + 1} fields")
+            yield tuple(row[position] if row[position] != "" else None for position in positions)
+
+def _line_terminator(path):
+    with open(path, "rb") as handle:
+        return "\r\n" if handle.readline().endswith(b"\r\n") else "\n"
+
+def _load_data(pool, table_name, path, columns, positions, width):
+    """Runs LOAD DATA LOCAL INFILE on a connection opened with local infile allowed.
+    Returns the rows loaded."""
+    # Every field is read into a variable; unmapped ones are simply not used
+    variables = ", ".join(f"@v{position}" for position in range(width))
+    assignments = ", ".join(f"{column} = NULLIF(@v{position}, '')" for column, position in zip(columns, positions))
+    query = (f"LOAD DATA LOCAL INFILE %s INTO TABLE {table_name} CHARACTER SET utf8mb4 "
+             f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+             f"LINES TERMINATED BY %s IGNORE 1 LINES ({variables}) SET {assignments}")
+    conn = pool.backend.connect(allow_local_infile=True)
+    try:
+        conn.start_transaction()
+        with open_cursor(conn) as cursor:
+            cursor.execute(query, (os.path.abspath(path), _line_terminator(path)))
+            loaded = cursor.rowcount
+        conn.commit()
+        return loaded
+    except DB_ERRORS:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# Function to rebuild the derived tables of loaded tables
+def rebuild_derived_tables(connection, table_names):
+    """Rebuilds every summary or sketch table computed from `table_names`;
+    returns {derived table: rows written}."""
+    table_names = {resolve_table(name) for name in table_names}
+    return {derived: _REBUILDS[derived](connection)
+            for derived, sources in DERIVED_TABLES.items() if table_names.intersection(sources)}
+
+# Function to import one CSV file into a UPS table
+def import_csv(connection, table_name, path, batch_size=BULK_BATCH_SIZE, use_load_data=True, rebuild=True):
+    """
+    Loads a CSV file whose header names columns of `table_name` (any order and
+    letter case; key columns may be included so related files keep their links).
+
+    On MySQL, with a ConnectionPool, the file is sent with LOAD DATA LOCAL INFILE
+    in one transaction, and the derived tables are rebuilt afterwards. When that
+    is not possible (SQLite, local_infile disabled on the server or the client),
+    rows go through bulk_insert: multi-row INSERTs with one commit per batch; the
+    bulk insert hooks keep the payment summary current as they go and the tables
+    kept by high-water mark are rebuilt afterwards.
+
+    Parameters:
+        connection - a ConnectionPool or an already open connection
+        table_name - one of schema.TABLES (any letter case)
+        path - CSV file with a header line; empty cells are loaded as NULL
+        batch_size - rows per INSERT and per commit in the fallback
+        use_load_data - False to always use the fallback
+        rebuild - False to leave rebuilding derived tables to the caller
+
+    Returns:
+        dict with table, rows (loaded), failed (rows of the file that were not
+        loaded: the failing batch and everything after it), error (the database
+        error, or None), seconds, rows_per_second and method.
+    """
+    table_name = resolve_table(table_name)
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        header = next(csv.reader(handle), [])
+    columns, positions = _csv_columns(table_name, header)
+
+    started = time.perf_counter()
+    method, rows, failed, error = None, 0, 0, None
+    if use_load_data and isinstance(connection, ConnectionPool) and dialect_of(connection) == "mysql":
+        try:
+            rows = _load_data(connection, table_name, path, columns, positions, len(header))
+            method = "load data"
+            invalidate_existence_cache(table_name)
+            bump_table_versions([table_name])
+        except DB_ERRORS as e:
+            print(f"ℹ️ LOAD DATA LOCAL INFILE is not available ({e}); inserting in batches instead.")
+    if method is None:
+        pending = _read_rows(path, positions)
+        try:
+            rows = bulk_insert(connection, table_name, pending, columns, batch_size)
+        except BulkInsertError as e:
+            rows, error = e.inserted, e.error
+            failed = e.rejected + sum(1 for _ in pending)
+            print(f"❌ {failed} rows of {os.path.basename(path)} were not loaded into {table_name}: {error}")
+        method = "batched insert"
+
+    if rebuild and rows:
+        if method == "load data":
+            rebuild_derived_tables(connection, [table_name])
+        else:
+            for derived in _WATERMARKED:
+                if table_name in DERIVED_TABLES[derived]:
+                    _REBUILDS[derived](connection)
+    seconds = time.perf_counter() - started
+    return {"table": table_name, "rows": rows, "failed": failed, "error": error, "seconds": round(seconds, 3),
+            "rows_per_second": round(rows / seconds) if seconds > 0 else rows, "method": method}
+
+# Function to import a folder of CSV files, one per table
+def import_directory(connection, directory, batch_size=BULK_BATCH_SIZE, use_load_data=True):
+    """
+    Imports every <table>.csv in `directory` (e.g. Payments.csv, payments.csv),
+    parents before children so foreign keys resolve, then rebuilds the derived
+    tables once. Files that do not name a UPS table are skipped. A file whose
+    rows fail to load does not stop the others; check each result's `failed`.
+
+    Returns:
+        List of import_csv results, in import order.
+    """
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(name)
+        if extension.lower() != ".csv":
+            continue
+        try:
+            files[resolve_table(stem)] = os.path.join(directory, name)
+        except ValueError:
+            print(f"⚠️ Skipping {name}: not named after a UPS table.")
+    results = [import_csv(connection, table_name, files[table_name], batch_size, use_load_data, rebuild=False)
+               for table_name in TABLES if table_name in files]
+    loaded = [result["table"] for result in results if result["rows"]]
+    if loaded:
+        rebuild_derived_tables(connection, loaded)
+    return results
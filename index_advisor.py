@@ -0,0 +1,443 @@
+# index_advisor.py
+import re
+
+from complex_operations import REPORTS, report_sql
+from db import DB_ERRORS, borrow_connection, dialect_of, finish_read, open_cursor
+from explain_plans import explain_query
+from instrumentation import query_stats
+from rendering import render_table
+from schema import TABLES, table_columns, tables_referenced
+
+# Widest index the advisor proposes (covering candidates are dropped beyond it)
+MAX_INDEX_COLUMNS = 5
+
+# Share by which the estimated cost must drop (MySQL) for a candidate to count
+MIN_COST_GAIN = 0.10
+
+# Name prefix of the indexes the advisor creates
+ADVISOR_INDEX_PREFIX = "idx_adv_"
+
+# Name prefix of MySQL trial indexes, followed by the id of the session that built
+# them: idx_advt_<connection id>_<table>_<columns>
+TRIAL_INDEX_PREFIX = "idx_advt_"
+
+# Lookups and maintenance statements the CRUD screens and summary tables run,
+# used with the report SQL when no workload has been recorded
+CRUD_WORKLOAD = [
+    "SELECT * FROM PackageStatus WHERE package_id = %s ORDER BY status_timestamp",
+    "SELECT * FROM Addresses WHERE customer_id = %s",
+    "SELECT customer_id, payment_date FROM Payments WHERE payment_id = %s",
+    "SELECT shipment_id, customer_id FROM Shipments WHERE shipment_id IN (%s, %s)",
+    "SELECT * FROM Shipments WHERE customer_id = %s",
+    "SELECT * FROM Shipments WHERE user_id = %s",
+    "SELECT * FROM DeliveryAttempts WHERE shipment_id = %s",
+    "SELECT * FROM Pickup_Requests WHERE pickup_status = %s",
+]
+
+# Summary refresh statements, with and without the date bucket columns (see date_buckets)
+CRUD_DATE_WORKLOAD = {
+    True: [
+        "SELECT payment_period, customer_id, COUNT(*), SUM(amount), MIN(amount), MAX(amount) FROM Payments "
+        "WHERE customer_id = %s AND payment_period BETWEEN %s AND %s GROUP BY customer_id, payment_period",
+        "SELECT attempt_day, COUNT(*) FROM DeliveryAttempts "
+        "WHERE attempt_day = %s AND attempt_id <= %s GROUP BY attempt_day",
+    ],
+    False: [
+        "SELECT customer_id, COUNT(*), SUM(amount), MIN(amount), MAX(amount) FROM Payments "
+        "WHERE customer_id = %s AND payment_date >= %s AND payment_date < %s GROUP BY customer_id",
+        "SELECT DATE(attempt_date), COUNT(*) FROM DeliveryAttempts "
+        "WHERE attempt_date >= %s AND attempt_date < %s AND attempt_id <= %s GROUP BY DATE(attempt_date)",
+    ],
+}
+
+_SQL_WORDS = {
+    "on", "where", "join", "left", "right", "inner", "outer", "cross", "group", "order", "limit", "union",
+    "using", "having", "window", "natural", "straight_join", "set", "values", "select",
+}
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+`?(\w+)`?(?:\s+(?:AS\s+)?`?(\w+)`?)?", re.IGNORECASE)
+_CASE_BLOCK = re.compile(r"\bCASE\b.*?\bEND\b", re.IGNORECASE | re.DOTALL)
+_LEFT_PREDICATE = re.compile(
+    r"(?:\b(\w+)\.)?\b(\w+)\s*(<=>|<=|>=|=|<|>|\bIN\b|\bBETWEEN\b|\bLIKE\b|\bIS\b)", re.IGNORECASE)
+_RIGHT_PREDICATE = re.compile(r"(<=>|<=|>=|=|<|>)\s*(?:\b(\w+)\.)?\b(\w+)\b(?!\s*\()", re.IGNORECASE)
+_ORDERING = re.compile(
+    r"\b(?:GROUP|ORDER|PARTITION)\s+BY\s+(.*?)(?=\bLIMIT\b|\bHAVING\b|\bWINDOW\b|\bROWS\b|\bRANGE\b"
+    r"|\bORDER\s+BY\b|\bUNION\b|\)|;|$)", re.IGNORECASE | re.DOTALL)
+_IDENTIFIER = re.compile(r"(?:\b(\w+)\.)?\b(\w+)\b")
+_SELECT_ALL = re.compile(r"\bSELECT\s+(?:DISTINCT\s+)?(?:\w+\.)?\*", re.IGNORECASE)
+_READ_STATEMENT = re.compile(r"^\s*(?:WITH|SELECT|UPDATE|DELETE)\b", re.IGNORECASE)
+_WRITE_STATEMENT = re.compile(r"^\s*(?:INSERT|REPLACE|UPDATE|DELETE)\b", re.IGNORECASE)
+_SKIPPED = re.compile(r"\b(?:information_schema|sqlite_master|EXPLAIN|PRAGMA)\b", re.IGNORECASE)
+
+# Function to gather the statements to advise on
+def collect_workload(source="recorded", dialect="mysql", buckets=True):
+    """
+    Builds the workload: a list of {"sql", "weight", "source"} entries.
+
+    Parameters:
+        source - "recorded" for the statements instrumentation has seen, weighted
+                 by their call counts, or "static" for the report SQL plus
+                 CRUD_WORKLOAD, each weighted 1
+        dialect - SQL dialect of the report statements for "static"
+        buckets - whether the date bucket columns exist, for "static"
+    """
+    if source == "static":
+        workload = [{"sql": report_sql(name, dialect, buckets), "weight": 1, "source": name} for name in REPORTS]
+        workload += [{"sql": query, "weight": 1, "source": "crud"}
+                     for query in CRUD_WORKLOAD + CRUD_DATE_WORKLOAD[buckets]]
+        return workload
+    return [
+        {"sql": entry["example"], "weight": entry["calls"], "source": entry["fingerprint"][:60]}
+        for entry in query_stats()
+        if not _SKIPPED.search(entry["example"]) and tables_referenced(entry["example"])
+    ]
+
+def _explainable(query):
+    """Statement text EXPLAIN accepts: placeholders replaced by a literal, the rest as sent."""
+    text = re.sub(r"\bLIMIT\s+%s", "LIMIT 10", query.strip().rstrip(";"), flags=re.IGNORECASE)
+    return text.replace("%s", "'1'")
+
+def _table_aliases(query):
+    """alias or table name (lower case) -> UPS table name, for the tables a statement reads."""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(query):
+        if table.lower() not in (name.lower() for name in TABLES):
+            continue
+        name = next(name for name in TABLES if name.lower() == table.lower())
+        aliases[table.lower()] = name
+        if alias and alias.lower() not in _SQL_WORDS:
+            aliases[alias.lower()] = name
+    return aliases
+
+def _resolver(aliases):
+    tables = sorted(set(aliases.values()))
+    columns = {table: {column.lower(): column for column in table_columns(table)} for table in tables}
+
+    def resolve(qualifier, name):
+        # -> (table, column) when the reference names a column of a statement table
+        if qualifier:
+            table = aliases.get(qualifier.lower())
+            if table is None or name.lower() not in columns[table]:
+                return None
+            return table, columns[table][name.lower()]
+        owners = [table for table in tables if name.lower() in columns[table]]
+        return (owners[0], columns[owners[0]][name.lower()]) if len(owners) == 1 else None
+
+    return resolve
+
+def _append(items, value):
+    if value not in items:
+        items.append(value)
+
+# Function to break a statement into per-table column usage
+def analyze_statement(query):
+    """
+    Finds how a statement uses the columns of each UPS table it reads, by pattern
+    matching (no full SQL parser).
+
+    Returns:
+        dict of table -> {"equality", "range", "ordering", "used": lists of columns,
+        "select_all": True when the statement selects * from it}.
+    """
+    aliases = _table_aliases(query)
+    resolve = _resolver(aliases)
+    usage = {table: {"equality": [], "range": [], "ordering": [], "used": [], "select_all": False}
+             for table in set(aliases.values())}
+    if not usage:
+        return usage
+    predicates = _CASE_BLOCK.sub(" ", query)
+    for qualifier, name, operator in _LEFT_PREDICATE.findall(predicates):
+        target = resolve(qualifier, name)
+        if target:
+            kind = "equality" if operator.strip().upper() in ("=", "<=>", "IN", "IS") else "range"
+            _append(usage[target[0]][kind], target[1])
+    for operator, qualifier, name in _RIGHT_PREDICATE.findall(predicates):
+        target = resolve(qualifier, name)
+        if target:
+            _append(usage[target[0]]["equality" if operator in ("=", "<=>") else "range"], target[1])
+    for clause in _ORDERING.findall(query):
+        for qualifier, name in _IDENTIFIER.findall(clause):
+            target = resolve(qualifier, name)
+            if target:
+                _append(usage[target[0]]["ordering"], target[1])
+    for qualifier, name in _IDENTIFIER.findall(query):
+        target = resolve(qualifier, name)
+        if target:
+            _append(usage[target[0]]["used"], target[1])
+    if _SELECT_ALL.search(query):
+        for table in usage:
+            usage[table]["select_all"] = True
+    for table, columns in usage.items():
+        columns["range"] = [column for column in columns["range"] if column not in columns["equality"]]
+        columns["ordering"] = [column for column in columns["ordering"] if column not in columns["equality"]]
+    return usage
+
+# Function to propose indexes for a statement
+def candidate_indexes(query):
+    """
+    Proposes (table, columns) indexes for one statement: equality columns
+    followed by one range column, equality columns followed by the grouping or
+    ordering columns, and covering versions of both that add the other columns
+    the statement reads from the table.
+    """
+    candidates = []
+    for table, usage in analyze_statement(query).items():
+        primary_key = TABLES[table]["primary_key"]
+        bases = []
+        if usage["equality"] or usage["range"]:
+            bases.append(usage["equality"] + usage["range"][:1])
+        if usage["ordering"]:
+            bases.append(usage["equality"] + usage["ordering"])
+        for base in bases:
+            base = base[:MAX_INDEX_COLUMNS]
+            if not base or base[0] == primary_key:
+                continue
+            _append(candidates, (table, tuple(base)))
+            if not usage["select_all"]:
+                covering = base + [column for column in usage["used"] if column not in base and column != primary_key]
+                if len(base) < len(covering) <= MAX_INDEX_COLUMNS:
+                    _append(candidates, (table, tuple(covering)))
+    return candidates
+
+# Function to list the indexes a table already has
+def existing_indexes(conn, table_name):
+    """Returns the column tuples of every index on `table_name`, the primary key included."""
+    indexes = {"PRIMARY": [TABLES[table_name]["primary_key"]]}
+    with open_cursor(conn) as cursor:
+        if dialect_of(conn) == "sqlite":
+            cursor.execute(f"PRAGMA index_list({table_name})")
+            for index in [row[1] for row in cursor.fetchall()]:
+                cursor.execute(f"PRAGMA index_info({index})")
+                indexes[index] = [row[2] for row in cursor.fetchall()]
+        else:
+            cursor.execute("""
+                SELECT index_name, column_name FROM information_schema.statistics
+                WHERE table_schema = DATABASE() AND table_name = %s
+                ORDER BY index_name, seq_in_index
+            """, (table_name,))
+            for index, column in cursor.fetchall():
+                indexes.setdefault(index, []).append(column)
+    return [tuple(columns) for columns in indexes.values()]
+
+def _covered(columns, indexes):
+    """True when an index already starts with `columns`."""
+    wanted = tuple(column.lower() for column in columns)
+    return any(tuple(column.lower() for column in index[:len(wanted)]) == wanted for index in indexes)
+
+def index_name(table_name, columns):
+    return f"{ADVISOR_INDEX_PREFIX}{table_name}_{'_'.join(columns)}".lower()[:64]
+
+def _trial_index_name(session_id, table_name, columns):
+    return f"{TRIAL_INDEX_PREFIX}{session_id}_{table_name}_{'_'.join(columns)}".lower()[:64]
+
+def _try_index(conn, table_name, columns, statements):
+    """
+    EXPLAINs `statements` with a trial index on (columns) that no other session uses.
+
+    On MySQL this is real DDL: the INVISIBLE index is built from a full read of
+    the table and written to disk, every write to the table maintains it until
+    it is dropped again, and both statements wait for a metadata lock on the
+    table. The index is named after the session, so if the session dies in
+    between, a later run can tell it is left over (see drop_trial_indexes()).
+    """
+    column_list = ", ".join(columns)
+    with open_cursor(conn) as cursor:
+        if dialect_of(conn) == "sqlite":
+            # SQLite DDL is transactional: the index disappears with the rollback
+            conn.start_transaction()
+            try:
+                cursor.execute(f"CREATE INDEX {index_name(table_name, columns)} ON {table_name} ({column_list})")
+                return [explain_query(conn, query) for query in statements]
+            finally:
+                conn.rollback()
+        # MySQL: an invisible index is ignored by every session that does not ask for it
+        cursor.execute("SELECT CONNECTION_ID()")
+        name = _trial_index_name(cursor.fetchone()[0], table_name, columns)
+        cursor.execute(f"CREATE INDEX {name} ON {table_name} ({column_list}) INVISIBLE")
+        try:
+            cursor.execute("SET SESSION optimizer_switch = 'use_invisible_indexes=on'")
+            return [explain_query(conn, query) for query in statements]
+        finally:
+            cursor.execute("SET SESSION optimizer_switch = 'use_invisible_indexes=off'")
+            cursor.execute(f"DROP INDEX {name} ON {table_name}")
+
+def _gain(before, after, table_name):
+    """(scan removed, filesort removed, cost before, cost after) for one statement."""
+    scan_removed = table_name in before["full_scans"] and table_name not in after["full_scans"]
+    sort_removed = before["filesort"] and not after["filesort"]
+    return scan_removed, sort_removed, before.get("cost"), after.get("cost")
+
+# Function to evaluate candidate indexes against the workload
+def advise_indexes(connection, workload, build_trial_indexes=False):
+    """
+    Proposes indexes for `workload` (see collect_workload) and measures each one:
+    every statement reading the table is explained before and after a trial
+    index is created (INVISIBLE on MySQL, inside a rolled back transaction on
+    SQLite), so no other session's plans change.
+
+    On MySQL each candidate is built and dropped for real, so a run costs a full
+    read of the table and an index build per candidate, with the I/O and
+    metadata locks that come with it. It therefore only runs there when
+    `build_trial_indexes` is True; otherwise ValueError is raised. Trial indexes
+    left behind by earlier runs whose session has ended are dropped first.
+
+    A candidate helps a statement when it removes a full scan or a filesort, or
+    lowers the statement's estimated cost (MySQL) by at least MIN_COST_GAIN. It
+    is recommended when it helps a statement no better candidate on the same
+    table already helps.
+
+    Returns:
+        list of dicts (best first) with table, columns, statements helped, scans
+        and filesorts removed, weighted cost before/after (None on SQLite), writes
+        to the table in the workload, and "recommended".
+    """
+    statements = []
+    for entry in workload:
+        if _READ_STATEMENT.match(entry["sql"]):
+            statements.append(dict(entry, sql=_explainable(entry["sql"])))
+    writes = {}
+    for entry in workload:
+        if _WRITE_STATEMENT.match(entry["sql"]):
+            for table_name in tables_referenced(entry["sql"])[:1]:
+                writes[table_name] = writes.get(table_name, 0) + entry["weight"]
+
+    results = []
+    with borrow_connection(connection) as conn:
+        if dialect_of(conn) == "mysql" and not build_trial_indexes:
+            raise ValueError("The index advisor builds each candidate index on MySQL; "
+                             "pass build_trial_indexes=True to confirm")
+        drop_trial_indexes(conn)
+        try:
+            baseline = {}
+            for entry in statements:
+                try:
+                    baseline[entry["sql"]] = explain_query(conn, entry["sql"])
+                except DB_ERRORS:
+                    continue
+            candidates = []
+            for entry in statements:
+                if entry["sql"] in baseline:
+                    for candidate in candidate_indexes(entry["sql"]):
+                        _append(candidates, candidate)
+            existing = {}
+            for table_name, columns in candidates:
+                if table_name not in existing:
+                    existing[table_name] = existing_indexes(conn, table_name)
+                if _covered(columns, existing[table_name]):
+                    continue
+                affected = [entry for entry in statements
+                            if entry["sql"] in baseline and table_name in analyze_statement(entry["sql"])]
+                try:
+                    plans = _try_index(conn, table_name, columns, [entry["sql"] for entry in affected])
+                except DB_ERRORS as e:
+                    print(f"⚠️ Could not evaluate an index on {table_name} ({', '.join(columns)}): {e}")
+                    continue
+                result = {"table": table_name, "columns": columns, "helped": 0, "scans_removed": 0,
+                          "filesorts_removed": 0, "cost_before": None, "cost_after": None,
+                          "writes": writes.get(table_name, 0), "statements": []}
+                for entry, after in zip(affected, plans):
+                    scan_removed, sort_removed, before_cost, after_cost = _gain(baseline[entry["sql"]], after, table_name)
+                    result["scans_removed"] += entry["weight"] if scan_removed else 0
+                    result["filesorts_removed"] += entry["weight"] if sort_removed else 0
+                    if before_cost is not None and after_cost is not None:
+                        result["cost_before"] = (result["cost_before"] or 0.0) + before_cost * entry["weight"]
+                        result["cost_after"] = (result["cost_after"] or 0.0) + after_cost * entry["weight"]
+                        cheaper = after_cost <= before_cost * (1 - MIN_COST_GAIN)
+                    else:
+                        cheaper = False
+                    if scan_removed or sort_removed or cheaper:
+                        result["helped"] += 1
+                        result["statements"].append(entry["sql"])
+                results.append(result)
+        finally:
+            finish_read(conn)
+
+    def benefit(result):
+        saved = (result["cost_before"] - result["cost_after"]) if result["cost_before"] is not None else 0.0
+        return (result["scans_removed"] + result["filesorts_removed"], saved, -len(result["columns"]))
+
+    # Greedy pick, best first: an index is recommended only if it helps a
+    # statement that no index already picked for the same table helps
+    results.sort(key=benefit, reverse=True)
+    served = set()
+    for result in results:
+        fresh = [query for query in result["statements"] if (result["table"], query) not in served]
+        result["recommended"] = bool(fresh)
+        served.update((result["table"], query) for query in result["statements"])
+    return results
+
+# Function to create recommended indexes
+def apply_indexes(connection, recommendations):
+    """
+    Creates every recommended index (visible, under its advisor name).
+
+    Returns:
+        Names of the indexes created.
+    """
+    created = []
+    with borrow_connection(connection) as conn:
+        for result in recommendations:
+            if not result.get("recommended"):
+                continue
+            if _covered(result["columns"], existing_indexes(conn, result["table"])):
+                continue
+            name = index_name(result["table"], result["columns"])
+            with open_cursor(conn) as cursor:
+                cursor.execute(f"CREATE INDEX {name} ON {result['table']} ({', '.join(result['columns'])})")
+            created.append(name)
+        finish_read(conn)
+    return created
+
+# Function to drop trial indexes an interrupted advisor run left behind
+def drop_trial_indexes(connection):
+    """
+    Drops the MySQL trial indexes whose session has ended: trials _try_index did
+    not get to drop because its session died mid-evaluation. Trials of sessions
+    still listed in the processlist (another advisor run in progress) are kept,
+    as are the indexes created by apply_indexes(). On SQLite the trials roll back
+    with their transaction, so there is nothing to drop. advise_indexes() runs
+    this before evaluating; errors are reported, not raised.
+
+    Returns:
+        "table.index" names dropped.
+    """
+    dropped = []
+    with borrow_connection(connection) as conn:
+        if dialect_of(conn) == "sqlite":
+            return dropped
+        try:
+            with open_cursor(conn) as cursor:
+                cursor.execute("SELECT id FROM information_schema.processlist")
+                live = {str(row[0]) for row in cursor.fetchall()}
+                cursor.execute("""
+                    SELECT DISTINCT table_name, index_name FROM information_schema.statistics
+                    WHERE table_schema = DATABASE() AND index_name LIKE %s AND is_visible = 'NO'
+                """, (TRIAL_INDEX_PREFIX.replace("_", "\\_") + "%",))
+                for table_name, name in cursor.fetchall():
+                    if name[len(TRIAL_INDEX_PREFIX):].split("_", 1)[0] in live:
+                        continue
+                    cursor.execute(f"DROP INDEX {name} ON {table_name}")
+                    dropped.append(f"{table_name}.{name}")
+        except DB_ERRORS as e:
+            print(f"⚠️ Could not drop leftover index advisor trial indexes: {e}")
+        finally:
+            finish_read(conn)
+    if dropped:
+        print(f"🧹 Dropped leftover index advisor trial indexes: {', '.join(dropped)}.")
+    return dropped
+
+# Function to display the advisor's findings
+def print_index_advice(results, limit=20):
+    """Prints the evaluated candidates, recommendations first."""
+    ordered = sorted(results, key=lambda result: not result["recommended"])[:limit]
+    headers = ["Use", "Table", "Columns", "Helped", "Scans Removed", "Sorts Removed", "Cost Before", "Cost After",
+               "Writes"]
+    rows = [
+        ("yes" if result["recommended"] else "no", result["table"], ", ".join(result["columns"]), result["helped"],
+         result["scans_removed"], result["filesorts_removed"],
+         f"{result['cost_before']:.1f}" if result["cost_before"] is not None else "n/a",
+         f"{result['cost_after']:.1f}" if result["cost_after"] is not None else "n/a",
+         result["writes"])
+        for result in ordered
+    ]
+    render_table(headers, rows)
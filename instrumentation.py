@@ -0,0 +1,247 @@
+# instrumentation.py
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+from rendering import render_table
+
+# Statements slower than this many milliseconds are written to the slow-query log
+SLOW_QUERY_THRESHOLD_MS = 500
+
+# File receiving the slow-query log
+SLOW_QUERY_LOG = "slow_queries.log"
+
+# Most recent timings kept per fingerprint for the percentile estimates
+SAMPLES_PER_FINGERPRINT = 1000
+
+_slow_logger = logging.getLogger("ups.slow_queries")
+_slow_logger.propagate = False
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"%s|\?")
+_VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROW_LISTS = re.compile(r"(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+# Function to normalize SQL text into a statement fingerprint
+def fingerprint(query):
+    """
+    Normalizes a statement so every execution of the same statement shape maps to
+    one fingerprint: comments dropped, literals and placeholders replaced by ?,
+    IN / VALUES lists collapsed to (...), whitespace and letter case folded.
+
+    Example:
+        "SELECT * FROM Shipments WHERE shipment_id = 42"
+        -> "select * from shipments where shipment_id = ?"
+    """
+    text = _COMMENTS.sub(" ", query)
+    text = _STRINGS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _PLACEHOLDERS.sub("?", text)
+    text = _VALUE_LISTS.sub("(...)", text)
+    text = _ROW_LISTS.sub(r"\1", text)
+    text = _WHITESPACE.sub(" ", text).strip().rstrip(";").strip()
+    return text.lower()
+
+def _percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+# Function to record one executed statement
+def record(query, elapsed, rows, error=False):
+    """
+    Adds one execution to the per-fingerprint statistics and writes it to the
+    slow-query log when it took longer than SLOW_QUERY_THRESHOLD_MS.
+
+    Parameters:
+        query - SQL text as executed
+        elapsed - wall time in seconds (execute plus fetches)
+        rows - rows returned (SELECT) or affected (writes)
+        error - True when the statement failed
+    """
+    key = fingerprint(query)
+    with _stats_lock:
+        entry = _stats.get(key)
+        if entry is None:
+            entry = _stats[key] = {
+                "fingerprint": key,
+                "example": query.strip(),
+                "calls": 0,
+                "errors": 0,
+                "rows": 0,
+                "total_time": 0.0,
+                "max_time": 0.0,
+                "samples": deque(maxlen=SAMPLES_PER_FINGERPRINT),
+            }
+        entry["calls"] += 1
+        entry["errors"] += 1 if error else 0
+        entry["rows"] += rows
+        entry["total_time"] += elapsed
+        entry["max_time"] = max(entry["max_time"], elapsed)
+        entry["samples"].append(elapsed)
+
+    if elapsed * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        _log_slow_query(query, key, elapsed, rows)
+
+def _log_slow_query(query, key, elapsed, rows):
+    # Parameters are deliberately not logged: some statements carry passwords
+    if not _slow_logger.handlers:
+        handler = logging.FileHandler(SLOW_QUERY_LOG, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        _slow_logger.addHandler(handler)
+        _slow_logger.setLevel(logging.INFO)
+    statement = _WHITESPACE.sub(" ", query).strip()
+    _slow_logger.info(f"time_ms={elapsed * 1000:.1f} rows={rows} fingerprint={key!r} statement={statement!r}")
+
+# Function to summarize statistics per fingerprint
+def query_stats():
+    """
+    Returns one dict per fingerprint, most expensive (total time) first, with the
+    call count, error count, rows, total/mean/max time and p50/p95/p99 over the
+    most recent SAMPLES_PER_FINGERPRINT executions. Times are in milliseconds.
+    """
+    with _stats_lock:
+        entries = [dict(entry, samples=sorted(entry["samples"])) for entry in _stats.values()]
+    summary = []
+    for entry in entries:
+        samples = entry.pop("samples")
+        calls = entry["calls"]
+        summary.append(dict(
+            entry,
+            total_time=entry["total_time"] * 1000,
+            max_time=entry["max_time"] * 1000,
+            mean_time=entry["total_time"] * 1000 / calls if calls else 0.0,
+            p50=_percentile(samples, 0.50) * 1000,
+            p95=_percentile(samples, 0.95) * 1000,
+            p99=_percentile(samples, 0.99) * 1000,
+        ))
+    summary.sort(key=lambda entry: entry["total_time"], reverse=True)
+    return summary
+
+# Function to clear collected statistics
+def reset_query_stats():
+    with _stats_lock:
+        _stats.clear()
+
+# Function to display collected statistics
+def print_query_stats(limit=20):
+    """Prints the top statements by total time, like a local pg_stat_statements."""
+    summary = query_stats()[:limit]
+    if not summary:
+        print("⚠️ No statements recorded yet. Run some operations or reports first.")
+        return
+    headers = ["Calls", "Total ms", "Mean ms", "p50 ms", "p95 ms", "p99 ms", "Rows", "Statement"]
+    rows = [
+        (entry["calls"], f"{entry['total_time']:.1f}", f"{entry['mean_time']:.2f}", f"{entry['p50']:.2f}",
+         f"{entry['p95']:.2f}", f"{entry['p99']:.2f}", entry["rows"],
+         entry["fingerprint"][:70] + ("..." if len(entry["fingerprint"]) > 70 else ""))
+        for entry in summary
+    ]
+    render_table(headers, rows)
+
+
+# Cursor proxy that times every statement it runs
+class InstrumentedCursor:
+    """
+    Wraps a DB-API cursor and records each statement with record(): wall time of
+    the execute call plus every fetch made for it, and the rows fetched (or the
+    rows affected for writes). A statement is recorded once its result is
+    exhausted, when the next statement starts, or when the cursor is finished or
+    closed. Everything else is delegated to the wrapped cursor.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._query = None
+        self._elapsed = 0.0
+        self._rows = 0
+        self._fetched = False
+
+    def execute(self, query, params=()):
+        self.finish()
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(query, params)
+        except Exception:
+            record(query, time.perf_counter() - started, 0, error=True)
+            raise
+        self._query = query
+        self._elapsed = time.perf_counter() - started
+        self._rows = 0
+        self._fetched = False
+
+    def executemany(self, query, seq_params):
+        self.finish()
+        started = time.perf_counter()
+        try:
+            self._cursor.executemany(query, seq_params)
+        except Exception:
+            record(query, time.perf_counter() - started, 0, error=True)
+            raise
+        record(query, time.perf_counter() - started, max(self._cursor.rowcount, 0))
+
+    def _timed_fetch(self, fetch, *args):
+        started = time.perf_counter()
+        result = fetch(*args)
+        self._elapsed += time.perf_counter() - started
+        self._fetched = True
+        return result
+
+    def fetchone(self):
+        row = self._timed_fetch(self._cursor.fetchone)
+        if row is None:
+            self.finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._timed_fetch(self._cursor.fetchmany, size)
+        self._rows += len(rows)
+        if not rows:
+            self.finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed_fetch(self._cursor.fetchall)
+        self._rows += len(rows)
+        self.finish()
+        return rows
+
+    def finish(self):
+        """Records the pending statement, if any, without closing the cursor."""
+        if self._query is None:
+            return
+        rows = self._rows if self._fetched else max(self._cursor.rowcount or 0, 0)
+        record(self._query, self._elapsed, rows)
+        self._query = None
+
+    def close(self):
+        self.finish()
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
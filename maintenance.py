@@ -0,0 +1,200 @@
+# maintenance.py
+import os
+
+from date_buckets import date_buckets_ready, ensure_date_buckets
+from db import DB_ERRORS, dialect_of, statement_cache_stats
+from explain_plans import PLAN_BASELINE_FILE, capture_plans, check_plan_regressions, print_plans, save_baseline
+from importer import import_csv, import_directory
+from index_advisor import advise_indexes, apply_indexes, collect_workload, print_index_advice
+from instrumentation import SLOW_QUERY_LOG, SLOW_QUERY_THRESHOLD_MS, print_query_stats, reset_query_stats
+from menus import display_message
+from rendering import render_table
+from report_cache import clear_report_cache, report_cache_stats
+from snapshots import SNAPSHOT_DIR, refresh_snapshots
+from summaries import rebuild_summary_tables
+
+# Displays menu for performance and maintenance tools
+def maintenance_menu():
+    """
+    Display the menu of performance and maintenance tools.
+    """
+    print("\n" + "=" * 50)
+    print(f"\033[1m⚙️ PERFORMANCE & MAINTENANCE TOOLS ⚙️\033[0m".center(50))
+    print("Inspect how the database layer is performing.".center(50))
+    print("=" * 50)
+    print("1. 📈 Query Statistics - Calls, timings and percentiles per statement.")
+    print("2. 🧹 Reset Query Statistics - Start a fresh measurement window.")
+    print("3. 🔌 Connection Pool Statistics - Checkouts, waits and reconnects.")
+    print("4. 🗂️ Prepared Statement Cache - Hit and miss counters.")
+    print("5. 🧾 Report Result Cache - Hits, stale entries and evictions.")
+    print("6. 📸 Capture Report Plan Baseline - Save the EXPLAIN plan of every report.")
+    print("7. 🔍 Check Report Plans - Compare current plans against the baseline.")
+    print("8. 🧮 Rebuild Summary Tables - Recompute maintained aggregates from scratch.")
+    print("9. 🗃️ Refresh Columnar Snapshots - Append new rows to the memory-mapped column files.")
+    print("10. 🧭 Index Advisor - Propose indexes for the workload, checked with EXPLAIN.")
+    print("11. 📥 Import CSV Files - Load a CSV file or a folder of <table>.csv files.")
+    print("12. 🗓️ Add Date Bucket Columns - Indexed day/month/hour columns for the time-grouped reports.")
+    print("13. 🔙 Return to Main Menu")
+    print("=" * 50)
+    return input("👉 Select a tool (1-13): ").strip()
+
+# Handles selection of performance and maintenance tools
+def manage_maintenance_tools(pool):
+    """
+    Handle performance and maintenance tool selection.
+    """
+    while True:
+        choice = maintenance_menu()
+
+        if choice == "1":
+            print(f"\nStatements slower than {SLOW_QUERY_THRESHOLD_MS} ms are also logged to {SLOW_QUERY_LOG}.")
+            print_query_stats()
+        elif choice == "2":
+            reset_query_stats()
+            display_message("Query statistics reset.")
+        elif choice == "3":
+            show_stats("CONNECTION POOL", pool.stats())
+        elif choice == "4":
+            show_stats("PREPARED STATEMENT CACHE", statement_cache_stats())
+        elif choice == "5":
+            show_stats("REPORT RESULT CACHE", report_cache_stats())
+            if input("🧹 Clear the report cache? (y/n): ").strip().lower() == "y":
+                clear_report_cache()
+                display_message("Report cache cleared.")
+        elif choice == "6":
+            with pool.connection() as conn:
+                plans = capture_plans(conn)
+            save_baseline(plans)
+            print_plans(plans)
+            display_message(f"Plan baseline for {len(plans)} reports saved to {PLAN_BASELINE_FILE}.")
+        elif choice == "7":
+            with pool.connection() as conn:
+                plans, regressions = check_plan_regressions(conn)
+            if regressions is None:
+                print("⚠️ No plan baseline found. Capture one first (option 6).")
+                continue
+            print_plans(plans, regressions)
+            if regressions:
+                print(f"⚠️ {len(regressions)} report(s) have plan regressions.")
+            else:
+                display_message("No plan regressions found.")
+        elif choice == "8":
+            try:
+                for table_name, rows in rebuild_summary_tables(pool).items():
+                    print(f"✅ {table_name} rebuilt ({rows} rows).")
+            except DB_ERRORS as e:
+                print(f"❌ Error rebuilding summary tables: {e}")
+        elif choice == "9":
+            full = input("♻️ Rewrite the snapshots from scratch? (y/n): ").strip().lower() == "y"
+            try:
+                for table_name, rows in refresh_snapshots(pool, full=full).items():
+                    print(f"✅ {table_name}: {rows} rows appended.")
+                display_message(f"Snapshots written to {SNAPSHOT_DIR}.")
+            except (RuntimeError, OSError) + DB_ERRORS as e:
+                print(f"❌ Error refreshing snapshots: {e}")
+        elif choice == "10":
+            run_index_advisor(pool)
+        elif choice == "11":
+            run_csv_import(pool)
+        elif choice == "12":
+            run_date_bucket_migration(pool)
+        elif choice == "13":
+            print("🔙 Returning to Main Menu.")
+            break
+        else:
+            print("⚠️ Invalid choice. Please select a valid option from 1 to 13.")
+
+# Imports CSV files and shows the load rate
+def run_csv_import(pool):
+    """
+    Imports one CSV file into a table, or every <table>.csv file of a folder, and
+    shows rows per second for each table.
+    """
+    source = input("📂 CSV file or folder: ").strip()
+    try:
+        if os.path.isdir(source):
+            results = import_directory(pool, source)
+        else:
+            default = os.path.splitext(os.path.basename(source))[0]
+            table_name = input(f"Table to load into (press Enter for {default}): ").strip() or default
+            results = [import_csv(pool, table_name, source)]
+    except (ValueError, OSError) + DB_ERRORS as e:
+        print(f"❌ Error importing CSV data: {e}")
+        return
+    if not results:
+        display_message("No <table>.csv files found.")
+        return
+    render_table(["Table", "Rows", "Failed", "Time (s)", "Rows/s", "Method"],
+                 [(result["table"], result["rows"], result["failed"], f"{result['seconds']:.2f}",
+                   result["rows_per_second"], result["method"]) for result in results])
+
+# Runs the index advisor and optionally creates what it recommends
+def run_index_advisor(pool):
+    """
+    Evaluates candidate indexes for the recorded statements (or the app's own SQL
+    when nothing has been recorded yet) and offers to create the recommended ones.
+    On MySQL every candidate is built and dropped on its table, so this asks first.
+    """
+    mysql = dialect_of(pool) == "mysql"
+    if mysql:
+        print("⚠️ On MySQL each candidate index is built (invisible) and dropped again: a full read")
+        print("   and index build of its table, with the load and table locks that brings.")
+        if input("🧭 Build trial indexes now? (y/n): ").strip().lower() != "y":
+            return
+    workload = collect_workload("recorded")
+    if workload:
+        print(f"\nUsing the {len(workload)} statements recorded since the last reset.")
+    else:
+        workload = collect_workload("static", dialect_of(pool), date_buckets_ready(pool))
+        print(f"\nNo statements recorded yet; using the {len(workload)} report and CRUD statements of the app.")
+    try:
+        results = advise_indexes(pool, workload, build_trial_indexes=mysql)
+        if not results:
+            display_message("No index candidates found for this workload.")
+            return
+        print_index_advice(results)
+        recommended = [result for result in results if result["recommended"]]
+        if not recommended:
+            display_message("None of the candidates improves a plan.")
+            return
+        if input(f"🛠️ Create the {len(recommended)} recommended index(es)? (y/n): ").strip().lower() == "y":
+            for name in apply_indexes(pool, recommended):
+                print(f"✅ Created index {name}.")
+            print("ℹ️ Recapture the plan baseline (option 6) so plan checks use the new indexes.")
+    except DB_ERRORS as e:
+        print(f"❌ Error running the index advisor: {e}")
+
+# Adds the date bucket columns and indexes after confirmation
+def run_date_bucket_migration(pool):
+    """
+    Adds the generated date bucket columns and the date indexes the reports and
+    summaries use. On MySQL each new column rebuilds its table, so this asks first.
+    """
+    if date_buckets_ready(pool):
+        print("ℹ️ The date bucket columns already exist; only missing indexes will be added.")
+    elif dialect_of(pool) == "mysql":
+        print("⚠️ Adding the columns rebuilds Payments, Shipments, DeliveryAttempts and Pickup_Requests,")
+        print("   blocking writes to them until it finishes.")
+    if input("🗓️ Add the date bucket columns and indexes now? (y/n): ").strip().lower() != "y":
+        return
+    try:
+        added = ensure_date_buckets(pool)
+    except DB_ERRORS as e:
+        print(f"❌ Error adding date bucket columns: {e}")
+        return
+    if not added:
+        display_message("Nothing to add; the date buckets are up to date.")
+        return
+    display_message(f"Added: {', '.join(added)}.")
+    print("ℹ️ Recapture the plan baseline (option 6) so plan checks use the new columns.")
+
+def show_stats(header, stats):
+    """Display a dictionary of counters as key-value pairs."""
+    print("\n" + "=" * 50)
+    print(f"{header}".center(50))
+    print("-" * 50)
+    for key, value in stats.items():
+        if isinstance(value, float):
+            value = f"{value:.3f}"
+        print(f"{key.replace('_', ' ').title():<20}: {value}")
+    print("=" * 50)
@@ -12,9 +12,10 @@ def table_list():
     print("-" * 50)
     print("1. 🗂️ Basic CRUD Operations")  # New section for CRUD operations
     print("2. 📊 Manage Complex SQL Queries")  # New section for complex SQL queries
-    print("3. ❌ Exit Application")
+    print("3. ⚙️ Performance & Maintenance Tools")
+    print("4. ❌ Exit Application")
     print("=" * 50)
-    return input("👉 Select an option (1-3): ").strip()
+    return input("👉 Select an option (1-4): ").strip()
 
 # Generates CRUD menu for specific entity
 def crud_operation_menu(entity_name):
@@ -0,0 +1,115 @@
+# rendering.py
+import csv
+import itertools
+import json
+import sys
+
+# Rows read ahead to size the columns when no widths are given
+RENDER_SAMPLE_SIZE = 1000
+
+# Widest a column may get; longer cells are cut and end with "…"
+MAX_COLUMN_WIDTH = 80
+
+# Lines collected before they are written out in one call
+RENDER_BUFFER_LINES = 500
+
+# Machine-readable formats write_rows can produce
+OUTPUT_FORMATS = ("csv", "jsonl")
+
+def _cell(value, width):
+    text = str(value)
+    if len(text) > width:
+        return text[:width - 1] + "…" if width > 1 else text[:width]
+    return text
+
+# Function to display query results as an aligned table
+def render_table(headers, rows, widths=None, sample_size=RENDER_SAMPLE_SIZE, max_rows=None, page_size=None,
+                 out=None, max_width=MAX_COLUMN_WIDTH):
+    """
+    Prints rows as an aligned table without holding the whole result in memory.
+
+    Column widths come from `widths` when given, otherwise from the headers and the
+    first `sample_size` rows; later rows with longer cells are truncated to fit.
+    Lines are written to `out` in blocks of RENDER_BUFFER_LINES.
+
+    Parameters:
+        headers - column titles, or None to take them from rows.description
+                  (a cursor)
+        rows - any iterable of row tuples: a list, a cursor, db.stream_query(...)
+        widths - fixed column widths, skipping the sample
+        sample_size - rows read ahead to size the columns
+        max_rows - stop after this many rows and say the output was cut
+        page_size - pause for Enter (or q to stop) after every page of rows
+        out - text stream to write to, defaults to sys.stdout
+        max_width - cap on sampled column widths
+
+    Returns:
+        Number of rows printed. Nothing is printed for an empty result.
+    """
+    out = out or sys.stdout
+    if headers is None:
+        headers = [column[0] for column in rows.description]
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, sample_size if widths is None else 1))
+    if not sample:
+        return 0
+    if widths is None:
+        widths = [min(max_width, max(len(str(item)) for item in column)) for column in zip(headers, *sample)]
+    widths = [max(1, width) for width in widths]
+
+    row_format = " | ".join(f"{{:<{width}}}" for width in widths)
+    rule = sum(widths) + 3 * (len(headers) - 1)
+    buffer = ["\n" + "=" * rule, row_format.format(*(_cell(header, width) for header, width in zip(headers, widths))),
+              "-" * rule]
+
+    def flush():
+        out.write("\n".join(buffer) + "\n")
+        out.flush()
+        buffer.clear()
+
+    printed = 0
+    for row in itertools.chain(sample, rows):
+        if max_rows is not None and printed >= max_rows:
+            buffer.append(f"... output limited to {max_rows} rows")
+            break
+        buffer.append(row_format.format(*(_cell(value, width) for value, width in zip(row, widths))))
+        printed += 1
+        if page_size and printed % page_size == 0:
+            flush()
+            if input(f"-- {printed} rows shown, Enter for more, q to stop -- ").strip().lower() == "q":
+                buffer.append(f"... stopped after {printed} rows")
+                break
+        elif len(buffer) >= RENDER_BUFFER_LINES:
+            flush()
+    buffer.append("=" * rule)
+    flush()
+    # Stopping early must still release a streamed result (see db.stream_query)
+    close = getattr(rows, "close", None)
+    if close is not None:
+        close()
+    return printed
+
+# Function to write query results as CSV or JSON lines
+def write_rows(headers, rows, out, output_format="csv"):
+    """
+    Writes rows to the text stream `out` one at a time: CSV with a header line, or
+    one JSON object per line keyed by the headers. NULLs become empty CSV cells or
+    JSON null; dates and decimals are written as text.
+
+    Returns:
+        Number of rows written.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Expected one of: {', '.join(OUTPUT_FORMATS)}")
+    count = 0
+    if output_format == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            out.write(json.dumps(dict(zip(headers, row)), default=str) + "\n")
+            count += 1
+    return count
@@ -0,0 +1,88 @@
+# report_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from db import table_versions
+
+# Report results kept at most; the least recently used result is dropped first
+REPORT_CACHE_SIZE = 64
+
+# Seconds a result is served at most. Table versions only see this process's writes,
+# so this bounds how long changes made by other clients can go unnoticed (0 disables it)
+REPORT_CACHE_MAX_AGE = 300.0
+
+# (report name, params, database) -> (tables, table versions when computed, headers, rows, computed_at)
+_entries = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stale": 0, "expired": 0, "evictions": 0}
+
+# Function to return a cached report result or compute and cache it
+def cached_report(key, tables, compute, refresh=False, max_age=None):
+    """
+    Returns compute() -> (headers, rows) for `key`, reusing the previous result
+    while none of `tables` has been written since it was computed and it is no
+    older than `max_age` seconds.
+
+    Every write made through db.execute_query / db.bulk_insert bumps the version
+    of the table it touched, so a result is served from the cache only while the
+    versions of its tables are unchanged. The versions are read before compute()
+    runs, so a write that lands during the query makes the new entry stale at once.
+
+    Parameters:
+        key - hashable identity of the result, including the database it comes
+              from, e.g. (report name, params, db.database_of(conn))
+        tables - names of the tables the result is computed from
+        compute - function running the query, called on a miss
+        refresh - True to run compute() even when a fresh result is cached
+        max_age - seconds a result may be reused, defaults to REPORT_CACHE_MAX_AGE
+
+    Returns:
+        (headers, rows); rows is a tuple shared with the cache and must not be changed.
+    """
+    versions = table_versions(tables)
+    max_age = REPORT_CACHE_MAX_AGE if max_age is None else max_age
+    with _lock:
+        entry = _entries.get(key)
+        expired = entry is not None and max_age > 0 and time.time() - entry[4] > max_age
+        if entry is not None and entry[1] == versions and not expired and not refresh:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return entry[2], entry[3]
+        if entry is not None:
+            del _entries[key]
+            if entry[1] != versions:
+                _stats["stale"] += 1
+            elif expired:
+                _stats["expired"] += 1
+        _stats["misses"] += 1
+
+    headers, rows = compute()
+    rows = tuple(rows)
+    with _lock:
+        _entries[key] = (tuple(tables), versions, list(headers), rows, time.time())
+        _entries.move_to_end(key)
+        while len(_entries) > REPORT_CACHE_SIZE:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+    return headers, rows
+
+# Function to drop cached report results
+def clear_report_cache(table_name=None):
+    """Drops every cached result, or only those computed from `table_name`."""
+    with _lock:
+        if table_name is None:
+            _entries.clear()
+            return
+        table_key = table_name.lower()
+        for key in [key for key, entry in _entries.items() if table_key in (name.lower() for name in entry[0])]:
+            del _entries[key]
+
+# Function to report cache effectiveness
+def report_cache_stats():
+    """Returns hit / miss / stale / expired / eviction counters, the entry count and the hit ratio."""
+    with _lock:
+        stats = dict(_stats, entries=len(_entries), max_entries=REPORT_CACHE_SIZE, max_age=REPORT_CACHE_MAX_AGE)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
@@ -1,20 +1,28 @@
+import sys
+
+from cli import main
 from complex_operations import manage_complex_queries
 from crudoperations import manage_basic_crud_operations
+from maintenance import manage_maintenance_tools
 from menus import table_list
-from db import create_connection
+from db import create_pool
+from summaries import ensure_summary_tables
 
 def start_application():
     """
     Entry point for the application.
-    Establishes database connection and allows users to perform CRUD operations
+    Establishes a database connection pool and allows users to perform CRUD operations
     on various entities through a menu-driven interface and explore complex SQL queries.
     """
-    # Establish a connection to the database
-    conn = create_connection()
-    if not conn:
+    # Establish a pool of connections to the database
+    pool = create_pool()
+    if not pool:
         print("❌ Unable to connect to the database. Exiting...")
         return
 
+    # Create and backfill the summary tables the reports read, if missing
+    ensure_summary_tables(pool)
+
     # Continuously display the main menu until the user chooses to exit
     while True:
         table_choice = table_list()
@@ -22,17 +30,24 @@ def start_application():
         # Basic CRUD Operations
         if table_choice == "1":
             print("🔄 Accessing Basic CRUD Operations...")
-            manage_basic_crud_operations(conn)
+            manage_basic_crud_operations(pool)
         
         # Advanced SQL Queries Section
         elif table_choice == "2":
             print("🔍 Accessing Complex SQL Queries...")
-            manage_complex_queries(conn)  # Manage complex SQL queries (Deliverable 5 focus)
+            # Reports run on one borrowed connection for the whole session
+            with pool.connection() as conn:
+                manage_complex_queries(conn, pool)  # Manage complex SQL queries (Deliverable 5 focus)
 
-        # Exit the application
+        # Performance and Maintenance Tools
         elif table_choice == "3":
+            print("⚙️ Accessing Performance & Maintenance Tools...")
+            manage_maintenance_tools(pool)
+
+        # Exit the application
+        elif table_choice == "4":
             print("👋 Exiting... Have a great day!")
-            conn.close()
+            pool.close_all()
             break
 
         # Error Handling for Invalid Option
@@ -41,4 +56,7 @@ def start_application():
 
 
 if __name__ == "__main__":
-    start_application()
\ No newline at end of file
+    # Any arguments select the non-interactive command line (see cli.py)
+    if len(sys.argv) > 1:
+        sys.exit(main(sys.argv[1:]))
+    start_application()
@@ -0,0 +1,182 @@
+# schema.py
+import re
+
+# Table catalogue for the UPS_DB schema used by crudoperations.py and complex_operations.py.
+# For every table: its primary key and the columns the application writes on insert
+# (auto-increment keys and server-filled timestamps are left out). "unique_key": False
+# marks a key column that several rows may share (a customer has many addresses).
+TABLES = {
+    "User_Role": {
+        "primary_key": "role_id",
+        "insert_columns": ["role_name"],
+    },
+    "Users": {
+        "primary_key": "user_id",
+        "insert_columns": ["first_name", "last_name", "email", "phone_number", "role_id", "password"],
+    },
+    "Customers": {
+        "primary_key": "customer_id",
+        "insert_columns": ["first_name", "last_name", "email", "phone_number", "DOB"],
+    },
+    "Addresses": {
+        "primary_key": "customer_id",
+        "unique_key": False,
+        "insert_columns": ["customer_id", "Street_Address", "City", "State", "Postal_Code", "Country"],
+    },
+    "Shipments": {
+        "primary_key": "shipment_id",
+        "insert_columns": ["customer_id", "shipment_status", "shipment_type", "shipment_date", "user_id"],
+    },
+    "Packages": {
+        "primary_key": "package_id",
+        "insert_columns": ["shipment_id", "weight", "contents_description", "delivery_confirmation"],
+    },
+    "Payments": {
+        "primary_key": "payment_id",
+        "insert_columns": ["customer_id", "amount", "payment_date", "payment_method"],
+    },
+    "DeliveryAttempts": {
+        "primary_key": "attempt_id",
+        "insert_columns": ["shipment_id", "attempt_date", "attempt_status"],
+    },
+    "PackageDimension": {
+        "primary_key": "package_id",
+        "insert_columns": ["package_id", "length", "width", "height"],
+    },
+    "PackageStatus": {
+        "primary_key": "status_id",
+        "insert_columns": ["package_id", "status_type"],
+    },
+    "Pickup_Requests": {
+        "primary_key": "request_id",
+        "insert_columns": ["customer_id", "pickup_date", "pickup_status"],
+    },
+}
+
+# Tables the application maintains itself from the UPS tables (see summaries.py and
+# sketches.py): name -> the UPS tables it is derived from
+DERIVED_TABLES = {
+    "PaymentMonthlySummary": ("Payments",),
+    "DailyDeliveryStats": ("DeliveryAttempts",),
+    "QuantileSketches": ("Packages", "Payments"),
+}
+
+# Function to resolve a table name regardless of letter case
+def resolve_table(table_name):
+    """
+    Returns the catalogue name of a table (e.g. 'user_role' -> 'User_Role').
+    Raises ValueError for tables that are not part of the UPS schema.
+    """
+    for name in TABLES:
+        if name.lower() == table_name.lower():
+            return name
+    raise ValueError(f"Unknown table '{table_name}'. Expected one of: {', '.join(TABLES)}")
+
+# Function to list the UPS tables a statement reads or writes
+def tables_referenced(query):
+    """
+    Returns the catalogue names of the UPS and derived tables named in `query`,
+    matched as whole words regardless of letter case (CTE names and aliases are ignored).
+    """
+    return [name for name in [*TABLES, *DERIVED_TABLES] if re.search(rf"\b{name}\b", query, re.IGNORECASE)]
+
+# UPS schema for the embedded SQLite backend (see backends.SQLiteBackend).
+# Mirrors the MySQL tables created by ups.sql closely enough for every CRUD flow and report.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS User_Role (
+    role_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    role_name VARCHAR(50) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    email VARCHAR(100),
+    phone_number VARCHAR(15),
+    role_id INTEGER REFERENCES User_Role (role_id),
+    password VARCHAR(255)
+);
+
+CREATE TABLE IF NOT EXISTS Customers (
+    customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    email VARCHAR(100),
+    phone_number VARCHAR(15),
+    DOB DATE
+);
+
+CREATE TABLE IF NOT EXISTS Addresses (
+    customer_id INTEGER REFERENCES Customers (customer_id),
+    Street_Address VARCHAR(255),
+    City VARCHAR(100),
+    State VARCHAR(100),
+    Postal_Code VARCHAR(20),
+    Country VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS Shipments (
+    shipment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id INTEGER REFERENCES Customers (customer_id),
+    shipment_status VARCHAR(50),
+    shipment_type VARCHAR(50),
+    shipment_date DATETIME,
+    user_id INTEGER REFERENCES Users (user_id)
+);
+
+CREATE TABLE IF NOT EXISTS Packages (
+    package_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shipment_id INTEGER REFERENCES Shipments (shipment_id),
+    weight DECIMAL(10, 2),
+    contents_description VARCHAR(255),
+    delivery_confirmation BOOLEAN
+);
+
+CREATE TABLE IF NOT EXISTS Payments (
+    payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id INTEGER REFERENCES Customers (customer_id),
+    amount DECIMAL(10, 2),
+    payment_date DATE,
+    payment_method VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS DeliveryAttempts (
+    attempt_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shipment_id INTEGER REFERENCES Shipments (shipment_id),
+    attempt_date DATETIME,
+    attempt_status VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS PackageDimension (
+    package_id INTEGER PRIMARY KEY REFERENCES Packages (package_id),
+    length DECIMAL(10, 2),
+    width DECIMAL(10, 2),
+    height DECIMAL(10, 2)
+);
+
+CREATE TABLE IF NOT EXISTS PackageStatus (
+    status_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    package_id INTEGER REFERENCES Packages (package_id),
+    status_type VARCHAR(50),
+    status_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS Pickup_Requests (
+    request_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    customer_id INTEGER REFERENCES Customers (customer_id),
+    pickup_date DATETIME,
+    pickup_status VARCHAR(50)
+);
+"""
+
+_CREATE_TABLE = re.compile(r"CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\n\);", re.DOTALL)
+
+# Function to list the columns of a UPS table
+def table_columns(table_name):
+    """Returns the column names of a UPS table, in schema order."""
+    name = resolve_table(table_name)
+    for table, body in _CREATE_TABLE.findall(SQLITE_SCHEMA):
+        if table == name:
+            return [line.split()[0] for line in body.strip().splitlines() if line.strip()]
+    return []
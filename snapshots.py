@@ -0,0 +1,228 @@
+# snapshots.py
+import datetime
+import itertools
+import json
+import os
+
+try:
+    import numpy as np
+except ImportError:  # Snapshots need NumPy; the rest of the app does not
+    np = None
+
+from db import stream_query
+from schema import TABLES
+
+# Directory holding one sub-directory of column files per table
+SNAPSHOT_DIR = os.environ.get("UPS_SNAPSHOT_DIR", "snapshots")
+
+# Rows converted and appended to the column files at a time
+SNAPSHOT_CHUNK_ROWS = 50000
+
+# Column kinds and how they are stored:
+#   int       - int64, NULL as INT_NULL
+#   float     - float64, NULL as NaN
+#   bool      - int8, 1 / 0, NULL as -1
+#   string    - int32 codes into the column's dictionary (metadata.json), NULL as -1
+#   timestamp - int64 seconds since the epoch, NULL as INT_NULL (NaT when viewed as datetime64[s])
+SNAPSHOT_TABLES = {
+    "Shipments": {"shipment_id": "int", "customer_id": "int", "shipment_status": "string", "shipment_type": "string",
+                  "shipment_date": "timestamp", "user_id": "int"},
+    "Packages": {"package_id": "int", "shipment_id": "int", "weight": "float", "contents_description": "string",
+                 "delivery_confirmation": "bool"},
+    "Payments": {"payment_id": "int", "customer_id": "int", "amount": "float", "payment_date": "timestamp",
+                 "payment_method": "string"},
+    "DeliveryAttempts": {"attempt_id": "int", "shipment_id": "int", "attempt_date": "timestamp",
+                         "attempt_status": "string"},
+    "PackageStatus": {"status_id": "int", "package_id": "int", "status_type": "string", "status_timestamp": "timestamp"},
+}
+
+_DTYPES = {"int": "<i8", "float": "<f8", "bool": "i1", "string": "<i4", "timestamp": "<i8"}
+
+# Stored for NULL in int and timestamp columns (the int64 value of NaT)
+INT_NULL = -2 ** 63
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("Snapshots need NumPy (pip install numpy)")
+
+def _table_dir(table_name, directory):
+    return os.path.join(directory, table_name)
+
+def _metadata_path(table_name, directory):
+    return os.path.join(_table_dir(table_name, directory), "metadata.json")
+
+def _column_path(table_name, column, directory):
+    return os.path.join(_table_dir(table_name, directory), f"{column}.bin")
+
+# Function to read the metadata of a snapshot
+def snapshot_metadata(table_name, directory=SNAPSHOT_DIR):
+    """Returns the metadata of the snapshot of `table_name`, or None when there is none."""
+    path = _metadata_path(table_name, directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+def _write_metadata(table_name, metadata, directory):
+    # Written last and swapped in at once: a refresh that dies half way leaves
+    # the previous metadata, whose row count hides the partly appended rows
+    path = _metadata_path(table_name, directory)
+    with open(path + ".tmp", "w", encoding="utf-8") as handle:
+        json.dump(metadata, handle)
+    os.replace(path + ".tmp", path)
+
+def _as_flag(value):
+    if value is None:
+        return -1
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ("1", "true", "yes", "y"):
+            return 1
+        return 0 if text in ("0", "false", "no", "n") else -1
+    return 1 if value else 0
+
+def _as_epoch(values):
+    stamps = []
+    for value in values:
+        if value is None or value == "":
+            stamps.append(None)
+        elif isinstance(value, (datetime.date, datetime.datetime)):
+            stamps.append(value)
+        else:
+            stamps.append(str(value).strip().replace(" ", "T"))
+    return np.array(stamps, dtype="datetime64[s]").view("<i8")
+
+def _encode(kind, values, dictionary, codes):
+    """Converts one chunk of a column to its stored array; new strings are added to `dictionary`."""
+    if kind == "int":
+        return np.array([INT_NULL if value is None else int(value) for value in values], dtype="<i8")
+    if kind == "float":
+        return np.array([np.nan if value is None else float(value) for value in values], dtype="<f8")
+    if kind == "bool":
+        return np.array([_as_flag(value) for value in values], dtype="i1")
+    if kind == "timestamp":
+        return _as_epoch(values)
+    encoded = []
+    for value in values:
+        if value is None:
+            encoded.append(-1)
+            continue
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(dictionary)
+            dictionary.append(value)
+        encoded.append(code)
+    return np.array(encoded, dtype="<i4")
+
+# Function to write or extend the snapshot of one table
+def refresh_snapshot(connection, table_name, directory=SNAPSHOT_DIR, full=False):
+    """
+    Appends the rows of `table_name` added since the last refresh to its column
+    files: rows with a primary key above the stored watermark, in key order.
+    Rows are appended only, so updates and deletes of already captured rows show
+    up after a full refresh (full=True rewrites the snapshot).
+
+    Parameters:
+        connection - a ConnectionPool or connection to read from
+        table_name - one of SNAPSHOT_TABLES
+        directory - where the snapshot directories live
+
+    Returns:
+        Number of rows appended.
+    """
+    _require_numpy()
+    columns = SNAPSHOT_TABLES[table_name]
+    primary_key = TABLES[table_name]["primary_key"]
+    os.makedirs(_table_dir(table_name, directory), exist_ok=True)
+
+    metadata = None if full else snapshot_metadata(table_name, directory)
+    if metadata is None or list(metadata["columns"]) != list(columns):
+        metadata = {
+            "table": table_name, "primary_key": primary_key, "rows": 0, "watermark": None,
+            "columns": {column: {"kind": kind, "dtype": _DTYPES[kind]} for column, kind in columns.items()},
+        }
+        for column, kind in columns.items():
+            if kind == "string":
+                metadata["columns"][column]["dictionary"] = []
+
+    dictionaries = {column: info.get("dictionary", []) for column, info in metadata["columns"].items()}
+    codes = {column: {value: code for code, value in enumerate(values)} for column, values in dictionaries.items()}
+    handles = {}
+    try:
+        for column in columns:
+            handle = open(_column_path(table_name, column, directory), "r+b" if metadata["rows"] else "w+b")
+            # Drop anything past the recorded rows left by an interrupted refresh
+            handle.truncate(metadata["rows"] * np.dtype(_DTYPES[columns[column]]).itemsize)
+            handle.seek(0, os.SEEK_END)
+            handles[column] = handle
+
+        query = f"SELECT {', '.join(columns)} FROM {table_name}"
+        params = ()
+        if metadata["watermark"] is not None:
+            query += f" WHERE {primary_key} > %s"
+            params = (metadata["watermark"],)
+        rows = stream_query(connection, query + f" ORDER BY {primary_key}", params)
+        appended = 0
+        while True:
+            chunk = list(itertools.islice(rows, SNAPSHOT_CHUNK_ROWS))
+            if not chunk:
+                break
+            for column, values in zip(columns, zip(*chunk)):
+                handles[column].write(_encode(columns[column], values, dictionaries[column], codes[column]).tobytes())
+            appended += len(chunk)
+            metadata["watermark"] = chunk[-1][list(columns).index(primary_key)]
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    metadata["rows"] += appended
+    metadata["refreshed_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+    _write_metadata(table_name, metadata, directory)
+    return appended
+
+# Function to refresh the snapshots of every fact table
+def refresh_snapshots(connection, tables=None, directory=SNAPSHOT_DIR, full=False):
+    """Refreshes the snapshot of each table in `tables` (all of SNAPSHOT_TABLES by default); returns {table: rows appended}."""
+    return {table_name: refresh_snapshot(connection, table_name, directory, full)
+            for table_name in tables or SNAPSHOT_TABLES}
+
+# Function to open a snapshot without copying it into memory
+def load_snapshot(table_name, directory=SNAPSHOT_DIR):
+    """
+    Maps the column files of a snapshot read-only. The arrays are views of the
+    files (no copy is made; pages are read as they are touched).
+
+    Returns:
+        dict with "rows", "watermark", "columns" (column -> array: int64, float64,
+        int8 flags, int32 string codes, or datetime64[s] for timestamps) and
+        "dictionaries" (string column -> list of values indexed by code).
+        None when the table has no snapshot yet.
+    """
+    _require_numpy()
+    metadata = snapshot_metadata(table_name, directory)
+    if metadata is None:
+        return None
+    rows = metadata["rows"]
+    columns = {}
+    for column, info in metadata["columns"].items():
+        if rows:
+            array = np.memmap(_column_path(table_name, column, directory), dtype=info["dtype"], mode="r",
+                              shape=(rows,))
+        else:
+            array = np.empty(0, dtype=info["dtype"])
+        columns[column] = array.view("datetime64[s]") if info["kind"] == "timestamp" else array
+    return {
+        "table": table_name,
+        "rows": rows,
+        "watermark": metadata["watermark"],
+        "columns": columns,
+        "dictionaries": {column: info["dictionary"] for column, info in metadata["columns"].items()
+                         if info["kind"] == "string"},
+    }
+
+# Function to turn string codes back into values
+def decode_strings(snapshot, column):
+    """Returns the values of string column `column` as an object array (None for NULL)."""
+    dictionary = np.array(snapshot["dictionaries"][column] + [None], dtype=object)
+    # Code -1 (NULL) picks the None appended at the end
+    return dictionary[snapshot["columns"][column]]
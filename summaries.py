@@ -0,0 +1,439 @@
+# summaries.py
+import datetime
+from collections import defaultdict
+
+from db import (DB_ERRORS, borrow_connection, bump_table_versions, dialect_of, finish_read, open_cursor,
+                register_bulk_insert_hook, table_exists, transaction)
+from date_buckets import date_buckets_ready
+from sketches import SKETCH_TABLE, ensure_sketches, rebuild_sketches
+
+# Payments aggregated per month and customer, read by the payment reports
+PAYMENT_SUMMARY_TABLE = "PaymentMonthlySummary"
+
+# DDL per dialect; payment_period is 'YYYY-MM', NULL for payments without a date
+PAYMENT_SUMMARY_DDL = {
+    "mysql": [
+        """
+        CREATE TABLE IF NOT EXISTS PaymentMonthlySummary (
+            summary_id INT AUTO_INCREMENT PRIMARY KEY,
+            payment_period CHAR(7) NULL,
+            payment_year INT NULL,
+            payment_month INT NULL,
+            customer_id INT NULL,
+            payment_count INT NOT NULL,
+            total_amount DECIMAL(14, 2),
+            min_amount DECIMAL(10, 2),
+            max_amount DECIMAL(10, 2),
+            KEY idx_payment_summary_period (payment_period, customer_id),
+            KEY idx_payment_summary_customer (customer_id, payment_period)
+        )
+        """,
+    ],
+    "sqlite": [
+        """
+        CREATE TABLE IF NOT EXISTS PaymentMonthlySummary (
+            summary_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payment_period CHAR(7),
+            payment_year INTEGER,
+            payment_month INTEGER,
+            customer_id INTEGER,
+            payment_count INTEGER NOT NULL,
+            total_amount DECIMAL(14, 2),
+            min_amount DECIMAL(10, 2),
+            max_amount DECIMAL(10, 2)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_payment_summary_period ON PaymentMonthlySummary (payment_period, customer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_payment_summary_customer ON PaymentMonthlySummary (customer_id, payment_period)",
+    ],
+}
+
+_SUMMARY_COLUMNS = ("payment_period, payment_year, payment_month, customer_id, "
+                    "payment_count, total_amount, min_amount, max_amount")
+
+def _summary_insert(where, buckets):
+    # Grouped on the generated Payments.payment_period column when it exists (see
+    # date_buckets), so the (customer_id, payment_period) index serves ranges and
+    # grouping. mysql.connector substitutes only %s (a %% would reach the server
+    # as is), so the format string is written with single % signs
+    period = "payment_period" if buckets else "DATE_FORMAT(payment_date, '%Y-%m')"
+    return f"""
+        INSERT INTO PaymentMonthlySummary ({_SUMMARY_COLUMNS})
+        SELECT {period}, MIN(YEAR(payment_date)), MIN(MONTH(payment_date)), customer_id,
+               COUNT(*), SUM(amount), MIN(amount), MAX(amount)
+        FROM Payments
+        {where}
+        GROUP BY customer_id, {period}
+    """
+
+# Function to create the summary table when it is missing
+def ensure_payment_summary(connection):
+    """
+    Creates PaymentMonthlySummary if it does not exist yet and backfills it.
+
+    Returns:
+        True when the table was created (and built), False when it already existed.
+    """
+    with borrow_connection(connection) as conn:
+        if table_exists(conn, PAYMENT_SUMMARY_TABLE):
+            return False
+        with open_cursor(conn) as cursor:
+            for statement in PAYMENT_SUMMARY_DDL[dialect_of(conn)]:
+                cursor.execute(statement)
+        rebuild_payment_summary(conn)
+        return True
+
+# Function to recompute the whole summary from Payments
+def rebuild_payment_summary(connection):
+    """
+    Recomputes PaymentMonthlySummary from scratch in one transaction (backfill, or
+    repair after Payments was changed outside this application).
+
+    Returns:
+        Number of summary rows written.
+    """
+    with transaction(connection) as conn:
+        with open_cursor(conn) as cursor:
+            cursor.execute("DELETE FROM PaymentMonthlySummary")
+            cursor.execute(_summary_insert("", date_buckets_ready(conn)))
+            written = cursor.rowcount
+        bump_table_versions([PAYMENT_SUMMARY_TABLE])
+    return written
+
+def _month_start(value):
+    """First day of the month of a payment date (date, datetime or ISO text)."""
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    elif not isinstance(value, datetime.date):
+        value = datetime.date.fromisoformat(str(value).strip()[:10])
+    return value.replace(day=1)
+
+def _next_month(month):
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+def _normalize_customer(customer_id):
+    if customer_id in (None, ""):
+        return None
+    try:
+        return int(customer_id)
+    except (TypeError, ValueError):
+        return customer_id
+
+def _refresh_groups(conn, payments):
+    """
+    Recomputes the summary rows touched by `payments` on `conn`, without starting
+    or ending a transaction. Per customer, the months from the earliest to the
+    latest touched month are deleted and re-aggregated from Payments with a
+    payment_period range on the (customer_id, payment_period) index, or a
+    payment_date range before the date bucket columns were added.
+    """
+    buckets = date_buckets_ready(conn)
+    months = defaultdict(set)
+    for customer_id, payment_date in payments:
+        customer_id = _normalize_customer(customer_id)
+        months[customer_id].add(None if payment_date in (None, "") else _month_start(payment_date))
+
+    with open_cursor(conn) as cursor:
+        for customer_id, touched in months.items():
+            customer_sql = "customer_id IS NULL" if customer_id is None else "customer_id = %s"
+            customer_params = () if customer_id is None else (customer_id,)
+            if None in touched:
+                touched.discard(None)
+                cursor.execute(f"DELETE FROM PaymentMonthlySummary WHERE {customer_sql} AND payment_period IS NULL",
+                               customer_params)
+                missing = "payment_period IS NULL" if buckets else "payment_date IS NULL"
+                cursor.execute(_summary_insert(f"WHERE {customer_sql} AND {missing}", buckets),
+                               customer_params)
+            if touched:
+                first, last = min(touched), max(touched)
+                cursor.execute(
+                    f"DELETE FROM PaymentMonthlySummary WHERE {customer_sql} AND payment_period BETWEEN %s AND %s",
+                    customer_params + (first.strftime("%Y-%m"), last.strftime("%Y-%m")))
+                if buckets:
+                    cursor.execute(_summary_insert(f"WHERE {customer_sql} AND payment_period BETWEEN %s AND %s", True),
+                                   customer_params + (first.strftime("%Y-%m"), last.strftime("%Y-%m")))
+                else:
+                    cursor.execute(
+                        _summary_insert(f"WHERE {customer_sql} AND payment_date >= %s AND payment_date < %s", False),
+                        customer_params + (first, _next_month(last)))
+    bump_table_versions([PAYMENT_SUMMARY_TABLE])
+
+# Function to bring the summary up to date after payment writes
+def refresh_payment_summary(connection, payments):
+    """
+    Updates the summary rows for the given payments. Call it with the old and the
+    new (customer_id, payment_date) of every inserted, updated or deleted payment,
+    inside the same transaction() as the write so both commit together.
+
+    Parameters:
+        connection - a ConnectionPool or connection (joins an open transaction())
+        payments - iterable of (customer_id, payment_date) pairs
+    """
+    payments = [payment for payment in payments if payment is not None]
+    if payments:
+        with transaction(connection) as conn:
+            _refresh_groups(conn, payments)
+
+def _refresh_after_bulk_insert(conn, columns, batch):
+    # Loads that run before ensure_payment_summary() are picked up by its backfill
+    if not table_exists(conn, PAYMENT_SUMMARY_TABLE):
+        return
+    customer_index = columns.index("customer_id") if "customer_id" in columns else None
+    date_index = columns.index("payment_date") if "payment_date" in columns else None
+    _refresh_groups(conn, [
+        (row[customer_index] if customer_index is not None else None,
+         row[date_index] if date_index is not None else None)
+        for row in batch
+    ])
+
+register_bulk_insert_hook("Payments", _refresh_after_bulk_insert)
+
+# Delivery attempts aggregated per day, read by the daily success rate report
+DELIVERY_STATS_TABLE = "DailyDeliveryStats"
+
+# Name of the DeliveryAttempts high-water mark in SummaryWatermarks
+DELIVERY_STATS_WATERMARK = "DailyDeliveryStats"
+
+DELIVERY_STATS_DDL = {
+    "mysql": [
+        """
+        CREATE TABLE IF NOT EXISTS DailyDeliveryStats (
+            delivery_date DATE NOT NULL PRIMARY KEY,
+            total_attempts INT NOT NULL,
+            successful_attempts INT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS SummaryWatermarks (
+            summary_name VARCHAR(64) NOT NULL PRIMARY KEY,
+            last_id BIGINT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS DeliveryStatsDirtyDays (
+            delivery_date DATE NOT NULL PRIMARY KEY
+        )
+        """,
+    ],
+    "sqlite": [
+        """
+        CREATE TABLE IF NOT EXISTS DailyDeliveryStats (
+            delivery_date DATE NOT NULL PRIMARY KEY,
+            total_attempts INTEGER NOT NULL,
+            successful_attempts INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS SummaryWatermarks (
+            summary_name VARCHAR(64) NOT NULL PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS DeliveryStatsDirtyDays (
+            delivery_date DATE NOT NULL PRIMARY KEY
+        )
+        """,
+    ],
+}
+
+# Day of an attempt: the generated DeliveryAttempts.attempt_day column once the date
+# buckets were added (see date_buckets), else computed per row
+_ATTEMPT_DAY = {True: "attempt_day", False: "DATE(attempt_date)"}
+
+# Adds the aggregates of a range of attempts onto the stored days; {day} is an _ATTEMPT_DAY
+_DELIVERY_STATS_MERGE = {
+    "mysql": """
+        INSERT INTO DailyDeliveryStats (delivery_date, total_attempts, successful_attempts)
+        SELECT {day}, COUNT(*), SUM(CASE WHEN attempt_status = 'Success' THEN 1 ELSE 0 END)
+        FROM DeliveryAttempts
+        WHERE attempt_id > %s AND attempt_id <= %s AND attempt_date IS NOT NULL
+        GROUP BY {day}
+        ON DUPLICATE KEY UPDATE
+            total_attempts = total_attempts + VALUES(total_attempts),
+            successful_attempts = successful_attempts + VALUES(successful_attempts)
+    """,
+    "sqlite": """
+        INSERT INTO DailyDeliveryStats (delivery_date, total_attempts, successful_attempts)
+        SELECT {day}, COUNT(*), SUM(CASE WHEN attempt_status = 'Success' THEN 1 ELSE 0 END)
+        FROM DeliveryAttempts
+        WHERE attempt_id > %s AND attempt_id <= %s AND attempt_date IS NOT NULL
+        GROUP BY {day}
+        ON CONFLICT (delivery_date) DO UPDATE SET
+            total_attempts = total_attempts + excluded.total_attempts,
+            successful_attempts = successful_attempts + excluded.successful_attempts
+    """,
+}
+
+# Recomputes one stored day from scratch, up to the attempts covered by the watermark;
+# reads the (attempt_day, attempt_status) index range of that day, or an attempt_date
+# range (day, next day) before the date buckets were added
+_DELIVERY_DAY_INSERT = {
+    True: """
+        INSERT INTO DailyDeliveryStats (delivery_date, total_attempts, successful_attempts)
+        SELECT attempt_day, COUNT(*), SUM(CASE WHEN attempt_status = 'Success' THEN 1 ELSE 0 END)
+        FROM DeliveryAttempts
+        WHERE attempt_day = %s AND attempt_id <= %s
+        GROUP BY attempt_day
+    """,
+    False: """
+        INSERT INTO DailyDeliveryStats (delivery_date, total_attempts, successful_attempts)
+        SELECT DATE(attempt_date), COUNT(*), SUM(CASE WHEN attempt_status = 'Success' THEN 1 ELSE 0 END)
+        FROM DeliveryAttempts
+        WHERE attempt_date >= %s AND attempt_date < %s AND attempt_id <= %s
+        GROUP BY DATE(attempt_date)
+    """,
+}
+
+_MARK_DIRTY_DAY = {
+    "mysql": "INSERT IGNORE INTO DeliveryStatsDirtyDays (delivery_date) VALUES (%s)",
+    "sqlite": "INSERT OR IGNORE INTO DeliveryStatsDirtyDays (delivery_date) VALUES (%s)",
+}
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value).strip()[:10])
+
+# Function to create the delivery statistics tables when they are missing
+def ensure_delivery_stats(connection):
+    """
+    Creates DailyDeliveryStats with its watermark and dirty-day tables if they do
+    not exist yet and backfills it.
+
+    Returns:
+        True when the tables were created (and built), False when they existed.
+    """
+    with borrow_connection(connection) as conn:
+        if table_exists(conn, DELIVERY_STATS_TABLE):
+            return False
+        with open_cursor(conn) as cursor:
+            for statement in DELIVERY_STATS_DDL[dialect_of(conn)]:
+                cursor.execute(statement)
+        rebuild_delivery_stats(conn)
+        return True
+
+def _delivery_stats_state(cursor):
+    """(watermark, highest attempt_id, dirty day count) as currently committed."""
+    cursor.execute("SELECT last_id FROM SummaryWatermarks WHERE summary_name = %s", (DELIVERY_STATS_WATERMARK,))
+    row = cursor.fetchone()
+    watermark = row[0] if row else 0
+    cursor.execute("SELECT MAX(attempt_id) FROM DeliveryAttempts")
+    newest = cursor.fetchone()[0] or 0
+    cursor.execute("SELECT COUNT(*) FROM DeliveryStatsDirtyDays")
+    dirty = cursor.fetchone()[0]
+    return watermark, newest, dirty
+
+# Function to fold new and edited delivery attempts into the daily statistics
+def refresh_delivery_stats(connection):
+    """
+    Brings DailyDeliveryStats up to date, touching only what changed since the
+    last refresh:
+
+    - attempts with attempt_id above the watermark are aggregated per day and
+      added to the stored days;
+    - days marked dirty by mark_delivery_days_dirty() (edits and deletes) are
+      recomputed from DeliveryAttempts;
+    - the watermark moves to the highest attempt_id covered.
+
+    Nothing is written when there is nothing new. Attempts without a date are
+    not counted. An attempt committed with a lower id after a refresh already
+    moved past it is missed until the next rebuild.
+
+    Returns:
+        Number of new attempts folded in.
+    """
+    with borrow_connection(connection) as conn:
+        with open_cursor(conn) as cursor:
+            watermark, newest, dirty = _delivery_stats_state(cursor)
+        finish_read(conn)
+        if newest <= watermark and not dirty:
+            return 0
+
+        with transaction(conn):
+            with open_cursor(conn) as cursor:
+                # Claim the watermark row first so concurrent refreshes queue up
+                # here instead of adding the same attempts twice
+                cursor.execute("UPDATE SummaryWatermarks SET last_id = last_id WHERE summary_name = %s",
+                               (DELIVERY_STATS_WATERMARK,))
+                watermark, newest, dirty = _delivery_stats_state(cursor)
+                buckets = date_buckets_ready(conn)
+                if newest > watermark:
+                    cursor.execute(_DELIVERY_STATS_MERGE[dialect_of(conn)].format(day=_ATTEMPT_DAY[buckets]),
+                                   (watermark, newest))
+                if dirty:
+                    cursor.execute("SELECT delivery_date FROM DeliveryStatsDirtyDays")
+                    days = [row[0] for row in cursor.fetchall()]
+                    for day in days:
+                        start = _as_date(day)
+                        cursor.execute("DELETE FROM DailyDeliveryStats WHERE delivery_date = %s", (start,))
+                        day_range = (start,) if buckets else (start, start + datetime.timedelta(days=1))
+                        cursor.execute(_DELIVERY_DAY_INSERT[buckets], day_range + (newest,))
+                        cursor.execute("DELETE FROM DeliveryStatsDirtyDays WHERE delivery_date = %s", (day,))
+                cursor.execute("UPDATE SummaryWatermarks SET last_id = %s WHERE summary_name = %s",
+                               (max(newest, watermark), DELIVERY_STATS_WATERMARK))
+            bump_table_versions([DELIVERY_STATS_TABLE])
+        return max(newest - watermark, 0)
+
+# Function to record days whose delivery attempts were edited
+def mark_delivery_days_dirty(connection, attempt_dates):
+    """
+    Marks the days of `attempt_dates` (old and new dates of updated or deleted
+    attempts) for recomputation on the next refresh_delivery_stats(). Run it in
+    the same transaction() as the edit.
+    """
+    days = {_as_date(value) for value in attempt_dates if value not in (None, "")}
+    if not days:
+        return
+    with transaction(connection) as conn:
+        with open_cursor(conn) as cursor:
+            for day in sorted(days):
+                cursor.execute(_MARK_DIRTY_DAY[dialect_of(conn)], (day,))
+
+# Function to recompute the daily statistics from scratch
+def rebuild_delivery_stats(connection):
+    """
+    Recomputes DailyDeliveryStats from all of DeliveryAttempts, resets the
+    watermark and clears the dirty days, in one transaction.
+
+    Returns:
+        Number of days written.
+    """
+    with transaction(connection) as conn:
+        with open_cursor(conn) as cursor:
+            cursor.execute("SELECT MAX(attempt_id) FROM DeliveryAttempts")
+            newest = cursor.fetchone()[0] or 0
+            cursor.execute("DELETE FROM DailyDeliveryStats")
+            cursor.execute("DELETE FROM DeliveryStatsDirtyDays")
+            cursor.execute(_DELIVERY_STATS_MERGE[dialect_of(conn)].format(day=_ATTEMPT_DAY[date_buckets_ready(conn)]),
+                           (0, newest))
+            written = cursor.rowcount
+            cursor.execute("DELETE FROM SummaryWatermarks WHERE summary_name = %s", (DELIVERY_STATS_WATERMARK,))
+            cursor.execute("INSERT INTO SummaryWatermarks (summary_name, last_id) VALUES (%s, %s)",
+                           (DELIVERY_STATS_WATERMARK, newest))
+        bump_table_versions([DELIVERY_STATS_TABLE])
+    return written
+
+# Function to create or check every maintained table at startup
+def ensure_summary_tables(connection):
+    """Creates (and backfills) missing summary tables, reporting what was built."""
+    try:
+        if ensure_payment_summary(connection):
+            print(f"🧮 Built the {PAYMENT_SUMMARY_TABLE} table from Payments.")
+        if ensure_delivery_stats(connection):
+            print(f"🧮 Built the {DELIVERY_STATS_TABLE} table from DeliveryAttempts.")
+        if ensure_sketches(connection):
+            print(f"🧮 Built the {SKETCH_TABLE} table from Packages and Payments.")
+    except DB_ERRORS as e:
+        print(f"⚠️ Could not prepare summary tables, payment and delivery reports may fail: {e}")
+
+# Function to rebuild every maintained table
+def rebuild_summary_tables(connection):
+    """Rebuilds every summary table; returns {table name: rows written}."""
+    return {
+        PAYMENT_SUMMARY_TABLE: rebuild_payment_summary(connection),
+        DELIVERY_STATS_TABLE: rebuild_delivery_stats(connection),
+        SKETCH_TABLE: rebuild_sketches(connection),
+    }
@@ -0,0 +1,56 @@
+# conftest.py
+import datetime
+import os
+import sys
+
+import pytest
+
+# The application modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import SQLiteBackend  # noqa: E402
+from db import bulk_insert, create_pool  # noqa: E402
+from summaries import ensure_summary_tables  # noqa: E402
+
+# Fixture data: a few customers and shipments, with payments and delivery attempts
+# spread over several months and days (including ties on the same day)
+CUSTOMERS = [(f"First{i}", f"Last{i}", f"customer{i}@example.com", "5550100", "1990-01-01") for i in range(1, 5)]
+SHIPMENTS = [
+    (1, "Delivered", "Ground", "2024-01-05 09:00:00", None),
+    (2, "Pending", "Express", "2024-01-05 17:30:00", None),
+    (3, "Delivered", "Ground", "2024-02-11 08:15:00", None),
+    (1, "Pending", "Express", "2024-03-02 12:00:00", None),
+]
+PAYMENTS = [
+    (1, "10.00", datetime.date(2024, 1, 3), "Card"),
+    (1, "25.50", datetime.date(2024, 1, 20), "Card"),
+    (2, "7.25", datetime.date(2024, 1, 20), "Cash"),
+    (2, "99.99", datetime.date(2024, 2, 1), "Card"),
+    (3, "40.00", datetime.date(2024, 2, 29), "Card"),
+    (3, "12.10", datetime.date(2024, 3, 15), "Cash"),
+    (4, "60.00", None, "Card"),
+]
+ATTEMPTS = [
+    (1, "2024-01-06 10:00:00", "Success"),
+    (2, "2024-01-06 15:00:00", "Failed"),
+    (2, "2024-01-07 09:00:00", "Success"),
+    (3, "2024-02-12 11:00:00", "Success"),
+    (4, "2024-03-03 08:00:00", "Failed"),
+]
+
+@pytest.fixture
+def pool():
+    """A pool on a fresh in-memory database with the UPS schema and summary tables."""
+    pool = create_pool(pool_size=2, backend=SQLiteBackend(":memory:"))
+    ensure_summary_tables(pool)
+    yield pool
+    pool.close_all()
+
+@pytest.fixture
+def seeded_pool(pool):
+    """The pool fixture loaded with the fixture data above."""
+    bulk_insert(pool, "Customers", CUSTOMERS)
+    bulk_insert(pool, "Shipments", SHIPMENTS)
+    bulk_insert(pool, "Payments", PAYMENTS)
+    bulk_insert(pool, "DeliveryAttempts", ATTEMPTS)
+    return pool
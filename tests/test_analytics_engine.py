@@ -0,0 +1,37 @@
+# test_analytics_engine.py
+import random
+
+import pytest
+
+import analytics_engine
+from complex_operations import fetch_report
+from db import bulk_insert
+
+np = pytest.importorskip("numpy")
+
+# Reports with a NumPy form: it must give the rows their SQL gives
+ENGINE_REPORTS = ["calculate_shipment_weight_percentiles", "compute_moving_average_shipments",
+                  "determine_median_payment"]
+
+@pytest.fixture
+def report_pool(seeded_pool):
+    random.seed(3)
+    bulk_insert(seeded_pool, "Packages", [(1 + number % 4, round(random.uniform(0.1, 50), 2), "Parts", False)
+                                          for number in range(200)])
+    bulk_insert(seeded_pool, "Shipments", [(1 + day % 4, "Delivered", "Ground", f"2024-04-{1 + day * day % 23:02d} 10:00:00",
+                                            None) for day in range(60)])
+    return seeded_pool
+
+def _normalized(rows):
+    return [tuple(round(float(value), 6) if isinstance(value, (int, float)) or hasattr(value, "is_nan") else
+                  None if value is None else str(value) for value in row) for row in rows]
+
+@pytest.mark.parametrize("name", ENGINE_REPORTS)
+def test_engine_matches_the_report_sql(report_pool, monkeypatch, name):
+    with report_pool.connection() as conn:
+        sql_headers, sql_rows = fetch_report(conn, name, use_cache=False)
+        monkeypatch.setattr(analytics_engine, "ANALYTICS_ENGINE", "numpy")
+        engine_headers, engine_rows = fetch_report(conn, name, use_cache=False)
+    assert sql_rows
+    assert [header.lower() for header in engine_headers] == [header.lower() for header in sql_headers]
+    assert _normalized(engine_rows) == _normalized(sql_rows)
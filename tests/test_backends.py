@@ -0,0 +1,28 @@
+# test_backends.py
+import pytest
+
+from backends import translate_placeholders
+
+@pytest.mark.parametrize("query, has_params, expected", [
+    ("SELECT * FROM Payments WHERE payment_id = %s", True, "SELECT * FROM Payments WHERE payment_id = ?"),
+    ("SELECT * FROM Payments WHERE amount > %s AND customer_id IN (%s, %s)", True,
+     "SELECT * FROM Payments WHERE amount > ? AND customer_id IN (?, ?)"),
+    # %s inside a string literal is text, not a placeholder
+    ("SELECT '%s', \"%s\" FROM Payments WHERE payment_id = %s", True,
+     "SELECT '%s', \"%s\" FROM Payments WHERE payment_id = ?"),
+    # Only %s is substituted, as by mysql.connector: formats and %% are sent as written
+    ("SELECT DATE_FORMAT(payment_date, '%Y-%m') FROM Payments WHERE amount > %s", True,
+     "SELECT DATE_FORMAT(payment_date, '%Y-%m') FROM Payments WHERE amount > ?"),
+    ("SELECT '%%' FROM Payments WHERE payment_id = %s", True, "SELECT '%%' FROM Payments WHERE payment_id = ?"),
+    # Without parameters the text is sent as written
+    ("SELECT DATE_FORMAT(payment_date, '%Y-%m') FROM Payments", False,
+     "SELECT DATE_FORMAT(payment_date, '%Y-%m') FROM Payments"),
+    ("SELECT '%%' FROM Payments", False, "SELECT '%%' FROM Payments"),
+    ("SELECT COUNT(*) FROM Payments", True, "SELECT COUNT(*) FROM Payments"),
+    ("SELECT 'it''s %s' FROM Payments WHERE payment_id = %s", True, "SELECT 'it''s %s' FROM Payments WHERE payment_id = ?"),
+])
+def test_translate_placeholders(query, has_params, expected):
+    assert translate_placeholders(query, has_params) == expected
+
+def test_trailing_percent_is_kept():
+    assert translate_placeholders("SELECT 5 %", True) == "SELECT 5 %"
@@ -0,0 +1,88 @@
+# test_cli.py
+import csv
+import io
+import json
+
+import pytest
+
+import db
+from cli import EXIT_NOT_FOUND, EXIT_OK, EXIT_USAGE, main
+from complex_operations import REPORTS
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Points the command line at a fresh SQLite database file."""
+    path = tmp_path / "ups.sqlite3"
+    monkeypatch.setattr(db, "DB_BACKEND", "sqlite")
+    monkeypatch.setattr(db, "SQLITE_PATH", str(path))
+    return path
+
+def _run(capsys, *argv):
+    """Runs the command line; returns (exit code, CSV rows written to stdout)."""
+    code = main(list(argv))
+    return code, list(csv.reader(io.StringIO(capsys.readouterr().out)))
+
+def _create_customer(capsys, number):
+    return _run(capsys, "create", "Customers", f"first_name=First{number}", f"last_name=Last{number}",
+                f"email=customer{number}@example.com", "phone_number=5550100", "DOB=1990-01-01")
+
+def test_reports_lists_every_report(capsys):
+    code, rows = _run(capsys, "reports")
+    assert code == EXIT_OK
+    assert rows == [["report"]] + [[name] for name in REPORTS]
+
+def test_create_read_update_delete(database, capsys):
+    assert _create_customer(capsys, 1) == (EXIT_OK, [["table", "action", "key", "rows"], ["Customers", "create", "1", "1"]])
+    code, rows = _run(capsys, "read", "customers", "1")
+    assert code == EXIT_OK
+    assert dict(zip(*rows))["email"] == "customer1@example.com"
+
+    assert _run(capsys, "update", "Customers", "1", "phone_number=5550199")[0] == EXIT_OK
+    assert dict(zip(*_run(capsys, "read", "Customers", "1")[1]))["phone_number"] == "5550199"
+    assert _run(capsys, "delete", "Customers", "1")[0] == EXIT_OK
+    assert _run(capsys, "read", "Customers", "1")[0] == EXIT_NOT_FOUND
+    assert _run(capsys, "delete", "Customers", "1")[0] == EXIT_NOT_FOUND
+
+def test_list_pages_through_records(database, capsys):
+    for number in range(1, 4):
+        _create_customer(capsys, number)
+    code = main(["list", "Customers", "--limit", "2"])
+    captured = capsys.readouterr()
+    assert code == EXIT_OK
+    assert [row[0] for row in csv.reader(io.StringIO(captured.out))] == ["customer_id", "1", "2"]
+    assert "--after '2'" in captured.err
+    code, rows = _run(capsys, "list", "Customers", "--limit", "2", "--after", "2")
+    assert (code, [row[0] for row in rows]) == (EXIT_OK, ["customer_id", "3"])
+
+@pytest.mark.parametrize("argv", [
+    ["read", "NoSuchTable", "1"],
+    ["list", "Customers", "--limit", "0"],
+    ["list", "Addresses", "--order", "date"],
+])
+def test_bad_arguments_exit_with_a_usage_error(database, capsys, argv):
+    code, rows = _run(capsys, *argv)
+    assert (code, rows) == (EXIT_USAGE, [])
+
+def test_unknown_report_is_refused_by_the_parser(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(["report", "no_such_report"])
+    assert exit_info.value.code == EXIT_USAGE
+
+def test_report_writes_json_lines(database, capsys):
+    _create_customer(capsys, 1)
+    code = main(["report", "customers_with_no_shipments", "--format", "jsonl"])
+    lines = capsys.readouterr().out.splitlines()
+    assert code == EXIT_OK
+    assert [json.loads(line) for line in lines] == [{"customer_id": 1, "first_name": "First1", "last_name": "Last1"}]
+
+def test_migrate_adds_the_date_buckets_once(database, capsys):
+    code, rows = _run(capsys, "migrate")
+    assert code == EXIT_OK and len(rows) > 1
+    assert _run(capsys, "migrate") == (EXIT_OK, [["added"]])
+
+def test_output_goes_to_a_file(database, capsys, tmp_path):
+    _create_customer(capsys, 1)
+    path = tmp_path / "customer.csv"
+    assert main(["read", "Customers", "1", "--output", str(path)]) == EXIT_OK
+    assert capsys.readouterr().out == ""
+    assert path.read_text(encoding="utf-8").splitlines()[0].startswith("customer_id,")
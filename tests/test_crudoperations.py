@@ -0,0 +1,66 @@
+# test_crudoperations.py
+import pytest
+
+from crudoperations import list_records
+from db import bulk_insert
+
+# Addresses per customer: customer 2 has more rows than the smallest pages hold
+ADDRESS_COUNTS = {1: 2, 2: 3, 3: 1, 4: 2}
+
+def _pages(pool, table_name, limit, filters=None, order="id"):
+    """Every page list_records hands out, following next_after to the end."""
+    pages, after = [], None
+    while True:
+        headers, rows, after = list_records(pool, table_name, filters, order, after, limit)
+        pages.append([dict(zip(headers, row)) for row in rows])
+        if after is None:
+            return pages
+        assert len(pages) < 50, "paging does not terminate"
+
+@pytest.mark.parametrize("limit", range(1, 9))
+def test_pages_by_id_cover_every_row_once(seeded_pool, limit):
+    pages = _pages(seeded_pool, "Payments", limit)
+    assert [row["payment_id"] for page in pages for row in page] == list(range(1, 8))
+    assert all(1 <= len(page) <= limit for page in pages)
+    assert len(pages) == -(-7 // limit)
+
+@pytest.mark.parametrize("limit", range(1, 8))
+def test_pages_by_date_keep_ties_in_order(seeded_pool, limit):
+    # Payments 2 and 3 share a date, payment 7 has none and is left out
+    pages = _pages(seeded_pool, "Payments", limit, order="date")
+    rows = [row for page in pages for row in page]
+    assert [row["payment_id"] for row in rows] == [1, 2, 3, 4, 5, 6]
+    assert all(1 <= len(page) <= limit for page in pages)
+
+def test_filtered_pages(seeded_pool):
+    filters = {"status": "Success", "date_from": "2024-01-06", "date_to": "2024-02-12"}
+    pages = _pages(seeded_pool, "DeliveryAttempts", 1, filters, order="date")
+    assert [[row["attempt_id"] for row in page] for page in pages] == [[1], [3], [4]]
+
+@pytest.mark.parametrize("limit", range(1, 10))
+def test_pages_never_split_a_customers_addresses(seeded_pool, limit):
+    addresses = [(customer_id, f"{number} Main St", "Chicago", "IL", "60616", "US")
+                 for number in range(3) for customer_id, count in ADDRESS_COUNTS.items() if number < count]
+    bulk_insert(seeded_pool, "Addresses", addresses)
+
+    pages = _pages(seeded_pool, "Addresses", limit)
+    # A page may come back empty only when it is the last one
+    assert all(pages[:-1])
+    seen = {}
+    for number, page in enumerate(pages):
+        customers = {row["customer_id"] for row in page}
+        assert len(page) <= limit or len(customers) == 1
+        for customer_id in customers:
+            assert seen.setdefault(customer_id, number) == number, f"customer {customer_id} split across pages"
+    rows = [row for page in pages for row in page]
+    assert len(rows) == len(addresses)
+    assert [row["customer_id"] for row in rows] == sorted(row["customer_id"] for row in rows)
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_page_size_below_one_is_refused(seeded_pool, limit):
+    with pytest.raises(ValueError):
+        list_records(seeded_pool, "Payments", limit=limit)
+
+def test_date_order_is_refused_on_a_non_unique_key(seeded_pool):
+    with pytest.raises(ValueError):
+        list_records(seeded_pool, "Addresses", order="date")
@@ -0,0 +1,154 @@
+# test_db.py
+import pytest
+
+from backends import SQLiteBackend
+from db import (DB_ERRORS, BulkInsertError, ConnectionPool, bulk_insert, check_record_existance, execute_query,
+                find_missing_records, stream_query, transaction)
+
+from conftest import CUSTOMERS
+
+@pytest.fixture
+def small_pool():
+    pool = ConnectionPool(pool_size=2, timeout=0.05, backend=SQLiteBackend(":memory:"))
+    yield pool
+    pool.close_all()
+
+def test_pool_opens_lazily_and_reuses_released_connections(small_pool):
+    first = small_pool.get_connection()
+    assert small_pool.stats()["open"] == 1
+    small_pool.release(first)
+    second = small_pool.get_connection()
+    assert second is first
+    small_pool.release(second)
+    stats = small_pool.stats()
+    assert (stats["open"], stats["in_use"], stats["idle"], stats["checkouts"]) == (1, 0, 1, 2)
+
+def test_pool_times_out_when_every_slot_is_checked_out(small_pool):
+    held = [small_pool.get_connection(), small_pool.get_connection()]
+    with pytest.raises(DB_ERRORS):
+        small_pool.get_connection()
+    stats = small_pool.stats()
+    assert (stats["open"], stats["in_use"], stats["timeouts"]) == (2, 2, 1)
+    small_pool.release(held.pop())
+    held.append(small_pool.get_connection())
+    assert small_pool.stats()["open"] == 2
+    for connection in held:
+        small_pool.release(connection)
+    assert small_pool.stats()["in_use"] == 0
+
+def test_discarded_connection_frees_its_slot(small_pool):
+    connection = small_pool.get_connection()
+    small_pool.release(connection, discard=True)
+    stats = small_pool.stats()
+    assert (stats["open"], stats["in_use"], stats["discarded"]) == (0, 0, 1)
+
+def test_failed_statement_returns_connection_for_checking(small_pool):
+    with pytest.raises(DB_ERRORS):
+        with small_pool.connection() as connection:
+            connection.cursor().execute("SELECT * FROM NoSuchTable")
+    stats = small_pool.stats()
+    assert (stats["open"], stats["in_use"], stats["idle"]) == (1, 0, 1)
+    # The next checkout pings it, finds it alive and needs no reconnect
+    with small_pool.connection():
+        pass
+    assert small_pool.stats()["reconnects"] == 0
+
+def test_failed_reconnect_frees_its_slot(small_pool, monkeypatch):
+    connection = small_pool.get_connection()
+    small_pool.release(connection, verify=True)
+    connection.close()
+
+    def refuse():
+        raise DB_ERRORS[0]("server gone")
+
+    monkeypatch.setattr(small_pool.backend, "_open_raw", refuse)
+    with pytest.raises(DB_ERRORS):
+        small_pool.get_connection()
+    stats = small_pool.stats()
+    assert (stats["open"], stats["in_use"], stats["idle"]) == (0, 0, 0)
+
+    monkeypatch.undo()
+    held = [small_pool.get_connection(), small_pool.get_connection()]
+    assert small_pool.stats()["open"] == 2
+    for connection in held:
+        small_pool.release(connection)
+
+def test_bulk_insert_commits_in_batches(pool):
+    assert bulk_insert(pool, "customers", CUSTOMERS, batch_size=3) == len(CUSTOMERS)
+    assert execute_query(pool, "SELECT COUNT(*) FROM Customers", select=True) == [(len(CUSTOMERS),)]
+
+def test_bulk_insert_reports_the_failing_batch(pool):
+    bulk_insert(pool, "Customers", CUSTOMERS[:2])
+    addresses = [(customer_id, "1 Main St", "Chicago", "IL", "60616", "US") for customer_id in (1, 2, 1, 99)]
+    with pytest.raises(BulkInsertError) as failure:
+        bulk_insert(pool, "Addresses", addresses, batch_size=2)
+    assert (failure.value.table_name, failure.value.inserted, failure.value.rejected) == ("Addresses", 2, 2)
+    assert execute_query(pool, "SELECT COUNT(*) FROM Addresses", select=True) == [(2,)]
+
+def test_bulk_insert_in_a_transaction_rolls_back_entirely(pool):
+    bulk_insert(pool, "Customers", CUSTOMERS[:2])
+    addresses = [(customer_id, "1 Main St", "Chicago", "IL", "60616", "US") for customer_id in (1, 2, 99)]
+    with pytest.raises(DB_ERRORS) as failure:
+        with transaction(pool):
+            bulk_insert(pool, "Addresses", addresses, batch_size=2)
+    assert not isinstance(failure.value, BulkInsertError)
+    assert execute_query(pool, "SELECT COUNT(*) FROM Addresses", select=True) == [(0,)]
+
+def test_existence_answers_are_cached_per_database(pool, small_pool):
+    bulk_insert(pool, "Customers", CUSTOMERS[:2])
+    assert check_record_existance("Customers", "customer_id", 1, pool)
+    assert not check_record_existance("Customers", "customer_id", 1, small_pool)
+    assert find_missing_records("Customers", "customer_id", [1, 2], pool) == []
+    assert find_missing_records("Customers", "customer_id", [1, 2], small_pool) == [1, 2]
+
+def test_stream_query_yields_every_row_in_chunks(seeded_pool):
+    headers = []
+    rows = list(stream_query(seeded_pool, "SELECT payment_id FROM Payments ORDER BY payment_id", chunk_size=2,
+                             headers=headers))
+    assert headers == ["payment_id"]
+    assert rows == [(payment_id,) for payment_id in range(1, 8)]
+    assert seeded_pool.stats()["in_use"] == 0
+
+def test_stopped_stream_discards_its_connection(seeded_pool):
+    stream = stream_query(seeded_pool, "SELECT payment_id FROM Payments ORDER BY payment_id", chunk_size=2)
+    assert next(stream) == (1,)
+    assert seeded_pool.stats()["in_use"] == 1
+    stream.close()
+    stats = seeded_pool.stats()
+    assert (stats["in_use"], stats["discarded"]) == (0, 1)
+    # The slot is free again for the next caller
+    assert execute_query(seeded_pool, "SELECT COUNT(*) FROM Payments", select=True) == [(7,)]
+
+def test_transaction_commits_once_on_success(pool):
+    with transaction(pool) as conn:
+        bulk_insert(pool, "Customers", CUSTOMERS[:2])
+        execute_query(conn, "UPDATE Customers SET phone_number = %s WHERE customer_id = %s", ("5550199", 1))
+    assert execute_query(pool, "SELECT customer_id, phone_number FROM Customers ORDER BY customer_id", select=True) == [
+        (1, "5550199"), (2, "5550100")]
+    assert pool.stats()["in_use"] == 0
+
+def test_transaction_rolls_back_when_the_block_raises(pool):
+    bulk_insert(pool, "Customers", CUSTOMERS[:1])
+    with pytest.raises(RuntimeError):
+        with transaction(pool):
+            bulk_insert(pool, "Customers", CUSTOMERS[1:])
+            execute_query(pool, "DELETE FROM Customers WHERE customer_id = %s", (1,))
+            raise RuntimeError("abort")
+    assert execute_query(pool, "SELECT customer_id FROM Customers", select=True) == [(1,)]
+    assert pool.stats()["in_use"] == 0
+
+def test_failed_statement_aborts_the_transaction(pool):
+    with pytest.raises(DB_ERRORS):
+        with transaction(pool):
+            bulk_insert(pool, "Customers", CUSTOMERS[:1])
+            execute_query(pool, "SELECT * FROM NoSuchTable", select=True)
+    assert execute_query(pool, "SELECT COUNT(*) FROM Customers", select=True) == [(0,)]
+
+def test_nested_transaction_joins_the_outer_one(pool):
+    with pytest.raises(RuntimeError):
+        with transaction(pool) as outer:
+            with transaction(pool) as inner:
+                assert inner is outer
+                bulk_insert(pool, "Customers", CUSTOMERS[:1])
+            raise RuntimeError("abort")
+    assert execute_query(pool, "SELECT COUNT(*) FROM Customers", select=True) == [(0,)]
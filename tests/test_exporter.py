@@ -0,0 +1,76 @@
+# test_exporter.py
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+import exporter
+from db import execute_query, transaction
+from exporter import export_report, export_source, export_table
+
+def _csv(path):
+    with open(path, newline="", encoding="utf-8") as handle:
+        return list(csv.reader(handle))
+
+def test_table_export_applies_columns_and_date_range(seeded_pool, tmp_path):
+    path = tmp_path / "payments.csv"
+    result = export_table(seeded_pool, "payments", str(path), columns=["PAYMENT_ID", "amount"],
+                          date_from="2024-01-20", date_to="2024-02-01")
+    assert result["rows"] == 3
+    assert _csv(path) == [["payment_id", "amount"], ["2", "25.50"], ["3", "7.25"], ["4", "99.99"]]
+    assert not (tmp_path / "payments.csv.part").exists()
+    assert seeded_pool.stats()["in_use"] == 0
+
+def test_gz_path_is_compressed_json_lines(seeded_pool, tmp_path):
+    path = tmp_path / "attempts.jsonl.gz"
+    assert export_source(seeded_pool, "DeliveryAttempts", str(path), output_format="jsonl")["rows"] == 5
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        rows = [json.loads(line) for line in handle]
+    assert [row["attempt_id"] for row in rows] == [1, 2, 3, 4, 5]
+    assert rows[0]["attempt_status"] == "Success"
+
+def test_report_export_to_a_stream(seeded_pool):
+    out = io.BytesIO()
+    result = export_source(seeded_pool, "olap_daily_delivery_success_rate", out,
+                           columns=["delivery_date", "success_rate"], date_from="2024-01-07",
+                           date_to="2024-02-28", date_column="delivery_date")
+    assert result["rows"] == 2
+    assert out.getvalue().decode("utf-8").splitlines() == [
+        "delivery_date,success_rate", "2024-01-07,100.0", "2024-02-12,100.0"]
+
+@pytest.mark.parametrize("export", [
+    lambda pool, path: export_table(pool, "Payments", path, columns=["nickname"]),
+    lambda pool, path: export_table(pool, "Addresses", path, date_from="2024-01-01"),
+    lambda pool, path: export_report(pool, "no_such_report", path),
+    lambda pool, path: export_report(pool, "examine_payment_trends", path, date_from="2024-01-01"),
+    lambda pool, path: export_report(pool, "examine_payment_trends", path, columns=["nickname"]),
+], ids=["column", "no_date_column", "report", "report_date_column", "report_column"])
+def test_bad_options_raise_value_error_and_write_nothing(seeded_pool, tmp_path, export):
+    with pytest.raises(ValueError):
+        export(seeded_pool, str(tmp_path / "out.csv"))
+    assert list(tmp_path.iterdir()) == []
+    assert seeded_pool.stats()["in_use"] == 0
+
+def test_failed_write_leaves_no_file(seeded_pool, tmp_path, monkeypatch):
+    def fail(headers, rows, out, output_format):
+        out.write("partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(exporter, "write_rows", fail)
+    with pytest.raises(OSError):
+        export_table(seeded_pool, "Payments", str(tmp_path / "payments.csv"))
+    assert list(tmp_path.iterdir()) == []
+    assert seeded_pool.stats()["in_use"] == 0
+
+def test_export_inside_a_transaction_sees_its_writes(seeded_pool, tmp_path):
+    path = tmp_path / "payments.csv"
+    with transaction(seeded_pool):
+        execute_query(seeded_pool, "DELETE FROM Payments WHERE payment_id > %s", (2,))
+        assert export_table(seeded_pool, "Payments", str(path), columns=["payment_id"])["rows"] == 2
+        # The stream ran on the transaction's connection, which stays checked out
+        stats = seeded_pool.stats()
+        assert (stats["in_use"], stats["discarded"]) == (1, 0)
+    assert _csv(path) == [["payment_id"], ["1"], ["2"]]
+    assert execute_query(seeded_pool, "SELECT COUNT(*) FROM Payments", select=True) == [(2,)]
@@ -0,0 +1,51 @@
+# test_importer.py
+import pytest
+
+from db import execute_query
+from importer import import_csv, import_directory
+
+# As a spreadsheet exports it: a byte order mark and headers in mixed case
+CUSTOMERS_CSV = "\ufeffFIRST_NAME,last_name,Email,phone_number,DOB\n" + "".join(
+    f"First{i},Last{i},customer{i}@example.com,5550100,1990-01-01\n" for i in range(1, 4))
+
+# Customer 99 does not exist: the second batch of two is rejected, and the row after it is not tried
+PAYMENTS_CSV = ("customer_id,amount,payment_date,payment_method\n"
+                "1,10.00,2024-01-03,Card\n2,7.25,2024-01-20,Cash\n"
+                "3,40.00,2024-02-29,Card\n99,1.00,2024-02-01,Card\n"
+                "1,25.50,,Card\n")
+
+def _write(directory, name, text):
+    path = directory / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def test_import_maps_header_columns_in_any_case(pool, tmp_path):
+    result = import_csv(pool, "customers", _write(tmp_path, "people.csv", CUSTOMERS_CSV), batch_size=2)
+    assert (result["table"], result["rows"], result["failed"], result["error"], result["method"]) == (
+        "Customers", 3, 0, None, "batched insert")
+    assert execute_query(pool, "SELECT first_name, email FROM Customers ORDER BY customer_id", select=True)[0] == (
+        "First1", "customer1@example.com")
+
+def test_import_reports_the_rows_that_failed(pool, tmp_path):
+    import_csv(pool, "Customers", _write(tmp_path, "Customers.csv", CUSTOMERS_CSV))
+    result = import_csv(pool, "Payments", _write(tmp_path, "Payments.csv", PAYMENTS_CSV), batch_size=2)
+    assert (result["rows"], result["failed"]) == (2, 3)
+    assert result["error"] is not None
+    assert execute_query(pool, "SELECT customer_id, amount FROM Payments ORDER BY payment_id", select=True) == [
+        (1, 10), (2, 7.25)]
+    # The payment summary holds the loaded rows only
+    assert execute_query(pool, "SELECT SUM(payment_count) FROM PaymentMonthlySummary", select=True) == [(2,)]
+
+def test_import_refuses_unknown_columns(pool, tmp_path):
+    with pytest.raises(ValueError):
+        import_csv(pool, "Customers", _write(tmp_path, "Customers.csv", "first_name,nickname\nA,B\n"))
+    assert execute_query(pool, "SELECT COUNT(*) FROM Customers", select=True) == [(0,)]
+
+def test_import_directory_loads_parents_first(pool, tmp_path):
+    _write(tmp_path, "payments.csv", PAYMENTS_CSV.replace("99,", "3,"))
+    _write(tmp_path, "Customers.csv", CUSTOMERS_CSV)
+    _write(tmp_path, "notes.csv", "text\nhello\n")
+    results = import_directory(pool, str(tmp_path), batch_size=2)
+    assert [(result["table"], result["rows"], result["failed"]) for result in results] == [
+        ("Customers", 3, 0), ("Payments", 5, 0)]
+    assert execute_query(pool, "SELECT SUM(payment_count) FROM PaymentMonthlySummary", select=True) == [(5,)]
@@ -0,0 +1,102 @@
+# test_report_cache.py
+from types import SimpleNamespace
+
+import pytest
+
+import report_cache
+from complex_operations import fetch_report
+from crudoperations import create_record
+from backends import SQLiteBackend
+from db import create_pool, database_of, execute_query
+from report_cache import cached_report, clear_report_cache, report_cache_stats
+from summaries import ensure_summary_tables
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_report_cache()
+    yield
+    clear_report_cache()
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable clock standing in for time.time() in report_cache."""
+    now = [1000.0]
+    monkeypatch.setattr(report_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+def _counting(pool, calls):
+    """A compute() returning the payment count and recording each call."""
+    def compute():
+        calls.append(1)
+        return ["payments"], execute_query(pool, "SELECT COUNT(*) FROM Payments", select=True)
+    return compute
+
+def test_result_is_reused_until_a_table_is_written(seeded_pool):
+    calls = []
+    key = ("payment_count", (), database_of(seeded_pool))
+    before = report_cache_stats()
+    assert cached_report(key, ["Payments"], _counting(seeded_pool, calls)) == (["payments"], ((7,),))
+    assert cached_report(key, ["payments"], _counting(seeded_pool, calls))[1] == ((7,),)
+    assert len(calls) == 1
+
+    # A write to another table leaves the result alone, one to Payments makes it stale
+    create_record(seeded_pool, "Customers", {"first_name": "New", "last_name": "Customer",
+                                             "email": "new@example.com", "phone_number": "5550100",
+                                             "DOB": "1990-01-01"})
+    assert cached_report(key, ["Payments"], _counting(seeded_pool, calls))[1] == ((7,),)
+    create_record(seeded_pool, "Payments", {"customer_id": 4, "amount": "15.00", "payment_date": "2024-04-30",
+                                            "payment_method": "Card"})
+    assert cached_report(key, ["Payments"], _counting(seeded_pool, calls))[1] == ((8,),)
+    assert len(calls) == 2
+    after = report_cache_stats()
+    assert (after["hits"] - before["hits"], after["misses"] - before["misses"],
+            after["stale"] - before["stale"]) == (2, 2, 1)
+
+def test_result_expires_after_max_age(seeded_pool, clock):
+    calls = []
+    key = ("payment_count", (), database_of(seeded_pool))
+    before = report_cache_stats()
+    cached_report(key, ["Payments"], _counting(seeded_pool, calls))
+    clock[0] += report_cache.REPORT_CACHE_MAX_AGE
+    cached_report(key, ["Payments"], _counting(seeded_pool, calls))
+    assert len(calls) == 1
+    clock[0] += 1
+    cached_report(key, ["Payments"], _counting(seeded_pool, calls))
+    assert len(calls) == 2
+    assert report_cache_stats()["expired"] - before["expired"] == 1
+    # max_age=0 keeps a result until its tables change
+    clock[0] += 10 * report_cache.REPORT_CACHE_MAX_AGE
+    cached_report(key, ["Payments"], _counting(seeded_pool, calls), max_age=0)
+    assert len(calls) == 2
+
+def test_refresh_recomputes_and_caches_the_fresh_result(seeded_pool):
+    calls = []
+    key = ("payment_count", (), database_of(seeded_pool))
+    cached_report(key, ["Payments"], _counting(seeded_pool, calls))
+    cached_report(key, ["Payments"], _counting(seeded_pool, calls), refresh=True)
+    cached_report(key, ["Payments"], _counting(seeded_pool, calls))
+    assert len(calls) == 2
+
+def test_clear_drops_only_results_of_the_given_table(seeded_pool):
+    payments, shipments = [], []
+    database = database_of(seeded_pool)
+    cached_report(("payments", (), database), ["Payments"], _counting(seeded_pool, payments))
+    cached_report(("shipments", (), database), ["Shipments"], _counting(seeded_pool, shipments))
+    clear_report_cache("payments")
+    cached_report(("payments", (), database), ["Payments"], _counting(seeded_pool, payments))
+    cached_report(("shipments", (), database), ["Shipments"], _counting(seeded_pool, shipments))
+    assert (len(payments), len(shipments)) == (2, 1)
+
+def test_reports_are_cached_per_database(seeded_pool):
+    other = create_pool(pool_size=1, backend=SQLiteBackend(":memory:"))
+    try:
+        ensure_summary_tables(other)
+        with seeded_pool.connection() as conn:
+            seeded = fetch_report(conn, "examine_payment_trends")
+        with other.connection() as conn:
+            empty = fetch_report(conn, "examine_payment_trends")
+    finally:
+        other.close_all()
+    assert seeded[1] and not empty[1]
+    with seeded_pool.connection() as conn:
+        assert fetch_report(conn, "examine_payment_trends") == seeded
@@ -0,0 +1,75 @@
+# test_sketches.py
+import bisect
+import random
+
+import pytest
+
+from db import bulk_insert
+from sketches import (PACKAGE_WEIGHT_SKETCH, PAYMENT_AMOUNT_SKETCH, KLLSketch, approximate_quantiles, load_sketch,
+                      rebuild_sketches, refresh_sketches, sketch_rank_error)
+
+FRACTIONS = [i / 100 for i in range(1, 100)]
+
+def _rank_error(estimate, ordered, fraction):
+    """How far the rank of `estimate` in `ordered` lies outside `fraction`, ties counted in its favour."""
+    low = bisect.bisect_left(ordered, estimate) / len(ordered)
+    high = bisect.bisect_right(ordered, estimate) / len(ordered)
+    return max(0.0, low - fraction, fraction - high)
+
+def _worst_rank_error(sketch, values):
+    ordered = sorted(values)
+    return max(_rank_error(sketch.quantile(fraction), ordered, fraction) for fraction in FRACTIONS)
+
+@pytest.mark.parametrize("k", [50, 200])
+def test_quantiles_stay_within_the_rank_error_bound(k):
+    random.seed(k)
+    for _ in range(5):
+        values = [random.random() for _ in range(20000)]
+        sketch = KLLSketch(k)
+        for value in values:
+            sketch.update(value)
+        assert sketch.count == len(values)
+        assert _worst_rank_error(sketch, values) <= sketch_rank_error(k)
+
+def test_merged_sketches_stay_within_the_rank_error_bound():
+    random.seed(1)
+    values = [random.lognormvariate(0, 1) for _ in range(40000)]
+    merged = KLLSketch()
+    for start in range(0, len(values), 5000):
+        part = KLLSketch()
+        for value in values[start:start + 5000]:
+            part.update(value)
+        merged.merge(part)
+    assert (merged.count, merged.minimum, merged.maximum) == (len(values), min(values), max(values))
+    assert _worst_rank_error(KLLSketch.from_json(merged.to_json()), values) <= sketch_rank_error()
+
+def _add_packages(pool, count):
+    weights = [round(random.uniform(0.1, 50), 2) for _ in range(count)]
+    bulk_insert(pool, "Packages", [(1 + number % 4, weight, "Parts", False) for number, weight in enumerate(weights)])
+    return weights
+
+def test_refresh_folds_in_new_packages(seeded_pool):
+    random.seed(2)
+    weights = _add_packages(seeded_pool, 3000)
+    fractions = [0.1, 0.5, 0.9]
+    for _ in range(2):
+        estimates, count, bound = approximate_quantiles(seeded_pool, PACKAGE_WEIGHT_SKETCH, fractions)
+        assert (count, bound) == (len(weights), sketch_rank_error())
+        ordered = sorted(weights)
+        assert all(_rank_error(estimate, ordered, fraction) <= bound
+                   for estimate, fraction in zip(estimates, fractions))
+        weights += _add_packages(seeded_pool, 1000)
+    # Everything is folded in once
+    assert refresh_sketches(seeded_pool) == 1000
+    assert refresh_sketches(seeded_pool) == 0
+    refreshed = load_sketch(seeded_pool, PACKAGE_WEIGHT_SKETCH)
+    rebuild_sketches(seeded_pool)
+    rebuilt = load_sketch(seeded_pool, PACKAGE_WEIGHT_SKETCH)
+    assert (refreshed.count, refreshed.minimum, refreshed.maximum) == (rebuilt.count, rebuilt.minimum, rebuilt.maximum)
+
+def test_per_customer_sketches_hold_each_customers_payments(seeded_pool):
+    refresh_sketches(seeded_pool)
+    counts = {customer_id: load_sketch(seeded_pool, PAYMENT_AMOUNT_SKETCH, str(customer_id)).count
+              for customer_id in range(1, 5)}
+    assert counts == {1: 2, 2: 2, 3: 2, 4: 1}
+    assert load_sketch(seeded_pool, PAYMENT_AMOUNT_SKETCH).count == 7
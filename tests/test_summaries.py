@@ -0,0 +1,108 @@
+# test_summaries.py
+import datetime
+import re
+from collections import defaultdict
+
+import pytest
+
+from crudoperations import create_record, delete_record, update_record
+from date_buckets import ensure_date_buckets
+from db import bulk_insert, execute_query
+from summaries import _summary_insert, rebuild_delivery_stats, rebuild_payment_summary, refresh_delivery_stats
+
+# Both forms of the summary SQL: function-based, and on the date bucket columns
+@pytest.fixture(params=[False, True], ids=["unbucketed", "bucketed"])
+def summary_pool(request, seeded_pool):
+    if request.param:
+        ensure_date_buckets(seeded_pool)
+    return seeded_pool
+
+def _payment_summary(pool):
+    return execute_query(pool, """
+        SELECT payment_period, customer_id, payment_count, total_amount, min_amount, max_amount
+        FROM PaymentMonthlySummary ORDER BY payment_period, customer_id
+    """, select=True)
+
+def _recomputed_payment_summary(pool):
+    """PaymentMonthlySummary rows computed in Python from every payment."""
+    groups = defaultdict(list)
+    for customer_id, amount, payment_date in execute_query(
+            pool, "SELECT customer_id, amount, payment_date FROM Payments", select=True):
+        groups[(str(payment_date)[:7] if payment_date else None, customer_id)].append(amount)
+    rows = [(period, customer_id, len(amounts), sum(amounts), min(amounts), max(amounts))
+            for (period, customer_id), amounts in groups.items()]
+    return sorted(rows, key=lambda row: (row[0] is not None, row[0] or "", row[1]))
+
+def test_bulk_loaded_payments_are_summarized(summary_pool):
+    assert _payment_summary(summary_pool) == _recomputed_payment_summary(summary_pool)
+
+@pytest.mark.parametrize("change", [
+    lambda pool: create_record(pool, "Payments", {"customer_id": 4, "amount": "15.00", "payment_date": "2024-04-30",
+                                                  "payment_method": "Card"}),
+    lambda pool: update_record(pool, "Payments", 2, {"amount": "30.00"}),
+    lambda pool: update_record(pool, "Payments", 2, {"payment_date": "2024-03-01"}),
+    lambda pool: update_record(pool, "Payments", 3, {"customer_id": 1}),
+    lambda pool: update_record(pool, "Payments", 4, {"payment_date": None}),
+    lambda pool: update_record(pool, "Payments", 7, {"payment_date": "2024-01-31"}),
+    lambda pool: delete_record(pool, "Payments", 5),
+    lambda pool: bulk_insert(pool, "Payments", [(1, "1.00", datetime.date(2024, 1, 1), "Cash"),
+                                                (4, "2.00", datetime.date(2024, 5, 1), "Cash")]),
+], ids=["create", "amount", "move_month", "move_customer", "clear_date", "set_date", "delete", "bulk_insert"])
+def test_payment_changes_match_a_full_recompute(summary_pool, change):
+    change(summary_pool)
+    expected = _recomputed_payment_summary(summary_pool)
+    assert _payment_summary(summary_pool) == expected
+    rebuild_payment_summary(summary_pool)
+    assert _payment_summary(summary_pool) == expected
+
+def test_parameterized_refresh_writes_year_month_periods(seeded_pool):
+    # mysql.connector substitutes each %s and sends everything else as written
+    sent = re.sub("%s", "1", _summary_insert("WHERE customer_id = %s", False))
+    assert "DATE_FORMAT(payment_date, '%Y-%m')" in sent
+    create_record(seeded_pool, "Payments", {"customer_id": 4, "amount": "15.00", "payment_date": "2024-04-30",
+                                            "payment_method": "Card"})
+    periods = execute_query(seeded_pool, "SELECT DISTINCT payment_period FROM PaymentMonthlySummary "
+                                         "WHERE payment_period IS NOT NULL ORDER BY payment_period", select=True)
+    assert periods == [("2024-01",), ("2024-02",), ("2024-03",), ("2024-04",)]
+
+def _delivery_stats(pool):
+    return execute_query(pool, """
+        SELECT delivery_date, total_attempts, successful_attempts FROM DailyDeliveryStats ORDER BY delivery_date
+    """, select=True)
+
+def _recomputed_delivery_stats(pool):
+    """DailyDeliveryStats rows computed in Python from every dated attempt."""
+    days = defaultdict(lambda: [0, 0])
+    for attempt_date, attempt_status in execute_query(
+            pool, "SELECT attempt_date, attempt_status FROM DeliveryAttempts", select=True):
+        if attempt_date:
+            day = days[str(attempt_date)[:10]]
+            day[0] += 1
+            day[1] += attempt_status == "Success"
+    return [(day, total, successful) for day, (total, successful) in sorted(days.items())]
+
+def test_delivery_stats_refresh_folds_in_new_attempts(summary_pool):
+    assert refresh_delivery_stats(summary_pool) == 5
+    assert _delivery_stats(summary_pool) == _recomputed_delivery_stats(summary_pool)
+    # Nothing new: nothing is folded in
+    assert refresh_delivery_stats(summary_pool) == 0
+
+@pytest.mark.parametrize("change", [
+    lambda pool: create_record(pool, "DeliveryAttempts", {"shipment_id": 1, "attempt_date": "2024-01-06 18:00:00",
+                                                          "attempt_status": "Success"}),
+    lambda pool: bulk_insert(pool, "DeliveryAttempts", [(3, "2024-02-12 16:00:00", "Failed"),
+                                                        (4, "2024-03-04 09:00:00", "Success"),
+                                                        (4, None, "Success")]),
+    lambda pool: update_record(pool, "DeliveryAttempts", 2, {"attempt_status": "Success"}),
+    lambda pool: update_record(pool, "DeliveryAttempts", 3, {"attempt_date": "2024-01-09 09:00:00"}),
+    lambda pool: update_record(pool, "DeliveryAttempts", 4, {"attempt_date": None}),
+    lambda pool: delete_record(pool, "DeliveryAttempts", 5),
+], ids=["create", "bulk_insert", "status", "move_day", "clear_date", "delete"])
+def test_delivery_changes_match_a_full_recompute(summary_pool, change):
+    refresh_delivery_stats(summary_pool)
+    change(summary_pool)
+    refresh_delivery_stats(summary_pool)
+    expected = _recomputed_delivery_stats(summary_pool)
+    assert _delivery_stats(summary_pool) == expected
+    rebuild_delivery_stats(summary_pool)
+    assert _delivery_stats(summary_pool) == expected